@@ -0,0 +1,209 @@
+"""
+Адаптивный подбор вопросов (включается ADAPTIVE_SELECTION=1).
+
+Что помним:
+  - стабильные ключи вопросов интернируются в компактные id (переживают горячую перезагрузку);
+  - на пользователя — битсеты seen/missed по этим id и счётчик ошибок по тегам;
+  - на вопрос — попытки/верные (array), из них эмпирическая точность с априорной
+    поправкой по полю difficulty, пока ответов мало.
+
+Как выбираем: до review_share сессии — вопросы пакета, на которые пользователь в последний
+раз ответил неверно (перебор установленных битов missed, O(ошибок)), затем часть — из пулов
+слабых тегов пользователя, остальное — из пула пакета. Каждый вопрос тянется взвешенно
+(чем ниже точность, тем чаще) бинарным поиском по префиксным суммам весов пула, повторы
+отсекаются проверкой бита seen — O(k log n) на старт сессии. Префиксные суммы считаются
+лениво на пул и сбрасываются раз в refresh_every ответов или при смене индекса.
+"""
+import bisect
+import heapq
+import random
+from array import array
+from itertools import accumulate
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+from question_index import Pool, QuestionIndex
+
+_PRIOR_WEIGHT = 5  # сколько «виртуальных» попыток весит априорная точность
+
+def prior_accuracy(q: Dict[str, Any]) -> float:
+    d = q.get("difficulty")
+    return 0.9 - 0.15 * d if isinstance(d, (int, float)) else 0.7
+
+class UserHistory:
+    __slots__ = ("seen", "missed", "tag_errors")
+
+    def __init__(self):
+        self.seen = 0                                # бит id -> вопрос уже попадался
+        self.missed = 0                              # бит id -> последний ответ был неверным
+        self.tag_errors: Dict[str, int] | None = None  # создаётся с первой ошибкой
+
+    def weak_tags(self, n: int) -> List[str]:
+        if not self.tag_errors:
+            return []
+        return heapq.nlargest(n, self.tag_errors, key=self.tag_errors.get)
+
+class AdaptiveSelector:
+    def __init__(self, weak_share: float = 0.5, weak_tags: int = 2, refresh_every: int = 1000,
+                 rng: random.Random | None = None, review_share: float = 0.2):
+        self.review_share = review_share
+        self.weak_share = weak_share
+        self.n_weak_tags = weak_tags
+        self.refresh_every = refresh_every
+        self.rng = rng or random.Random()
+        self.key_ids: Dict[str, int] = {}
+        self.attempts = array("I")
+        self.correct = array("I")
+        self.users: Dict[int, UserHistory] = {}
+        self._index: QuestionIndex | None = None
+        self._kid = array("I")                     # qid текущего индекса -> id ключа
+        self._prior: List[float] = []
+        self._qid_of: Dict[int, int] = {}          # id ключа -> qid текущего индекса
+        self._members: Dict[str, FrozenSet[int]] = {}  # пакет -> его qid, для повторов ошибок
+        self._cum: Dict[Tuple[str, str | None], Tuple[Pool, List[float]]] = {}
+        self._since_refresh = 0
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _intern(self, key: str) -> int:
+        kid = self.key_ids.get(key)
+        if kid is None:
+            kid = self.key_ids[key] = len(self.key_ids)
+            self.attempts.append(0)
+            self.correct.append(0)
+        return kid
+
+    def _bind(self, index: QuestionIndex) -> None:
+        if index is self._index:
+            return
+        self._index = index
+        self._kid = array("I", (self._intern(k) for k in index.keys))
+        self._prior = [prior_accuracy(q) for q in index.questions]
+        self._qid_of = {kid: qid for qid, kid in enumerate(self._kid)}
+        self._members.clear()
+        self._cum.clear()
+
+    def _weight(self, qid: int) -> float:
+        kid = self._kid[qid]
+        acc = (self.correct[kid] + self._prior[qid] * _PRIOR_WEIGHT) / (self.attempts[kid] + _PRIOR_WEIGHT)
+        # совсем лёгкие вопросы не исчезают, трудные выпадают в несколько раз чаще
+        return 0.2 + (1.0 - acc)
+
+    def _cumulative(self, pack: str, tag: str | None) -> Tuple[Pool, List[float]]:
+        entry = self._cum.get((pack, tag))
+        if entry is None:
+            pool = self._index.pool(pack=pack, tag=tag)
+            entry = self._cum[(pack, tag)] = (pool, list(accumulate(self._weight(q) for q in pool)))
+        return entry
+
+    def _draw_from(self, pool: Pool, cum: List[float], seen: int, chosen: Dict[int, None],
+                   want: int) -> None:
+        if not pool or want <= 0:
+            return
+        total = cum[-1]
+        kid = self._kid
+        rnd = self.rng.random
+        tries = 0
+        while want > 0 and tries < 8 * want + 8:
+            tries += 1
+            qid = pool[min(bisect.bisect_right(cum, rnd() * total), len(pool) - 1)]
+            if qid in chosen or seen >> kid[qid] & 1:
+                continue
+            chosen[qid] = None
+            want -= 1
+
+    def _missed(self, missed: int, pack: str) -> List[int]:
+        """qid пакета, на которые последний ответ был неверным."""
+        members = self._members.get(pack)
+        if members is None:
+            members = self._members[pack] = frozenset(self._index.pool(pack=pack))
+        qid_of = self._qid_of
+        out = []
+        while missed:
+            low = missed & -missed
+            qid = qid_of.get(low.bit_length() - 1)
+            if qid is not None and qid in members:
+                out.append(qid)
+            missed ^= low
+        return out
+
+    def draw(self, user_id: int, index: QuestionIndex, pack: str, k: int = 10) -> List[int]:
+        """k qid пакета: без повторов, часть — повтор ошибок, дальше по возможности ещё не виденные
+        с упором на слабые теги."""
+        self._bind(index)
+        h = self.users.get(user_id)
+        seen = h.seen if h is not None else 0
+        chosen: Dict[int, None] = {}  # упорядоченное множество qid
+
+        if h is not None and h.missed:
+            missed = self._missed(h.missed, pack)
+            for q in self.rng.sample(missed, min(int(k * self.review_share), len(missed))):
+                chosen[q] = None
+
+        if h is not None and h.tag_errors:
+            weak = h.weak_tags(self.n_weak_tags)
+            budget = int(k * self.weak_share)
+            reviewed = len(chosen)
+            per_tag = -(-budget // len(weak))
+            for tag in weak:
+                pool, cum = self._cumulative(pack, tag)
+                self._draw_from(pool, cum, seen, chosen, min(per_tag, budget - len(chosen) + reviewed))
+
+        pool, cum = self._cumulative(pack, None)
+        self._draw_from(pool, cum, seen, chosen, k - len(chosen))
+        if len(chosen) < k and seen:
+            # непросмотренные кончились — разрешаем повторы (но не внутри сессии)
+            self._draw_from(pool, cum, 0, chosen, k - len(chosen))
+        if len(chosen) < k:
+            # пул почти исчерпан выборкой — добираем равномерно (редкий случай маленьких пакетов)
+            rest = [q for q in pool if q not in chosen]
+            for q in self.rng.sample(rest, min(k - len(chosen), len(rest))):
+                chosen[q] = None
+
+        qids = list(chosen)
+        self.rng.shuffle(qids)
+        return qids
+
+    def _remember(self, user_id: int, kid: int, tags: Sequence[str], ok: bool) -> None:
+        bit = 1 << kid
+        h = self.users.get(user_id)
+        if h is None:
+            h = self.users[user_id] = UserHistory()
+        h.seen |= bit
+        if ok:
+            h.missed &= ~bit
+        else:
+            h.missed |= bit
+            if h.tag_errors is None:
+                h.tag_errors = {}
+            for tag in tags:
+                h.tag_errors[tag] = h.tag_errors.get(tag, 0) + 1
+
+    def observe(self, user_id: int, key: str, tags: Sequence[str], ok: bool) -> None:
+        kid = self._intern(key)
+        self.attempts[kid] += 1
+        self.correct[kid] += ok
+        self._remember(user_id, kid, tags, ok)
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every:
+            # веса устарели — префиксные суммы пересчитаются при следующих стартах
+            self._since_refresh = 0
+            self._cum.clear()
+
+    def load_accuracy(self, rows: Iterable[Tuple[str, int, int]]) -> None:
+        """Прогрев точности из агрегатов статистики: (qkey, attempts, correct)."""
+        for key, attempts, correct in rows:
+            kid = self._intern(key)
+            self.attempts[kid] = attempts
+            self.correct[kid] = correct
+        self._cum.clear()
+
+    def load_history(self, index: QuestionIndex, rows: Iterable[Tuple[int, str, int]],
+                     owns: Callable[[int], bool] | None = None) -> None:
+        """Прогрев истории пользователей из событий ответов: (user_id, qkey, ok) по времени."""
+        for user_id, key, ok in rows:
+            if owns is not None and not owns(user_id):
+                continue
+            qid = index.by_key.get(key)
+            tags = index.get(qid).get("tags", ()) if qid is not None else ()
+            self._remember(user_id, self._intern(key), tags, bool(ok))
@@ -0,0 +1,91 @@
+"""
+Отчёты для админских /stats и /hardest. Данные — только из агрегатов StatsStore
+(запрос идёт в потоке по отдельному соединению) и счётчиков процесса; готовый текст
+кэшируется на ttl секунд, а одновременные запросы за протухшим отчётом ждут одно
+общее вычисление. Админ, обновляющий отчёт в пик, не нагружает обработку апдейтов.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+from tags_map_loader import render_tags
+
+class CachedReport:
+    def __init__(self, build: Callable[[], Awaitable[str]], ttl: float = 30):
+        self.build = build
+        self.ttl = ttl
+        self._value: str | None = None
+        self._at = 0.0
+        self._pending: asyncio.Future | None = None
+
+    async def get(self) -> str:
+        if self._value is not None and time.monotonic() - self._at < self.ttl:
+            return self._value
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._refresh())
+        # shield: отменённый запрос одного админа не обрывает вычисление для остальных
+        return await asyncio.shield(self._pending)
+
+    async def _refresh(self) -> str:
+        try:
+            value = await self.build()
+            self._value, self._at = value, time.monotonic()
+            return value
+        finally:
+            self._pending = None
+
+def _bar(n: int, top: int, width: int = 8) -> str:
+    filled = max(1, round(width * n / top)) if n else 0
+    return "▰" * filled + "▱" * (width - filled)
+
+class AdminReports:
+    def __init__(self, engine, ttl: float = 30, hours: int = 12, hardest: int = 7):
+        self.engine = engine
+        self.hours = hours
+        self.n_hardest = hardest
+        self.stats_report = CachedReport(self._build_stats, ttl)
+        self.hardest_report = CachedReport(self._build_hardest, ttl)
+
+    def _header(self, title: str) -> str:
+        return f"{title} _(на {time.strftime('%H:%M:%S')}, обновляется раз в {self.stats_report.ttl:g} с)_"
+
+    async def _build_stats(self) -> str:
+        lines = [self._header("📊 *Статистика*"), f"Активных сессий: {len(self.engine.sessions)}"]
+        store = self.engine.stats
+        if store is None:
+            lines.append("Запись статистики выключена (STATS_ENABLED=0)")
+            return "\n".join(lines)
+
+        hourly: List[Tuple[int, int, int, int]] = await store.completions_by_hour(self.hours)
+        done = sum(h[1] for h in hourly)
+        correct = sum(h[2] for h in hourly)
+        total = sum(h[3] for h in hourly)
+        avg = f", в среднем {round(100 * correct / total)}% верных" if total else ""
+        lines.append(f"Завершено за {self.hours} ч: {done}{avg}")
+        if hourly:
+            top = max(h[1] for h in hourly)
+            lines.append("\n*По часам (UTC):*")
+            lines += [f"`{hour % 24:02d}:00` {_bar(n, top)} {n}" for hour, n, _, _ in hourly]
+
+        dist = await store.score_distribution()
+        if dist:
+            top = max(n for _, n in dist)
+            lines.append("\n*Результаты сессий:*")
+            lines += [f"`{bucket * 10:>3}%` {_bar(n, top)} {n}" for bucket, n in dist]
+        return "\n".join(lines)
+
+    async def _build_hardest(self) -> str:
+        store = self.engine.stats
+        if store is None:
+            return "Запись статистики выключена (STATS_ENABLED=0)"
+        index = self.engine.index
+        lines = [self._header("🧱 *Самые трудные вопросы*")]
+        for i, (key, attempts, correct) in enumerate(await store.hardest_questions(self.n_hardest), 1):
+            qid = index.by_key.get(key)
+            text = index.get(qid)["text"] if qid is not None else key  # вопрос могли убрать из пакета
+            lines.append(f"*{i})* {text}\n   {round(100 * correct / attempts)}% верных из {attempts}")
+        if len(lines) == 1:
+            lines.append("Пока мало ответов")
+        tags = [tag for tag, _, errors in await store.tag_errors(self.n_hardest) if errors]
+        lines.append(f"\n*❗️Темы с ошибками*: {render_tags(tags, self.engine.tags_map)}")
+        return "\n".join(lines)
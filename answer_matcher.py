@@ -0,0 +1,125 @@
+"""
+Сопоставление свободных ответов. Варианты из пакета компилируются один раз:
+нормализация (регистр, ё→е, пунктуация), токены, лёгкий стемминг ru/en —
+и дальше проверка ответа это операции над frozenset плюс ограниченное
+расстояние Левенштейна для опечаток. До них — дешёвые отсевы: точное совпадение
+без регулярки, слишком короткий ответ, пары слов с непреодолимой разницей длин.
+Нормализация и токены ответа кэшируются по тексту: одни и те же ответы приходят
+от многих пользователей, и повтор стоит одного поиска в словаре.
+"""
+import re
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Tuple
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# окончания, отсекаемые стеммером
+_SUFFIXES = frozenset({
+    # ru
+    "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией", "иями",
+    "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ие", "ые", "ых", "их", "ым", "им", "ую", "юю",
+    "ах", "ях", "ов", "ев",
+    "ей", "ам", "ям", "ом", "ем", "ию", "ия", "ье", "ью",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+    # en
+    "ing", "ed", "s",
+})
+# проверяем длинные окончания раньше коротких: по одному поиску в set на длину
+_SUFFIX_LENS = tuple(sorted({len(x) for x in _SUFFIXES}, reverse=True))
+_MIN_STEM = 3
+
+@lru_cache(maxsize=65536)
+def normalize(text: str) -> str:
+    text = (text or "").lower().replace("ё", "е").replace("_", " ")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    for n in _SUFFIX_LENS:
+        if len(token) - n >= _MIN_STEM and token[-n:] in _SUFFIXES:
+            return token[:-n]
+    return token
+
+@lru_cache(maxsize=65536)
+def _tokens(norm: str, use_stem: bool) -> FrozenSet[str]:
+    words = norm.split()
+    return frozenset(stem(w) for w in words) if use_stem else frozenset(words)
+
+def tokens(text: str, use_stem: bool = True, normalized: bool = False) -> FrozenSet[str]:
+    return _tokens(text if normalized else normalize(text), use_stem)
+
+def _typo_budget(token: str) -> int:
+    """Сколько опечаток прощаем: короткие слова — только точно."""
+    n = len(token)
+    if n < 4:
+        return 0
+    return 1 if n < 8 else 2
+
+def within_distance(a: str, b: str, k: int) -> bool:
+    """
+    Левенштейн(a, b) <= k для малых k (у нас не больше 2): общий префикс и суффикс
+    срезаются сравнением строк, а в первой несовпавшей позиции перебираем правку —
+    замену, вставку или удаление. Не больше 3^k ветвей и без таблицы DP.
+    """
+    la, lb = len(a), len(b)
+    if abs(la - lb) > k:
+        return False
+    i, n = 0, min(la, lb)
+    while i < n and a[i] == b[i]:
+        i += 1
+    if i == n:
+        return True  # одно — префикс другого, разница длин уже проверена
+    if k == 0:
+        return False
+    while la > i and lb > i and a[la - 1] == b[lb - 1]:
+        la -= 1
+        lb -= 1
+    a, b = a[i:la], b[i:lb]
+    k -= 1
+    return (within_distance(a[1:], b[1:], k)
+            or within_distance(a, b[1:], k)
+            or within_distance(a[1:], b, k))
+
+class FreeAnswerMatcher:
+    """Скомпилированные варианты одного free-вопроса."""
+
+    __slots__ = ("exact", "variants", "budgets", "min_len", "use_stem")
+
+    def __init__(self, answers: Iterable[str] | str, use_stem: bool = True):
+        if isinstance(answers, str):
+            answers = [answers]
+        self.use_stem = use_stem
+        answers = list(answers)
+        self.exact: FrozenSet[str] = frozenset(normalize(a) for a in answers if normalize(a))
+        variants = {tokens(a, use_stem) for a in answers}
+        self.variants: Tuple[FrozenSet[str], ...] = tuple(v for v in variants if v)
+        self.budgets = {w: _typo_budget(w) for v in self.variants for w in v}
+        # короче этого нормализованный ответ не покроет ни один вариант: все основы через пробел
+        # минус две прощённые опечатки по 2 символа
+        self.min_len = min((sum(map(len, v)) + len(v) - 1 - 4 for v in self.variants), default=0)
+
+    def match(self, answer_text: str) -> bool:
+        if not answer_text:
+            return False
+        norm = normalize(answer_text)
+        if norm in self.exact:
+            return True  # самый частый случай — ответ слово в слово (с точностью до регистра/пунктуации)
+        if not norm or len(norm) < self.min_len:
+            return False
+        user = tokens(norm, self.use_stem, normalized=True)
+        for v in self.variants:
+            if v <= user:
+                return True
+        # опечатки: каждое недостающее слово варианта должно найтись с поправкой на расстояние
+        for v in self.variants:
+            missing = v - user
+            if len(missing) > 2:
+                continue
+            extra = user - v
+            if not extra:
+                continue
+            budgets = self.budgets
+            if all(any(abs(len(w) - len(u)) <= budgets[w] and within_distance(w, u, budgets[w]) for u in extra)
+                   for w in missing):
+                return True
+        return False
@@ -1,25 +1,76 @@
 # app.py
+import sys
+
+if __name__ == "__main__" and "--profile-startup" in sys.argv and "importtime" not in sys._xoptions:
+    # раньше тяжёлых импортов: профиль перезапускает бота под -X importtime (см. startup.py)
+    from startup import profile_startup
+    sys.exit(profile_startup(__file__))
+
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
 import asyncio
 import random
-from typing import Dict, Set
+from functools import lru_cache
+from typing import Any, Dict, Set, Tuple
 
 from aiogram import Bot, Dispatcher, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.enums.parse_mode import ParseMode
 
-from settings import TELEGRAM_TOKEN, CHANNEL_URL, ADMIN_IDS, ENV
+from settings import (
+    TELEGRAM_TOKEN, CHANNEL_URL, ADMIN_IDS, ENV,
+    SESSION_BACKEND, SESSION_FLUSH_INTERVAL, SESSION_MAX, SESSION_TTL, SESSION_SWEEP_INTERVAL,
+    MULTI_KB_CACHE_SIZE, PACKS_WATCH_INTERVAL, STATS_ENABLED, STATS_FLUSH_INTERVAL, STATS_BUFFER,
+    ADAPTIVE_SELECTION, ADAPTIVE_HISTORY_DAYS, ADMIN_STATS_TTL, METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    LEADERBOARD_ENABLED, LEADERBOARD_FLUSH_INTERVAL, LEADERBOARD_TOP, REMINDERS_ENABLED, REMINDERS_RATE, REMINDERS_TICK,
+    BROADCAST_RATE, BROADCAST_SENDERS,
+    BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, TELEGRAM_API_URL, WORKERS, RATE_GLOBAL, RATE_PER_CHAT, RATE_CHAT_BURST,
+    DB_PATH, validate as validate_settings,
+)
 from packs_loader import load_packs
+from tags_map_loader import load_tags_map
 from quiz_engine import QuizEngine
-
-# Загружаем YAML-пакеты один раз при старте
-packs = load_packs("data/packs")
-engine = QuizEngine(packs)
-
-# Буфер для мультивыбора: user_id -> set букв ('a','b',...)
-MULTI_BUF: Dict[int, Set[str]] = {}
-
+from question_index import QuestionIndex
+from pack_watcher import PackWatcher
+from adaptive import AdaptiveSelector
+from admin_stats import AdminReports
+from leaderboard import Leaderboard
+from reminders import Reminders
+from broadcast import Broadcaster, render_progress
+from session_store import MemorySessionStore, SqliteSessionStore
+from user_locks import UserSerialMiddleware
+from outbound import ChatRateLimiter, Outbox
+from stats_store import StatsStore
+from metrics import METRICS, ApiMetricsMiddleware, HandlerMetricsMiddleware, MetricsServer, timed
+from startup import FLAG as PROFILE_FLAG, StartupProfile
+
+_IMPORT_T1 = time.perf_counter()
+
+# включаем до навешивания timed(): выключенные метрики не оборачивают функции вовсе
+METRICS.enabled = METRICS_ENABLED
+
+# "Рандом": виртуальный пакет поверх вопросов этих уровней (считается один раз в индексе)
+MIXED_CODE = "mixed"
+MIXED_LEVELS = ("junior", "advanced")
+
+PACKS_DIR = "data/packs"
+
+async def warm_selector(owns=None) -> None:
+    """Поднять точность вопросов и историю пользователей из статистики (если она пишется)."""
+    if engine.selector is None or engine.stats is None:
+        return
+    engine.selector.load_accuracy(await engine.stats.question_totals())
+    since = time.time() - ADAPTIVE_HISTORY_DAYS * 86400
+    engine.selector.load_history(engine.index, await engine.stats.answer_history(since), owns)
+
+@lru_cache(maxsize=256)
 def progress_bar(curr: int, total: int, width: int = 10) -> str:
     """Строка прогресса: ▰▰▰▱▱▱▱▱▱▱ (3/10)"""
     if total <= 0:
@@ -30,10 +81,8 @@ def progress_bar(curr: int, total: int, width: int = 10) -> str:
     return f"{'▰' * filled}{'▱' * (width - filled)}"
 
 def is_admin(user_id: int) -> bool:
-    try:
-        return int(user_id) in set(int(x) for x in ADMIN_IDS)
-    except Exception:
-        return False
+    # ADMIN_IDS уже set[int] (см. settings) — не пересобираем его на каждый вызов
+    return user_id in ADMIN_IDS
 
 def build_levels_kb():
     """Клавиатура выбора уровня."""
@@ -53,39 +102,22 @@ def build_post_results_kb(channel_url: str):
 
 def pick_random_pack(levels: list[str]) -> str | None:
     """Вернуть код случайного пакета, чей pack.level находится в списке levels."""
-    candidates = [code for code, data in packs.items() if data["pack"].get("level") in levels]
+    candidates = [code for level in levels for code in engine.index.packs_by_level.get(level, ())]
     return random.choice(candidates) if candidates else None
 
-def build_mixed_pack(levels=("junior", "advanced")) -> dict:
-    """Собрать единый 'смешанный' пакет из указанных уровней."""
-    mixed_questions = []
-    for _, data in packs.items():
-        if data.get("pack", {}).get("level") in levels:
-            mixed_questions.extend(data.get("questions", []))
-    random.shuffle(mixed_questions)
-    return {
-        "pack": {
-            "code": "mixed",
-            "title": "Смешанный",
-            "level": "mixed",
-            "description": "Вопросы вперемешку из junior и advanced",
-        },
-        "questions": mixed_questions,
-    }
-
 # === НОВОЕ: клавиатуры с ответами ===
-def build_single_kb(q: dict):
+def _build_single_kb(letters: Tuple[str, ...]):
     kb = InlineKeyboardBuilder()
-    for letter, _ in q["options"].items():
+    for letter in letters:
         kb.button(text=f"{letter.upper()}", callback_data=f"ans:{letter}")
     kb.adjust(4)  # красиво в одну строку по 4 кнопки (или убери)
     return kb.as_markup()
 
-def build_multi_kb(q: dict, selected: Set[str] | None):
+def _build_multi_kb(letters: Tuple[str, ...], selected: Set[str] | None):
     selected = selected or set()
     kb = InlineKeyboardBuilder()
     # кнопки вида: "☑️ A" / "▫️ A"
-    for letter, _ in q["options"].items():
+    for letter in letters:
         mark = "☑️" if letter in selected else "▫️"
         kb.button(text=f"{mark} {letter.upper()}", callback_data=f"toggle:{letter}")
     kb.adjust(4)  # 4 в ряд (A B C D)
@@ -96,86 +128,303 @@ def build_multi_kb(q: dict, selected: Set[str] | None):
     kb.adjust(4, 2)  # первый ряд 4, второй ряд 2
     return kb.as_markup()
 
-async def send_question(chat_id: int, user_id: int, message_to_edit: Message | None = None):
-    q = engine.get_current(user_id)
+def build_single_kb(q: dict):
+    return _build_single_kb(tuple(q["options"]))
+
+def build_multi_kb(q: dict, selected: Set[str] | None):
+    return _build_multi_kb(tuple(q["options"]), selected)
+
+# Клавиатура зависит только от букв вариантов (и отметок для multi), а не от текста
+# вопроса — поэтому кэш по буквам: single собираем заранее (при сборке движка), multi мемоизируем по маске.
+_SINGLE_KB: Dict[Tuple[str, ...], Any] = {}
+
+@lru_cache(maxsize=MULTI_KB_CACHE_SIZE)
+def multi_kb(letters: Tuple[str, ...], mask: int):
+    return _build_multi_kb(letters, {l for i, l in enumerate(letters) if mask >> i & 1})
+
+def single_kb(letters: Tuple[str, ...]):
+    markup = _SINGLE_KB.get(letters)
+    if markup is None:
+        markup = _SINGLE_KB[letters] = _build_single_kb(letters)
+    return markup
+
+@timed("question_payload")
+def question_payload(user_id: int):
+    """Текст и клавиатура текущего вопроса (всё из кэшей)."""
     s = engine.sessions[user_id]
-    curr = s["idx"] + 1
-    total = len(s["questions"])
+    qid = s.qids[s.idx]
+    qtype = s.index.get(qid)["type"]
+    curr = s.idx + 1
+    total = s.total
 
     bar = progress_bar(curr, total)
-    text = f"*Вопрос {curr}/{total}*\n{bar}\n" + engine.render_question(q)
+    text = f"*Вопрос {curr}/{total}*\n{bar}\n" + engine.render_current(user_id)
 
     # клавиатура
-    if q["type"] == "single":
-        markup = build_single_kb(q)
-    elif q["type"] == "multi":
-        MULTI_BUF.setdefault(user_id, set())
-        markup = build_multi_kb(q, MULTI_BUF[user_id])
+    if qtype == "single":
+        markup = single_kb(s.index.letters[qid])
+    elif qtype == "multi":
+        markup = multi_kb(s.index.letters[qid], s.selected)
     else:
         markup = None  # free
+    return text, markup
 
-    if message_to_edit:
-        try:
-            await message_to_edit.edit_text(text, reply_markup=markup)
-            return
-        except Exception:
-            pass
-    await bot.send_message(chat_id, text, reply_markup=markup)
-
-async def _remove_keyboard_safe(msg: Message):
-    try:
-        await msg.edit_reply_markup(reply_markup=None)
-    except Exception:
-        # Уже убрали/сообщение недоступно — просто игнорируем
-        pass
+def queue_question(out: Outbox, chat_id: int, user_id: int):
+    text, markup = question_payload(user_id)
+    # кнопки принимаем только с этого сообщения — повторные тапы по старым игнорируем
+    out.send(chat_id, text, reply_markup=markup, on_sent=lambda sent: engine.bind_message(user_id, sent.message_id))
 
-async def handle_result(m: Message, user_id: int, res: dict):
-    """Единая обработка результата engine.check(...)."""
-    await m.answer(res["feedback"])
+def queue_result(out: Outbox, chat_id: int, user_id: int, res: dict):
+    """Единая обработка результата engine.check(...): ставим сообщения в очередь по порядку."""
+    out.send(chat_id, res["feedback"])
     if res["done"]:
-        await m.answer(res["summary"])
+        out.send(chat_id, res["summary"])
         sticker_id = res.get("sticker_id")
         if sticker_id:
-            await m.answer_sticker(sticker_id)
-        await m.answer("Продолжим? 👇", reply_markup=build_post_results_kb(CHANNEL_URL))
+            out.send_sticker(chat_id, sticker_id)
+        out.send(chat_id, "Продолжим? 👇", reply_markup=build_post_results_kb(CHANNEL_URL))
     else:
-        await send_question(m.chat.id, user_id)
+        queue_question(out, chat_id, user_id)
 
-def render_answered_question(q: dict, user_answers: list[str], curr: int, total: int) -> str:
-    correct = set(a.lower() for a in (q["answer"] if isinstance(q["answer"], list) else [q["answer"]]))
-    user = set(a.lower() for a in user_answers)
+def render_answered_question(index: QuestionIndex, qid: int, user_mask: int, curr: int, total: int) -> str:
+    q = index.get(qid)
+    correct = index.answer_mask[qid]
 
     lines = [f"*Вопрос {curr}/{total}*", progress_bar(curr, total), f"🔎 *Q:* {q['text']}\n"]
-    for letter, text in q["options"].items():
-        if letter in correct and letter in user:
+    for i, (letter, text) in enumerate(q["options"].items()):
+        bit = 1 << i
+        if correct & bit:
             mark = "✅"
-        elif letter in correct:
-            mark = "✅"
-        elif letter in user:
+        elif user_mask & bit:
             mark = "❌"
         else:
             mark = "▫️"
         lines.append(f"{mark} {letter.upper()}) {text}")
     return "\n".join(lines)
 
-# === aiogram runtime ===
-bot = Bot(
-    token=TELEGRAM_TOKEN,
-    default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN),
-)
-dp = Dispatcher()
+# === Сборка приложения ===
+# Бот, движок и сервисы создаются не при импорте, а фабрикой: main() собирает их параллельно
+# с сетевыми вызовами, create_app() — синхронно для воркеров, бенчмарков и инструментов.
+# До сборки этих имён в модуле нет; обращение app.engine извне соберёт всё само (__getattr__ ниже).
+_APP_ATTRS = frozenset({"bot", "dp", "limiter", "packs", "engine", "watcher", "reports", "broadcaster"})
+
+def _create_bot() -> None:
+    global bot, dp, limiter
+    validate_settings()
+    bot = Bot(
+        token=TELEGRAM_TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None,
+        default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN),
+    )
+    dp = Dispatcher()
+    # RATE_GLOBAL=0 — без лимитера (локальные прогоны/бенчмарки); ведро в каждом процессе своё,
+    # поэтому воркеры делят общий лимит бота поровну
+    limiter = (ChatRateLimiter(RATE_GLOBAL / max(1, WORKERS), RATE_PER_CHAT, RATE_CHAT_BURST)
+               if RATE_GLOBAL > 0 else None)
+
+def _create_engine(loaded_packs: Dict[str, Any], tags_map: Dict[str, str]) -> None:
+    """Движок и сервисы поверх уже загруженных пакетов; бот к этому моменту создан."""
+    global packs, engine, watcher, reports, broadcaster
+    packs = loaded_packs
+    engine = QuizEngine(packs, virtual_packs={MIXED_CODE: MIXED_LEVELS}, tags_map=tags_map)
+    # правки пакетов/карты тегов подхватываются на лету, начатые сессии доигрывают старую версию
+    watcher = PackWatcher(engine, PACKS_DIR, interval=PACKS_WATCH_INTERVAL)
+    session_limits = dict(max_size=SESSION_MAX, ttl=SESSION_TTL, sweep_interval=SESSION_SWEEP_INTERVAL)
+    if SESSION_BACKEND == "sqlite":
+        # сессии (и выбор в multi-вопросах) переживают рестарт; запись — пачками в фоне
+        engine.sessions = SqliteSessionStore(DB_PATH, engine.dump_session, engine.load_session,
+                                             flush_interval=SESSION_FLUSH_INTERVAL, **session_limits)
+    else:
+        engine.sessions = MemorySessionStore(**session_limits)
+    if STATS_ENABLED:
+        engine.stats = StatsStore(DB_PATH, flush_interval=STATS_FLUSH_INTERVAL, capacity=STATS_BUFFER)
+    if ADAPTIVE_SELECTION:
+        engine.selector = AdaptiveSelector()
+    if LEADERBOARD_ENABLED:
+        engine.leaderboard = Leaderboard(DB_PATH, flush_interval=LEADERBOARD_FLUSH_INTERVAL)
+    if REMINDERS_ENABLED:
+        # напоминания идут через тот же лимитер, что и ответы пользователям
+        engine.reminders = Reminders(bot, DB_PATH, limiter, rate=REMINDERS_RATE, tick=REMINDERS_TICK)
+    broadcaster = Broadcaster(bot, DB_PATH, limiter, rate=BROADCAST_RATE, senders=BROADCAST_SENDERS)
+    reports = AdminReports(engine, ttl=ADMIN_STATS_TTL)
+    engine.check = timed("engine.check")(engine.check)
+    _SINGLE_KB.update(
+        (letters, _build_single_kb(letters))
+        for letters in {tuple(q["options"]) for q in engine.index.questions if q["type"] == "single"}
+    )
+
+def create_app() -> None:
+    """Собрать всё синхронно: пакеты и карта тегов читаются в пуле потоков, пока создаётся бот."""
+    if "engine" in globals():
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(2) as pool:
+        packs_f = pool.submit(load_packs, PACKS_DIR)
+        tags_f = pool.submit(load_tags_map)
+        _create_bot()
+        _create_engine(packs_f.result(), tags_f.result())
+
+def __getattr__(name: str):
+    if name in _APP_ATTRS:
+        create_app()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def broadcast_confirm_kb(bid: int, total: int):
+    kb = InlineKeyboardBuilder()
+    kb.button(text=f"✅ Разослать ({total})", callback_data=f"bc:go:{bid}")
+    kb.button(text="✖️ Отмена", callback_data=f"bc:no:{bid}")
+    kb.adjust(1)
+    return kb.as_markup()
+
+async def health(request):
+    """Проба для балансировщика/оркестратора: процесс жив и принимает апдейты."""
+    from aiohttp import web
+
+    return web.json_response({"status": "ok", "env": ENV, "mode": BOT_MODE, "sessions": len(engine.sessions)})
+
+async def prepare_transport(probe: bool = False) -> None:
+    """
+    Сетевая часть старта — идёт параллельно с загрузкой пакетов. probe — только getMe
+    (профиль старта не должен трогать вебхук и сбрасывать накопившиеся апдейты).
+    """
+    if probe:
+        try:
+            await bot.get_me(request_timeout=10)
+        except Exception as e:
+            print(f"[warn] get_me failed: {e}")
+    elif BOT_MODE == "webhook":
+        await bot.set_webhook(
+            f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            drop_pending_updates=True,
+        )
+    else:
+        # 👉 Авто-сброс вебхука перед запуском long polling
+        try:
+            await bot.delete_webhook(drop_pending_updates=True)
+        except Exception as e:
+            print(f"[warn] delete_webhook failed: {e}")
 
-async def main():
-    # 👉 Авто-сброс вебхука перед запуском long polling
+async def run_polling():
+    await dp.start_polling(bot)
+
+async def run_webhook():
+    """Локальный aiohttp-сервер: Telegram шлёт апдейты POST'ом, проверяем secret token."""
+    # серверная часть aiohttp нужна только в режиме webhook — при polling её не импортируем
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+    web_app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET or None).register(web_app, path=WEBHOOK_PATH)
+    web_app.router.add_get("/healthz", health)
+    setup_application(web_app, dp, bot=bot)
+
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    print(f"[info] webhook listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+def install_metrics(dp: Dispatcher) -> None:
+    """Middleware хендлеров и запросов к Bot API плюс гауги процесса."""
+    handler_mw = HandlerMetricsMiddleware(METRICS)
+    dp.message.middleware(handler_mw)
+    dp.callback_query.middleware(handler_mw)
+    bot.session.middleware(ApiMetricsMiddleware(METRICS))
+
+    METRICS.gauge("sessions_active", lambda: len(engine.sessions))
+    for key in ("hits", "misses", "evictions", "expirations"):
+        METRICS.gauge(f"session_cache_{key}_total", lambda key=key: engine.sessions.stats()[key], "counter")
+    METRICS.gauge("questions", lambda: len(engine.index))
+    METRICS.gauge("pack_reloads_total", lambda: watcher.reloads, "counter")
+    METRICS.gauge("pack_reload_failures_total", lambda: watcher.failures, "counter")
+    METRICS.gauge("pack_reload_last_seconds", lambda: watcher.last_ms / 1000)
+    if engine.stats is not None:
+        METRICS.gauge("stats_buffered", lambda: engine.stats.stats()["buffered"])
+        METRICS.gauge("stats_dropped_total", lambda: engine.stats.dropped, "counter")
+    if engine.leaderboard is not None:
+        METRICS.gauge("leaderboard_players", lambda: len(engine.leaderboard.all_time))
+        METRICS.gauge("leaderboard_week_players", lambda: len(engine.leaderboard.week))
+    if engine.reminders is not None:
+        METRICS.gauge("reminders_scheduled", lambda: len(engine.reminders.wheel))
+        METRICS.gauge("reminders_queued", lambda: len(engine.reminders._queue))
+        METRICS.gauge("reminders_sent_total", lambda: engine.reminders.sent, "counter")
+    METRICS.gauge("broadcast_queued", lambda: broadcaster.stats()["queued"])
+    METRICS.gauge("broadcast_sent_total", lambda: broadcaster.sent, "counter")
+    METRICS.gauge("broadcast_retry_after_total", lambda: broadcaster.retry_after, "counter")
+    METRICS.gauge("rate_limited_chats", lambda: len(limiter) if limiter else 0)
+
+async def start_metrics(port_offset: int = 0) -> MetricsServer | None:
+    if not METRICS.enabled:
+        return None
+    server = MetricsServer(METRICS, METRICS_HOST, METRICS_PORT + port_offset)
+    await server.start()
+    return server
+
+async def start_services(profile: StartupProfile | None = None, owns=None,
+                         run_broadcasts: bool = True) -> asyncio.Task:
+    """
+    Поднять фоновые сервисы. Нужное для приёма апдейтов (сессии, рассылка, слежение за
+    пакетами) дожидаемся; прогрев — статистика -> адаптивный подбор, рейтинг, напоминания —
+    уходит в возвращаемую задачу: апдейты принимаются сразу, пока рейтинг и история догружаются.
+    """
+    profile = profile or StartupProfile()
+    await asyncio.gather(
+        profile.run("sessions", engine.sessions.start()),
+        profile.run("broadcast", broadcaster.start(run=run_broadcasts)),
+        profile.run("pack watcher", watcher.start()),
+    )
+    return asyncio.create_task(_warm_up(profile, owns))
+
+async def _warm_up(profile: StartupProfile, owns) -> None:
+    async def stats_and_selector():
+        if engine.stats:
+            await profile.run("stats", engine.stats.start())
+        await profile.run("adaptive warm-up", warm_selector(owns))
+
+    jobs = [stats_and_selector()]
+    if engine.leaderboard:
+        jobs.append(profile.run("leaderboard", engine.leaderboard.start()))
+    if engine.reminders:
+        jobs.append(profile.run("reminders", engine.reminders.start(owns)))
+    for res in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(res, Exception):
+            print(f"[warn] warm-up failed: {res!r}")
+
+async def stop_services(warm_up: asyncio.Task) -> None:
+    warm_up.cancel()
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-    except Exception as e:
-        print(f"[warn] delete_webhook failed: {e}")
+        await warm_up
+    except asyncio.CancelledError:
+        pass
+    await watcher.close()
+    await broadcaster.close()
+    if engine.reminders:
+        await engine.reminders.close()
+    if engine.leaderboard:
+        await engine.leaderboard.close()
+    if engine.stats:
+        await engine.stats.close()
+    await engine.sessions.close()
+
+def register_handlers(dp: Dispatcher) -> None:
+    """Регистрация всех хендлеров; общая для polling/webhook и для воркеров."""
+    # апдейты одного пользователя — строго по очереди (двойные тапы не обгоняют друг друга)
+    serial = UserSerialMiddleware()
+    dp.message.outer_middleware(serial)
+    dp.callback_query.outer_middleware(serial)
+    if METRICS.enabled:
+        install_metrics(dp)
 
     # /start — сначала выбираем уровень
     @dp.message(F.text == "/start")
     async def cmd_start(m: Message):
-        if not packs:
+        if not engine.packs:
             await m.answer("Технические неполадки 🤖 \n Выбери другой уровень.")
             return
         await m.answer(
@@ -188,10 +437,130 @@ async def main():
     @dp.message(F.text == "/version")
     async def version(m: Message):
         if is_admin(m.from_user.id):
-            await m.answer(f"🤖 Окружение: *{ENV}* (админ-режим)", parse_mode=ParseMode.MARKDOWN)
+            st = engine.sessions.stats()
+            rl = watcher.stats()
+            await m.answer(
+                f"🤖 Окружение: *{ENV}* (админ-режим)\n"
+                f"Сессии: {st['size']} (hits {st['hits']}, misses {st['misses']}, "
+                f"evictions {st['evictions']}, expired {st['expirations']})\n"
+                f"Пакеты: {len(engine.packs)}, вопросов {len(engine.index)}; перезагрузок {rl['reloads']} "
+                f"(теги {rl['tags_reloads']}), ошибок {rl['failures']}, последняя {rl['last_ms']} мс"
+                + (f"\nСтатистика: записано {ev['written']}, в буфере {ev['buffered']}, потеряно {ev['dropped']}"
+                   if (ev := engine.stats and engine.stats.stats()) else ""),
+                parse_mode=ParseMode.MARKDOWN,
+            )
         else:
             await m.answer("Бот работает ✅")
 
+    # /stats, /hardest — отчёты из агрегатов, с кэшем (см. admin_stats.py)
+    @dp.message(F.text == "/stats")
+    async def admin_stats(m: Message):
+        if not is_admin(m.from_user.id):
+            await m.answer("Команда доступна только администраторам")
+            return
+        await m.answer(await reports.stats_report.get(), parse_mode=ParseMode.MARKDOWN)
+
+    @dp.message(F.text == "/hardest")
+    async def admin_hardest(m: Message):
+        if not is_admin(m.from_user.id):
+            await m.answer("Команда доступна только администраторам")
+            return
+        await m.answer(await reports.hardest_report.get(), parse_mode=ParseMode.MARKDOWN)
+
+    @dp.message(F.text == "/top")
+    async def top(m: Message):
+        if engine.leaderboard is None:
+            await m.answer("Рейтинг сейчас выключен")
+            return
+        await m.answer(await engine.leaderboard.render_top(m.from_user.id, LEADERBOARD_TOP),
+                       parse_mode=ParseMode.MARKDOWN)
+
+    # /broadcast текст — черновик с предпросмотром; /broadcast_status, /broadcast_stop (см. broadcast.py)
+    @dp.message(F.text.startswith("/broadcast"))
+    async def admin_broadcast(m: Message):
+        if not is_admin(m.from_user.id):
+            await m.answer("Команда доступна только администраторам")
+            return
+        cmd, *rest = m.text.split(maxsplit=1)
+        if cmd == "/broadcast_status":
+            p = await broadcaster.progress()
+            await m.answer(render_progress(p, BROADCAST_RATE) if p else "Рассылок ещё не было",
+                           parse_mode=ParseMode.MARKDOWN)
+            return
+        if cmd == "/broadcast_stop":
+            p = await broadcaster.progress()
+            stopped = p is not None and p.status == "running" and await broadcaster.cancel(p.id)
+            await m.answer(f"Рассылка #{p.id} остановлена" if stopped else "Сейчас ничего не рассылается")
+            return
+        if cmd != "/broadcast" or not rest:
+            await m.answer("Формат: /broadcast текст сообщения (Markdown)\nПрогресс: /broadcast_status, стоп: /broadcast_stop")
+            return
+        text = rest[0]
+        bid, total = await broadcaster.create(m.from_user.id, text)
+        try:
+            await m.answer(text)  # предпросмотр ровно в том виде, в каком уйдёт пользователям
+        except TelegramBadRequest as e:
+            await broadcaster.cancel(bid)
+            await m.answer(f"Telegram не принял разметку, рассылка отменена: {e.message}", parse_mode=None)
+            return
+        await m.answer(f"👆 Так увидят сообщение {total} пользователей. Разослать?",
+                       reply_markup=broadcast_confirm_kb(bid, total))
+
+    @dp.callback_query(F.data.startswith("bc:"))
+    async def admin_broadcast_confirm(c: CallbackQuery):
+        if not is_admin(c.from_user.id):
+            await c.answer()
+            return
+        _, action, bid = c.data.split(":")
+        if action == "go":
+            ok = await broadcaster.confirm(int(bid))
+            note = "📣 Рассылка запущена. Прогресс: /broadcast_status" if ok else "Рассылка уже запущена или отменена"
+        else:
+            await broadcaster.cancel(int(bid))
+            note = "Рассылка отменена"
+        out = Outbox(bot, limiter)
+        out.remove_keyboard(c.message)
+        out.send(c.message.chat.id, note)
+        out.answer_callback(c)
+        await out.flush()
+
+    # Интервальные повторения (см. reminders.py)
+    @dp.message(F.text == "/remind")
+    async def remind(m: Message):
+        if engine.reminders is None:
+            await m.answer("Напоминания сейчас выключены")
+            return
+        on = not engine.reminders.is_enabled(m.from_user.id)
+        engine.reminders.set_enabled(m.from_user.id, on)
+        if on:
+            await m.answer("🔁 Готово! Вопросы, где ты ошибёшься, я предложу повторить через 1, 3, 7, 16 и 35 дней.\n"
+                           "Повторить прямо сейчас: /review. Выключить: /remind")
+        else:
+            await m.answer("Напоминания выключены, очередь повторения очищена.")
+
+    async def begin_review(user_id: int, chat_id: int, out: Outbox) -> bool:
+        keys = await engine.reminders.review_keys(user_id) if engine.reminders is not None else []
+        n = engine.start_review(user_id, keys)
+        if not n:
+            out.send(chat_id, "Повторять пока нечего 🎉 Пройди тест: /start")
+            return False
+        out.send(chat_id, f"🔁 Повторение: {n} вопрос(ов), где ты ошибался")
+        queue_question(out, chat_id, user_id)
+        return True
+
+    @dp.message(F.text == "/review")
+    async def review(m: Message):
+        out = Outbox(bot, limiter)
+        await begin_review(m.from_user.id, m.chat.id, out)
+        await out.flush()
+
+    @dp.callback_query(F.data == "review:start")
+    async def review_start(c: CallbackQuery):
+        out = Outbox(bot, limiter)
+        await begin_review(c.from_user.id, c.message.chat.id, out)
+        out.answer_callback(c)
+        await out.flush()
+
     # Выбор уровня: сразу запускаем раунд
     @dp.callback_query(F.data.startswith("level:"))
     async def choose_level(c: CallbackQuery):
@@ -199,9 +568,7 @@ async def main():
 
         # Определяем код пакета по выбранному уровню
         if level == "random":
-            packs["mixed"] = build_mixed_pack(("junior", "advanced"))
-            engine.packs = packs
-            code = "mixed"
+            code = MIXED_CODE if engine.index.pool(pack=MIXED_CODE) else None
         elif level == "junior":
             code = pick_random_pack(["junior"])
         elif level == "advanced":
@@ -216,22 +583,24 @@ async def main():
 
         # Стартуем сессию (внутри выберется 10 случайных вопросов)
         engine.start_session(c.from_user.id, code)
+        if engine.leaderboard is not None:
+            engine.leaderboard.set_name(c.from_user.id, c.from_user.full_name)
 
-        # Отправляем первый вопрос с кнопками при необходимости
-        await send_question(c.message.chat.id, c.from_user.id)
-        await c.answer()
+        # Отправляем первый вопрос с кнопками при необходимости; ответ на колбэк — параллельно
+        out = Outbox(bot, limiter)
+        queue_question(out, c.message.chat.id, c.from_user.id)
+        out.answer_callback(c)
+        await out.flush()
 
     # Дежурные команды
     @dp.message(F.text == "/cancel")
     async def cancel(m: Message):
         engine.sessions.pop(m.from_user.id, None)
-        MULTI_BUF.pop(m.from_user.id, None)
         await m.answer("Сессию остановили. Напиши /start, чтобы начать заново.")
 
     @dp.message(F.text == "/startover")
     async def startover(m: Message):
         engine.sessions.pop(m.from_user.id, None)
-        MULTI_BUF.pop(m.from_user.id, None)
         await m.answer("Ок, начнём заново ⚒️. Выбери уровень:", reply_markup=build_levels_kb())
 
     @dp.callback_query(F.data == "menu:quiz")
@@ -242,83 +611,73 @@ async def main():
     # === НОВОЕ: ответы кнопками ===
     @dp.callback_query(F.data.startswith("ans:"))
     async def on_single_answer(c: CallbackQuery):
-        if not engine.has_active(c.from_user.id):
+        if not engine.is_active_on(c.from_user.id, c.message.message_id):
             await c.answer();
             return
 
-        # Сразу отключим клавиатуру у сообщения с вопросом
-        await _remove_keyboard_safe(c.message)
-
         letter = c.data.split(":", 1)[1]
 
         # Берём вопрос и прогресс ДО инкремента
-        q = engine.get_current(c.from_user.id)
         s = engine.sessions[c.from_user.id]
-        curr = s["idx"] + 1
-        total = len(s["questions"])
+        qid = s.qids[s.idx]
+        curr = s.idx + 1
+        total = s.total
 
-        res = engine.check(c.from_user.id, letter)
+        mask = s.index.option_bit(qid, letter)
+        res = engine.check(c.from_user.id, mask)
 
-        try:
-            await c.message.edit_text(render_answered_question(q, [letter], curr, total))
-        except Exception:
-            pass
-
-        MULTI_BUF.pop(c.from_user.id, None)
-        await handle_result(c.message, c.from_user.id, res)
-        await c.answer("Ответ принят")
+        out = Outbox(bot, limiter)
+        # отключаем клавиатуру у вопроса: сольётся с правкой текста ниже (останется запасным вариантом)
+        out.remove_keyboard(c.message)
+        out.edit_text(c.message, render_answered_question(s.index, qid, mask, curr, total))
+        queue_result(out, c.message.chat.id, c.from_user.id, res)
+        out.answer_callback(c, "Ответ принят")
+        await out.flush()
 
     @dp.callback_query(F.data.startswith("toggle:"))
     async def on_multi_toggle(c: CallbackQuery):
-        if not engine.has_active(c.from_user.id):
+        if not engine.is_active_on(c.from_user.id, c.message.message_id):
             await c.answer()
             return
         letter = c.data.split(":", 1)[1]
-        sel = MULTI_BUF.setdefault(c.from_user.id, set())
-        if letter in sel:
-            sel.remove(letter)
-        else:
-            sel.add(letter)
+        sel = engine.toggle_option(c.from_user.id, letter)
 
-        q = engine.get_current(c.from_user.id)
-        await c.message.edit_reply_markup(reply_markup=build_multi_kb(q, sel))
-        await c.answer()
+        out = Outbox(bot, limiter)
+        out.edit_markup(c.message, multi_kb(engine.current_letters(c.from_user.id), sel))
+        out.answer_callback(c)
+        await out.flush()
 
     @dp.callback_query(F.data == "multi:reset")
     async def on_multi_reset(c: CallbackQuery):
-        if not engine.has_active(c.from_user.id):
+        if not engine.is_active_on(c.from_user.id, c.message.message_id):
             await c.answer();
             return
-        MULTI_BUF[c.from_user.id] = set()
-        q = engine.get_current(c.from_user.id)
-        await c.message.edit_reply_markup(reply_markup=build_multi_kb(q, MULTI_BUF[c.from_user.id]))
-        await c.answer("Сброшено")
+        sel = engine.reset_selection(c.from_user.id)
+        out = Outbox(bot, limiter)
+        out.edit_markup(c.message, multi_kb(engine.current_letters(c.from_user.id), sel))
+        out.answer_callback(c, "Сброшено")
+        await out.flush()
 
     @dp.callback_query(F.data == "multi:submit")
     async def on_multi_submit(c: CallbackQuery):
-        if not engine.has_active(c.from_user.id):
+        if not engine.is_active_on(c.from_user.id, c.message.message_id):
             await c.answer();
             return
 
-        # Отключим клавиатуру перед обработкой
-        await _remove_keyboard_safe(c.message)
-
-        sel = sorted(MULTI_BUF.get(c.from_user.id, set()))
-        q = engine.get_current(c.from_user.id)
         s = engine.sessions[c.from_user.id]
-        curr = s["idx"] + 1
-        total = len(s["questions"])
-
-        res = engine.check(c.from_user.id, ",".join(sel))
+        qid = s.qids[s.idx]
+        sel = s.selected
+        curr = s.idx + 1
+        total = s.total
 
-        try:
-            await c.message.edit_text(render_answered_question(q, sel, curr, total))
-        except Exception:
-            pass
+        res = engine.check(c.from_user.id, sel)
 
-        MULTI_BUF.pop(c.from_user.id, None)
-        await handle_result(c.message, c.from_user.id, res)
-        await c.answer("Ответ отправлен")
+        out = Outbox(bot, limiter)
+        out.remove_keyboard(c.message)
+        out.edit_text(c.message, render_answered_question(s.index, qid, sel, curr, total))
+        queue_result(out, c.message.chat.id, c.from_user.id, res)
+        out.answer_callback(c, "Ответ отправлен")
+        await out.flush()
 
     # === Текстовые ответы: только для free ===
     @dp.message()
@@ -335,9 +694,63 @@ async def main():
 
         # free — принимаем текст
         res = engine.check(m.from_user.id, m.text or "")
-        await handle_result(m, m.from_user.id, res)
-
-    await dp.start_polling(bot)
+        out = Outbox(bot, limiter)
+        queue_result(out, m.chat.id, m.from_user.id, res)
+        await out.flush()
+
+async def main(profile: StartupProfile | None = None):
+    """
+    Холодный старт: пакеты и карта тегов читаются в пуле потоков, пока создаётся бот и идёт
+    сетевой вызов (снять/поставить вебхук); апдейты принимаем сразу после сборки движка и
+    подъёма сессий, прогрев статистики/рейтинга/напоминаний догоняет в фоне.
+    profile — только прогнать старт с замерами и выйти, без приёма апдейтов.
+    """
+    prof = profile or StartupProfile(_IMPORT_T0)
+    prof.add("imports", _IMPORT_T0, _IMPORT_T1)
+    loop = asyncio.get_running_loop()
+    packs_f = loop.run_in_executor(None, prof.wrap("packs", load_packs), PACKS_DIR)
+    tags_f = loop.run_in_executor(None, prof.wrap("tags map", load_tags_map))
+    with prof.phase("bot"):
+        _create_bot()
+    transport = asyncio.create_task(prof.run("transport", prepare_transport(probe=profile is not None)))
+    warm_up = None
+    try:
+        loaded_packs, tags_map = await asyncio.gather(packs_f, tags_f)
+        with prof.phase("engine"):
+            _create_engine(loaded_packs, tags_map)
+            register_handlers(dp)
+        warm_up = await start_services(prof)
+        await transport
+    except BaseException:
+        transport.cancel()
+        if warm_up is not None:
+            await stop_services(warm_up)
+        await bot.session.close()
+        raise
+    prof.mark("ready for updates")
+    metrics_server = await start_metrics()
+    try:
+        if profile is not None:
+            await warm_up
+            prof.mark("warmed up")
+            print(prof.report())
+        elif BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await run_polling()
+    finally:
+        if metrics_server:
+            await metrics_server.close()
+        await stop_services(warm_up)
+        if profile is not None:
+            await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if PROFILE_FLAG in sys.argv:
+        asyncio.run(main(StartupProfile(_IMPORT_T0)))
+    elif WORKERS > 1:
+        validate_settings()
+        from workers import run_sharded
+        run_sharded(WORKERS)
+    else:
+        asyncio.run(main())
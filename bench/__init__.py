@@ -0,0 +1,2 @@
+# Локальные бенчмарки: запуск из корня репозитория, например
+#   python -m bench.bench_startup
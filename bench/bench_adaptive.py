@@ -0,0 +1,106 @@
+"""
+Адаптивный подбор: задержка старта сессии при 100k пользователей с историей
+против равномерной выборки, качество (повторы, доля слабых тегов) и рост
+задержки с размером пакета (синтетические пакеты на 1k/10k/100k вопросов).
+
+    python -m bench.bench_adaptive --users 100000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from adaptive import AdaptiveSelector
+from packs_loader import load_packs
+from question_index import QuestionIndex
+
+def synthetic_packs(n: int, tags: int = 40) -> dict:
+    rnd = random.Random(n)
+    questions = [{
+        "id": f"s{i}", "type": "single", "text": f"q{i}", "options": {"a": "x", "b": "y"}, "answer": "a",
+        "tags": rnd.sample([f"t{j}" for j in range(tags)], 2),
+    } for i in range(n)]
+    return {"synthetic": {"pack": {"code": "synthetic", "level": "junior"}, "questions": questions}}
+
+def fill_history(sel: AdaptiveSelector, index: QuestionIndex, pool, users: int, answers: int,
+                 rnd: random.Random) -> None:
+    for u in range(users):
+        for qid in rnd.sample(pool, min(answers, len(pool))):
+            q = index.get(qid)
+            sel.observe(u, index.keys[qid], q.get("tags", ()), rnd.random() < 0.6)
+
+def time_draws(fn, users: int, starts: int, rnd: random.Random) -> list[float]:
+    times = []
+    for _ in range(starts):
+        u = rnd.randrange(users)
+        t0 = time.perf_counter()
+        fn(u)
+        times.append(time.perf_counter() - t0)
+    return times
+
+def pct(times: list[float], p: float) -> float:
+    return sorted(times)[int(p * (len(times) - 1))] * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100_000)
+    ap.add_argument("--answers", type=int, default=30, help="ответов в истории каждого пользователя")
+    ap.add_argument("--starts", type=int, default=20_000)
+    args = ap.parse_args()
+    rnd = random.Random(11)
+
+    index = QuestionIndex(load_packs("data/packs"))
+    pack = max(index.pack_meta, key=lambda c: len(index.by_pack.get(c, ())))
+    pool = index.by_pack[pack]
+
+    sel = AdaptiveSelector(rng=random.Random(1))
+    t0 = time.perf_counter()
+    fill_history(sel, index, pool, args.users, args.answers, rnd)
+    fill_s = time.perf_counter() - t0
+    mem = sum(
+        sys.getsizeof(h) + sys.getsizeof(h.seen) + sys.getsizeof(h.missed)
+        + (sys.getsizeof(h.tag_errors) if h.tag_errors else 0)
+        for h in sel.users.values()
+    )
+    print(f"{args.users} users x {args.answers} answers on '{pack}' ({len(pool)} q): "
+          f"history {fill_s:.1f} s, {mem / args.users:.0f} B/user")
+
+    uniform = time_draws(lambda u: index.sample(10, pack=pack), args.users, args.starts, rnd)
+    adaptive = time_draws(lambda u: sel.draw(u, index, pack, 10), args.users, args.starts, rnd)
+    for name, times in (("uniform", uniform), ("adaptive", adaptive)):
+        print(f"{name:<9} p50 {pct(times, 0.5):6.1f} µs   p99 {pct(times, 0.99):6.1f} µs")
+
+    # качество: повторы внутри сессии, уже виденные вопросы (и среди них — повтор ошибок),
+    # попадание в слабые теги
+    dup = seen_hits = missed_hits = weak_hits = total = 0
+    for u in rnd.sample(range(args.users), 2000):
+        h = sel.users[u]
+        weak = set(h.weak_tags(sel.n_weak_tags))
+        qids = sel.draw(u, index, pack, 10)
+        dup += len(qids) - len(set(qids))
+        for qid in qids:
+            total += 1
+            kid = sel.key_ids[index.keys[qid]]
+            seen_hits += h.seen >> kid & 1
+            missed_hits += h.missed >> kid & 1
+            weak_hits += bool(weak & set(index.get(qid).get("tags", ())))
+    base_weak = statistics.mean(
+        bool(set(sel.users[u].weak_tags(sel.n_weak_tags)) & set(index.get(q).get("tags", ())))
+        for u in rnd.sample(range(args.users), 2000) for q in index.sample(10, pack=pack)
+    )
+    print(f"quality: duplicates {dup}, already seen {seen_hits / total:.1%} "
+          f"(of them re-asked mistakes {missed_hits / total:.1%}), "
+          f"weak-tag questions {weak_hits / total:.1%} (uniform {base_weak:.1%})")
+
+    # масштабирование по размеру пакета
+    for n in (1_000, 10_000, 100_000):
+        big = QuestionIndex(synthetic_packs(n))
+        s = AdaptiveSelector(rng=random.Random(2))
+        fill_history(s, big, big.by_pack["synthetic"], 1000, args.answers, rnd)
+        s.draw(0, big, "synthetic", 10)  # префиксные суммы пулов строятся один раз
+        times = time_draws(lambda u: s.draw(u, big, "synthetic", 10), 1000, 5000, rnd)
+        print(f"pack {n:>7} q: adaptive p50 {pct(times, 0.5):6.1f} µs   p99 {pct(times, 0.99):6.1f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Админ опрашивает /stats и /hardest, пока пользователи проходят тесты: сколько
+раз реально строились отчёты (остальное — кэш) и насколько выросла задержка
+обработки ответов пользователей по сравнению с прогоном без админа.
+Статистика пишется во временную БД.
+
+    python -m bench.bench_admin_stats --users 300 --admin-every 0.005
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+os.environ["DB_PATH"] = os.path.join(_tmp.name, "stats.sqlite3")
+os.environ["ADMIN_IDS"] = "1"
+os.environ["STATS_FLUSH_INTERVAL"] = "0.1"
+
+import app  # noqa: E402
+from bench.fake_telegram import callback_update, message_update  # noqa: E402
+from bench.stub_session import StubSession  # noqa: E402
+
+ADMIN = 1
+
+async def play(users: int, first_uid: int, update_ids) -> list[float]:
+    times: list[float] = []
+
+    async def feed(update: dict) -> None:
+        t0 = time.perf_counter()
+        await app.dp.feed_raw_update(app.bot, update)
+        times.append(time.perf_counter() - t0)
+
+    async def user_flow(user_id: int) -> None:
+        await feed(callback_update(next(update_ids), user_id, "level:random"))
+        for _ in range(10):
+            s = app.engine.sessions.get(user_id)
+            if s is None:
+                return
+            q = app.engine.get_current(user_id)
+            if q["type"] == "free":
+                await feed(message_update(next(update_ids), user_id, "не знаю"))
+            else:
+                data = "multi:submit" if q["type"] == "multi" else "ans:" + next(iter(q["options"]))
+                await feed(callback_update(next(update_ids), user_id, data, message_id=s.msg_id))
+
+    await asyncio.gather(*(user_flow(first_uid + i) for i in range(users)))
+    return times
+
+async def run(users: int, admin_every: float) -> None:
+    app.bot.session = StubSession()
+    app.limiter = None
+    app.register_handlers(app.dp)
+    await app.engine.stats.start()
+    update_ids = iter(range(1, 10**9))
+
+    builds = {"stats": 0, "hardest": 0}
+    for name, report in (("stats", app.reports.stats_report), ("hardest", app.reports.hardest_report)):
+        orig = report.build
+
+        async def counted(orig=orig, name=name):
+            builds[name] += 1
+            return await orig()
+        report.build = counted
+
+    quiet = await play(users, 100_000, update_ids)
+    await app.engine.stats.flush()
+
+    polls = 0
+    stop = asyncio.Event()
+
+    async def admin_loop() -> None:
+        nonlocal polls
+        while not stop.is_set():
+            for cmd in ("/stats", "/hardest"):
+                await app.dp.feed_raw_update(app.bot, message_update(next(update_ids), ADMIN, cmd))
+                polls += 1
+            await asyncio.sleep(admin_every)
+
+    admin = asyncio.create_task(admin_loop())
+    busy = await play(users, 200_000, update_ids)
+    stop.set()
+    await admin
+    await app.engine.stats.close()
+
+    for name, times in (("without admin", quiet), ("admin polling", busy)):
+        print(f"{name:<14} updates {len(times):6}  p50 {statistics.median(times) * 1e3:6.2f} ms  "
+              f"p99 {sorted(times)[int(0.99 * (len(times) - 1))] * 1e3:6.2f} ms")
+    print(f"admin commands {polls}, reports built: stats {builds['stats']}, hardest {builds['hardest']} "
+          f"(ttl {app.reports.stats_report.ttl:g} s)")
+    print()
+    print(await app.reports.stats_report.get())
+    print()
+    print(await app.reports.hardest_report.get())
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=300)
+    ap.add_argument("--admin-every", type=float, default=0.005, help="пауза между опросами админа, сек")
+    args = ap.parse_args()
+    try:
+        asyncio.run(run(args.users, args.admin_every))
+    finally:
+        _tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
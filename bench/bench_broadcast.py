@@ -0,0 +1,156 @@
+"""
+Рассылка против фейкового Bot API (bench/fake_telegram.py) по HTTP: часть получателей
+заблокировала бота (403), каждый N-й sendMessage получает 429 с retry_after.
+
+1. Пропускная способность пула отправителей при высоком лимите.
+2. Соблюдение лимита rate.
+3. Штатная остановка посреди рассылки и продолжение новым экземпляром.
+4. kill -9 процесса-рассыльщика и продолжение.
+
+Везде проверяется, что ни один чат не получил сообщение дважды.
+
+    python -m bench.bench_broadcast --users 20000 --rate 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from bench.fake_telegram import FakeTelegramAPI
+from broadcast import Broadcaster, render_progress
+
+TOKEN = "123456:bench"
+
+def make_bot(api_url: str) -> Bot:
+    return Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+
+def seed_users(db: str, users: int) -> None:
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE IF NOT EXISTS players (user_id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    conn.executemany("INSERT OR IGNORE INTO players VALUES (?, ?)", ((u, f"u{u}") for u in range(1, users + 1)))
+    conn.commit()
+    conn.close()
+
+async def wait_done(b: Broadcaster, bid: int, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while (await b.progress(bid)).status == "running":
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"broadcast {bid} is still running")
+        await asyncio.sleep(0.1)
+
+def report(name: str, api: FakeTelegramAPI, p, elapsed: float) -> None:
+    dup = sum(1 for n in api.sent_to.values() if n > 1)
+    print(f"{name}: {p.sent} sent in {elapsed:.2f} s = {p.sent / elapsed:.0f} msg/s; "
+          f"blocked {p.blocked}, failed {p.failed}, claimed/unknown {p.claimed}, pending {p.pending}; "
+          f"429s {api.calls['sendMessage'] - sum(api.sent_to.values()) - p.blocked}, duplicates {dup}")
+
+async def phase(api: FakeTelegramAPI, api_url: str, db: str, name: str, rate: float, senders: int,
+                stop_at: float | None = None) -> None:
+    api.sent_to.clear()
+    api.calls.clear()
+    b = Broadcaster(make_bot(api_url), db, rate=rate, senders=senders, poll_interval=0.05)
+    await b.start()
+    bid, total = await b.create(0, f"📣 {name}")
+    await b.confirm(bid)
+    t0 = time.perf_counter()
+    if stop_at is not None:
+        while sum(api.sent_to.values()) < stop_at * total:
+            await asyncio.sleep(0.01)
+        await b.close()
+        await b.bot.session.close()
+        p = await asyncio.to_thread(_progress, db, bid)
+        print(f"{name}: stopped at {p.sent}/{total} sent, {p.pending} back in queue, claimed {p.claimed}")
+        b = Broadcaster(make_bot(api_url), db, rate=rate, senders=senders, poll_interval=0.05)
+        await b.start()
+    await wait_done(b, bid)
+    elapsed = time.perf_counter() - t0
+    report(name, api, await b.progress(bid), elapsed)
+    await b.close()
+    await b.bot.session.close()
+
+def _progress(db: str, bid: int):
+    b = Broadcaster(None, db)
+    b._conn = sqlite3.connect(db)
+    try:
+        return b._progress(bid)
+    finally:
+        b._conn.close()
+
+async def crash_phase(api: FakeTelegramAPI, api_url: str, db: str, rate: float, senders: int) -> None:
+    api.sent_to.clear()
+    api.calls.clear()
+    b = Broadcaster(make_bot(api_url), db, rate=rate, senders=senders, poll_interval=0.05)
+    await b.start(run=False)
+    bid, total = await b.create(0, "📣 crash")
+    await b.confirm(bid)
+    child = subprocess.Popen([sys.executable, "-m", "bench.bench_broadcast", "--child", api_url, db,
+                              "--rate", str(rate), "--senders", str(senders)])
+    while sum(api.sent_to.values()) < 0.4 * total:
+        await asyncio.sleep(0.01)
+    logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)  # оборванные соединения убитого процесса
+    os.kill(child.pid, signal.SIGKILL)
+    child.wait()
+    p = await b.progress(bid)
+    print(f"kill -9: at {p.sent} recorded / {sum(api.sent_to.values())} delivered, claimed {p.claimed}")
+    t0 = time.perf_counter()
+    await b.close()
+    b = Broadcaster(make_bot(api_url), db, rate=rate, senders=senders, poll_interval=0.05)
+    await b.start()
+    await wait_done(b, bid)
+    p = await b.progress(bid)
+    report("resumed after kill -9", api, p, time.perf_counter() - t0)
+    print(render_progress(p, rate))
+    await b.close()
+    await b.bot.session.close()
+
+async def child(api_url: str, db: str, rate: float, senders: int) -> None:
+    b = Broadcaster(make_bot(api_url), db, rate=rate, senders=senders, poll_interval=0.05)
+    await b.start()
+    await asyncio.Event().wait()
+
+async def run(args) -> None:
+    api = FakeTelegramAPI(latency=args.latency)
+    api_url = await api.start()
+    api.blocked = set(range(1, args.users + 1, 50))  # 2% заблокировали бота
+    api.flood_every = args.flood_every
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "broadcast.sqlite3")
+        seed_users(db, args.users)
+        print(f"{args.users} users, API latency {args.latency * 1000:g} ms, {args.senders} senders, "
+              f"429 every {args.flood_every} sends")
+        await phase(api, api_url, db, "throughput", args.rate, args.senders)
+        small = os.path.join(tmp, "small.sqlite3")
+        seed_users(small, args.cap_users)
+        await phase(api, api_url, small, f"rate cap {args.cap_rate:g}/s", args.cap_rate, args.senders)
+        await phase(api, api_url, db, "graceful stop + resume", args.rate, args.senders, stop_at=0.4)
+        await crash_phase(api, api_url, db, args.rate, args.senders)
+    await api.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=20_000)
+    ap.add_argument("--rate", type=float, default=2000)
+    ap.add_argument("--senders", type=int, default=32)
+    ap.add_argument("--latency", type=float, default=0.02, help="задержка ответа фейкового API, сек")
+    ap.add_argument("--flood-every", type=int, default=2000)
+    ap.add_argument("--cap-rate", type=float, default=50)
+    ap.add_argument("--cap-users", type=int, default=300)
+    ap.add_argument("--child", nargs=2, metavar=("API", "DB"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        asyncio.run(child(args.child[0], args.child[1], args.rate, args.senders))
+        return
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Свободные ответы: корректность и скорость старого сравнения подстрок против
+скомпилированного FreeAnswerMatcher на всех вопросах type: free из пакетов.
+
+Для каждого варианта ответа генерируются кейсы:
+  положительные — как есть, в другом регистре/с пунктуацией/ё, с опечаткой, внутри фразы;
+  отрицательные — варианты других вопросов и слова варианта, «спрятанные» внутри чужих слов
+  (как "read" внутри "already"), на которых подстроки дают ложное срабатывание.
+"""
+import argparse
+import random
+import timeit
+
+from packs_loader import load_packs
+from question_index import QuestionIndex
+
+def legacy_match(answers: list[str], answer_text: str) -> bool:
+    """Прежний QuizEngine._score_free: нормализация на каждый вызов и `w in user`."""
+    norm = lambda s: (s or "").strip().lower()  # noqa: E731
+    user = norm(answer_text)
+    if not user:
+        return False
+    variants = [norm(v) for v in answers]
+    if user in variants:
+        return True
+    for v in variants:
+        words = [w for w in v.split() if w]
+        if words and all(w in user for w in words):
+            return True
+    return False
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rnd.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+def build_cases(index: QuestionIndex, rnd: random.Random):
+    free = list(index.by_type.get("free", ()))
+    cases = []  # (qid, text, expected)
+    for qid in free:
+        answers = index.get(qid)["answer"]
+        for v in answers:
+            words = v.split()
+            cases.append((qid, v, True))
+            cases.append((qid, v.upper().replace("е", "ё") + "!", True))
+            cases.append((qid, "думаю, это " + ", ".join(words), True))
+            longest = max(words, key=len)
+            if len(longest) >= 5:
+                cases.append((qid, " ".join(_typo(w, rnd) if w == longest else w for w in words), True))
+            cases.append((qid, " ".join("pre" + w + "ly" for w in words), False))
+        for other in free:
+            if other != qid:
+                cases.append((qid, rnd.choice(index.get(other)["answer"]), False))
+    return cases
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=200)
+    args = ap.parse_args()
+
+    index = QuestionIndex(load_packs("data/packs"))
+    cases = build_cases(index, random.Random(7))
+    if not cases:
+        print("no free questions in packs")
+        return
+
+    def accuracy(fn) -> tuple[int, int, int]:
+        fp = fn_ = 0
+        for qid, text, expected in cases:
+            got = fn(qid, text)
+            fp += got and not expected
+            fn_ += expected and not got
+        return len(cases) - fp - fn_, fp, fn_
+
+    old = lambda qid, text: legacy_match(index.get(qid)["answer"], text)  # noqa: E731
+    new = lambda qid, text: index.matchers[qid].match(text)  # noqa: E731
+
+    print(f"{len(index.matchers)} free questions, {len(cases)} cases")
+    for name, fn in (("substring", old), ("matcher", new)):
+        ok, fp, fneg = accuracy(fn)
+        t = timeit.timeit(lambda: [fn(q, text) for q, text, _ in cases], number=args.number)
+        per_call = t / (args.number * len(cases))
+        print(f"{name:<10} correct {ok:4}/{len(cases)}  false+ {fp:3}  false- {fneg:3}  "
+              f"{per_call * 1e6:6.2f} µs/answer  {1 / per_call:10.0f} answers/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Рейтинг: цена submit() и place() при росте числа игроков (должна оставаться плоской),
+сверка мест с подсчётом «в лоб», смена недели, выгрузка в SQLite, подъём с нуля
+и синхронизация двух процессов через общий seq (как у воркеров).
+
+    python -m bench.bench_leaderboard --players 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from leaderboard import Leaderboard, to_key, week_of
+
+def fill(lb: Leaderboard, players: int, results: int, rnd: random.Random, ts: float) -> float:
+    t0 = time.perf_counter()
+    for _ in range(results):
+        lb.submit(rnd.randrange(players), rnd.betavariate(5, 3) * 10, 10, ts)
+    return (time.perf_counter() - t0) / results
+
+def check_ranks(lb: Leaderboard, rnd: random.Random, samples: int = 20) -> int:
+    best = lb.all_time.best
+    values = list(best.values())
+    bad = 0
+    for user_id in rnd.sample(list(best), min(samples, len(best))):
+        expected = 1 + sum(v > best[user_id] for v in values)
+        bad += lb.all_time.rank(user_id) != expected
+    return bad
+
+async def run(players: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    now = time.time()
+
+    print("players     submit µs   place µs")
+    for n in sorted({min(n, players) for n in (10_000, 100_000, players)}):
+        lb = Leaderboard(":memory:")
+        per_submit = fill(lb, n, 2 * n, rnd, now)
+        users = [rnd.randrange(n) for _ in range(10_000)]
+        t0 = time.perf_counter()
+        for u in users:
+            lb.place(u)
+        per_place = (time.perf_counter() - t0) / len(users)
+        print(f"{len(lb.all_time):>9}   {per_submit * 1e6:9.2f}   {per_place * 1e6:8.2f}")
+    print(f"rank mismatches vs brute force: {check_ranks(lb, rnd)}")
+
+    # смена недели: первая отправка новой недели заводит пустую таблицу, всё время — не трогается
+    next_week = (week_of(now) + 1) * 7 * 86400 - 3 * 86400 + 60
+    t0 = time.perf_counter()
+    place = lb.submit(1, 7.5, 10, next_week)
+    print(f"week rollover: {(time.perf_counter() - t0) * 1e6:.1f} µs, week board {place.week_of} player(s), "
+          f"all-time {place.of}, rollovers {lb.rollovers}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "lb.sqlite3")
+        n = min(players, 200_000)
+        a = Leaderboard(db, flush_interval=3600)
+        await a.start()
+        fill(a, n, n, rnd, now)
+        t0 = time.perf_counter()
+        await a.flush()
+        print(f"flush {len(a.all_time) + len(a.week)} rows: {time.perf_counter() - t0:.2f} s")
+
+        b = Leaderboard(db, flush_interval=3600)
+        t0 = time.perf_counter()
+        await b.start()
+        same = all(b.all_time.rank(u) == a.all_time.rank(u) for u in list(a.all_time.best)[:1000])
+        print(f"cold load {len(b.all_time)} players: {time.perf_counter() - t0:.2f} s, ranks match: {same}")
+
+        # «другой воркер» улучшает результат — первый видит его после своей выгрузки
+        uid = players + 1
+        b.submit(uid, 10, 10, now)
+        await b.flush()
+        await a.flush()
+        print(f"synced: new leader in other process -> rank {a.all_time.rank(uid)} "
+              f"(key {to_key(10, 10)}), players {len(a.all_time)}")
+        await a.close()
+        await b.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    asyncio.run(run(args.players, args.seed))
+
+if __name__ == "__main__":
+    main()
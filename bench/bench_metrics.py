@@ -0,0 +1,88 @@
+"""
+Цена инструментирования: один и тот же прогон пользователей через dp
+с METRICS_ENABLED=0 и =1 (каждый в своём процессе — флаг читается при импорте app),
+плюс выдержка из /metrics включённого прогона.
+
+    python -m bench.bench_metrics --users 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+async def child(users: int, port: int) -> None:
+    os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+    os.environ["STATS_ENABLED"] = "0"
+    import aiohttp
+    import app
+    from bench.fake_telegram import callback_update, message_update
+    from bench.stub_session import StubSession
+
+    app.bot.session = StubSession()
+    app.limiter = None
+    app.register_handlers(app.dp)
+    os.environ["METRICS_PORT"] = str(port)
+    server = await app.start_metrics() if app.METRICS.enabled else None
+    update_ids = iter(range(1, 10**9))
+    n = 0
+
+    async def feed(update: dict) -> None:
+        nonlocal n
+        n += 1
+        await app.dp.feed_raw_update(app.bot, update)
+
+    async def user_flow(user_id: int) -> None:
+        await feed(callback_update(next(update_ids), user_id, "level:random"))
+        for _ in range(10):
+            s = app.engine.sessions.get(user_id)
+            if s is None:
+                return
+            q = app.engine.get_current(user_id)
+            if q["type"] == "free":
+                await feed(message_update(next(update_ids), user_id, "не знаю"))
+            else:
+                data = "multi:submit" if q["type"] == "multi" else "ans:a"
+                await feed(callback_update(next(update_ids), user_id, data, message_id=s.msg_id))
+
+    t0 = time.perf_counter()
+    for start in range(0, users, 50):  # волнами, чтобы мерить обработку, а не очередь
+        await asyncio.gather(*(user_flow(10_000 + start + i) for i in range(min(50, users - start))))
+    elapsed = time.perf_counter() - t0
+
+    sample = ""
+    if server is not None:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"http://{app.METRICS_HOST}:{server.port}/metrics") as resp:
+                body = await resp.text()
+        sample = "\n".join(line for line in body.splitlines()
+                           if "_count" in line or "errors_total{" in line or line.startswith("quizbot_sessions"))
+        await server.close()
+    print(json.dumps({"updates": n, "elapsed": elapsed, "sample": sample}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=300)
+    ap.add_argument("--port", type=int, default=19108)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        asyncio.run(child(args.users, args.port))
+        return
+
+    results = {}
+    for flag in ("0", "1"):
+        env = dict(os.environ, METRICS_ENABLED=flag, METRICS_PORT=str(args.port))
+        out = subprocess.run([sys.executable, "-m", "bench.bench_metrics", "--child", "--users", str(args.users),
+                              "--port", str(args.port)], env=env, capture_output=True, text=True, check=True)
+        results[flag] = json.loads(out.stdout.strip().splitlines()[-1])
+    for flag, name in (("0", "metrics off"), ("1", "metrics on")):
+        r = results[flag]
+        print(f"{name:<12} {r['updates']} updates  {r['updates'] / r['elapsed']:8.0f} updates/s")
+    print(f"overhead {results['1']['elapsed'] / results['0']['elapsed'] - 1:+.1%}")
+    print(results["1"]["sample"])
+
+if __name__ == "__main__":
+    main()
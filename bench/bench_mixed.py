@@ -0,0 +1,40 @@
+"""Стоимость одного нажатия «🎲 Рандом»: пересборка смешанного пакета против виртуального пула."""
+import argparse
+import random
+import timeit
+
+from packs_loader import load_packs
+from quiz_engine import QuizEngine
+
+LEVELS = ("junior", "advanced")
+
+def rebuild_mixed(packs: dict) -> list:
+    """Старый путь: склеить и перемешать все вопросы уровней, затем взять 10."""
+    mixed = []
+    for data in packs.values():
+        if data.get("pack", {}).get("level") in LEVELS:
+            mixed.extend(data.get("questions", []))
+    random.shuffle(mixed)
+    return random.sample(mixed, min(10, len(mixed)))
+
+def scale_packs(packs: dict, factor: int) -> dict:
+    return {code: {"pack": data["pack"], "questions": data["questions"] * factor} for code, data in packs.items()}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=200)
+    args = ap.parse_args()
+
+    base = load_packs("data/packs")
+    for factor in (1, 10, 100):
+        packs = scale_packs(base, factor)
+        engine = QuizEngine(packs, virtual_packs={"mixed": LEVELS})
+        total = len(engine.index.pool(pack="mixed"))
+
+        before = timeit.timeit(lambda: rebuild_mixed(packs), number=args.number) / args.number
+        after = timeit.timeit(lambda: engine.start_session(1, "mixed"), number=args.number) / args.number
+        print(f"{total:>7} questions: rebuild {before * 1e6:10.1f} µs/click   "
+              f"virtual pack {after * 1e6:7.1f} µs/click   x{before / after:.0f}")
+
+if __name__ == "__main__":
+    main()
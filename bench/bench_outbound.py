@@ -0,0 +1,97 @@
+"""
+Задержка обработки одного ответа на стороне Bot API: последовательные вызовы
+(как было: снять клавиатуру, править текст, отзыв, следующий вопрос, ответ на колбэк)
+против Outbox с коалесцированием и параллельными независимыми вызовами.
+Bot API — локальный фейк с искусственной задержкой каждого запроса.
+
+Все ответы идут в один чат, как у живого пользователя, проходящего тест: Outbox — с
+боевыми лимитами (ChatRateLimiter по умолчанию), между ответами — время на раздумье.
+Задержка ответа не должна расти к концу теста.
+
+    python -m bench.bench_outbound --latency 0.03 --answers 20 --think 1.0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bench.fake_telegram import FakeTelegramAPI
+from outbound import ChatRateLimiter, Outbox
+
+def _question_msg(bot: Bot, chat_id: int) -> Message:
+    return Message(message_id=1, date=datetime.now(timezone.utc),
+                   chat=Chat(id=chat_id, type="private"), text="q").as_(bot)
+
+def _callback(bot: Bot, chat_id: int, msg: Message) -> CallbackQuery:
+    user = User(id=chat_id, is_bot=False, first_name="u")
+    return CallbackQuery(id=str(chat_id), from_user=user, chat_instance="x", data="ans:a", message=msg).as_(bot)
+
+async def sequential(bot: Bot, chat_id: int) -> None:
+    msg = _question_msg(bot, chat_id)
+    c = _callback(bot, chat_id, msg)
+    await msg.edit_reply_markup(reply_markup=None)
+    await msg.edit_text("answered")
+    await bot.send_message(chat_id, "feedback")
+    await bot.send_message(chat_id, "next question")
+    await c.answer("Ответ принят")
+
+async def pipelined(bot: Bot, chat_id: int, limiter: ChatRateLimiter) -> None:
+    msg = _question_msg(bot, chat_id)
+    c = _callback(bot, chat_id, msg)
+    out = Outbox(bot, limiter)
+    out.remove_keyboard(msg)
+    out.edit_text(msg, "answered")
+    out.send(chat_id, "feedback")
+    out.send(chat_id, "next question")
+    out.answer_callback(c, "Ответ принят")
+    await out.flush()
+
+async def run(latency: float, answers: int, think: float) -> None:
+    fake = FakeTelegramAPI(latency=latency)
+    url = await fake.start()
+    bot = Bot("123456:bench", session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    limiter = ChatRateLimiter()
+
+    async def measure(fn, *args) -> list[float]:
+        fake.calls.clear()
+        times = []
+        for i in range(answers):
+            if i:
+                await asyncio.sleep(think)
+            t0 = time.perf_counter()
+            await fn(bot, chat_id, *args)
+            times.append(time.perf_counter() - t0)
+        return times
+
+    chat_id = 50_000
+
+    before = await measure(sequential)
+    calls_before = sum(fake.calls.values())
+    after = await measure(pipelined, limiter)
+    calls_after = sum(fake.calls.values())
+
+    await bot.session.close()
+    await fake.close()
+
+    for name, times, calls in (("sequential", before, calls_before), ("outbox", after, calls_after)):
+        print(f"{name:<11} p50 {statistics.median(times) * 1000:7.1f} ms   "
+              f"max {max(times) * 1000:7.1f} ms   API calls/answer {calls / answers:.1f}")
+    print(f"x{statistics.median(before) / statistics.median(after):.2f} lower per-answer latency; "
+          f"outbox last answers {', '.join(f'{t * 1000:.0f}' for t in after[-3:])} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.03, help="задержка фейкового API на запрос, сек")
+    ap.add_argument("--answers", type=int, default=20, help="ответов подряд в одном чате (два теста)")
+    ap.add_argument("--think", type=float, default=1.0, help="пауза пользователя между ответами, сек")
+    args = ap.parse_args()
+    asyncio.run(run(args.latency, args.answers, args.think))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Горячая перезагрузка на копии data/: правим один пакет, ломаем YAML, меняем карту тегов.
+Проверяем, что начатая сессия доигрывает старую версию, новая получает новую,
+битый файл не подменяет индекс; печатаем время перезагрузки против полного старта.
+Ненулевой код выхода — если что-то из этого не так.
+
+    python -m bench.bench_reload
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+from pack_watcher import PackWatcher
+from packs_loader import load_packs
+from quiz_engine import QuizEngine
+
+def _touch_write(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    # mtime с грубым разрешением ФС мог не сдвинуться — сдвигаем явно
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+async def run(tmp: str) -> int:
+    packs_dir = os.path.join(tmp, "packs")
+    tags_path = os.path.join(tmp, "tags_map.yaml")
+    cache_dir = os.path.join(tmp, "cache")
+    shutil.copytree("data/packs", packs_dir)
+    shutil.copy("data/tags_map.yaml", tags_path)
+
+    t0 = time.perf_counter()
+    engine = QuizEngine(load_packs(packs_dir, cache_dir))
+    cold_ms = (time.perf_counter() - t0) * 1000
+    watcher = PackWatcher(engine, packs_dir, tags_path, interval=0.05, cache_dir=cache_dir)
+    await asyncio.to_thread(watcher._baseline)  # как в start(), но без фонового цикла — poll() зовём сами
+    problems = []
+
+    name = sorted(os.listdir(packs_dir))[0]
+    path = os.path.join(packs_dir, name)
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    code = data["pack"]["code"]
+
+    engine.start_session(1, code)
+    s_old = engine.sessions[1]
+    old_qid = s_old.qids[0]
+    old_text = s_old.index.get(old_qid)["text"]
+    key = s_old.index.keys[old_qid]
+
+    # 1) правка текста всех вопросов пакета
+    for q in data["questions"]:
+        q["text"] = "[v2] " + q["text"]
+    _touch_write(path, yaml.safe_dump(data, allow_unicode=True, sort_keys=False))
+    swapped = await watcher.poll()
+    reload_ms = watcher.last_ms
+    if not swapped:
+        problems.append("edited pack was not reloaded")
+    if engine.get_current(1)["text"] != old_text:
+        problems.append("in-flight session saw the new version")
+    if not engine.index.get(engine.index.by_key[key])["text"].startswith("[v2] "):
+        problems.append("new index has the old text")
+    engine.start_session(2, code)
+    if not engine.get_current(2)["text"].startswith("[v2] "):
+        problems.append("new session got the old version")
+    engine.check(1, "a")  # старая сессия продолжает отвечать на своём индексе
+
+    # 2) битый YAML — индекс прежний, ошибка посчитана
+    before = engine.index
+    _touch_write(path, "pack: [unclosed\n")
+    if await watcher.poll() or engine.index is not before or watcher.failures != 1:
+        problems.append("broken pack replaced the index or was not counted")
+    if await watcher.poll() or watcher.failures != 1:
+        problems.append("unchanged broken pack was re-read")
+
+    # 3) карта тегов
+    _touch_write(tags_path, yaml.safe_dump({"api": "API (v2)"}, allow_unicode=True))
+    await watcher.poll()
+    if engine.tags_map.get("api") != "API (v2)" or watcher.tags_reloads != 1:
+        problems.append("tags map was not reloaded")
+
+    print(f"cold load {cold_ms:6.1f} ms   one-pack reload {reload_ms:6.1f} ms   "
+          f"{len(engine.index)} questions   reloads {watcher.reloads} tags {watcher.tags_reloads} "
+          f"failures {watcher.failures}")
+    for p in problems:
+        print(f"  FAIL: {p}")
+    return 1 if problems else 0
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.exit(asyncio.run(run(tmp)))
+
+if __name__ == "__main__":
+    main()
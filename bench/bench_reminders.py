@@ -0,0 +1,117 @@
+"""
+Напоминания о повторении: колесо таймеров против кучи (heapq) на сотнях тысяч
+отложенных напоминаний — постановка, перестановка, прокрутка 40 дней и точность
+срабатываний. Затем сквозной прогон Reminders с заглушкой Bot API: результаты сессий
+-> SQLite -> колесо -> отправка с ограничением rate.
+
+    python -m bench.bench_reminders --pending 300000
+"""
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import tempfile
+import time
+
+from aiogram import Bot
+
+from bench.stub_session import StubSession
+from reminders import DAY, Reminders, TimingWheel
+
+def bench_wheel(pending: int, tick: float, rnd: random.Random) -> None:
+    horizon = int(40 * DAY / tick)
+    dues = {user_id: rnd.randrange(1, horizon) for user_id in range(pending)}
+
+    wheel = TimingWheel(0)
+    t0 = time.perf_counter()
+    for user_id, due in dues.items():
+        wheel.schedule(user_id, due)
+    t_schedule = time.perf_counter() - t0
+
+    # каждый десятый успевает пройти тест до срока — напоминание переставляется
+    moved = rnd.sample(range(pending), pending // 10)
+    t0 = time.perf_counter()
+    for user_id in moved:
+        dues[user_id] = rnd.randrange(1, horizon)
+        wheel.schedule(user_id, dues[user_id])
+    t_move = time.perf_counter() - t0
+
+    late = early = fired = 0
+    worst_tick = 0.0
+    t0 = time.perf_counter()
+    for t in range(1, horizon + 1):
+        s = time.perf_counter()
+        for user_id in wheel.advance(t):
+            fired += 1
+            late += dues[user_id] < t
+            early += dues[user_id] > t
+        worst_tick = max(worst_tick, time.perf_counter() - s)
+    t_advance = time.perf_counter() - t0
+
+    print(f"timing wheel: {pending} reminders, {horizon} ticks of {tick:g} s")
+    print(f"  schedule {t_schedule / pending * 1e6:.2f} µs, reschedule {t_move / len(moved) * 1e6:.2f} µs")
+    print(f"  advance {t_advance:.2f} s total, {t_advance / horizon * 1e6:.2f} µs/tick avg, "
+          f"worst tick {worst_tick * 1e3:.2f} ms")
+    print(f"  fired {fired}/{pending}, early {early}, late {late}, left {len(wheel)}")
+
+    # та же нагрузка на куче: перестановка — новая запись + ленивое удаление устаревших
+    heap = [(due, user_id) for user_id, due in dues.items()]
+    t0 = time.perf_counter()
+    heapq.heapify(heap)
+    current = dict(dues)
+    for user_id in moved:
+        current[user_id] = rnd.randrange(1, horizon)
+        heapq.heappush(heap, (current[user_id], user_id))
+    n = 0
+    for t in range(1, horizon + 1):
+        while heap and heap[0][0] <= t:
+            due, user_id = heapq.heappop(heap)
+            if current[user_id] == due:
+                current[user_id] = -1  # одинаковый срок после перестановки — запись-дубликат
+                n += 1
+    t_heap = time.perf_counter() - t0
+    print(f"heapq:        {t_heap:.2f} s for the same schedule + reschedule + advance ({n} fired)")
+
+async def bench_send(users: int, rate: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = Bot("123456:bench", session=StubSession())
+        rem = Reminders(bot, os.path.join(tmp, "rem.sqlite3"), rate=rate, tick=0.05, flush_interval=3600)
+        await rem.start()
+        for user_id in range(1, users + 1):
+            rem.set_enabled(user_id, True)
+        t0 = time.perf_counter()
+        for user_id in range(1, users + 1):
+            keys = [f"pack:q{i}" for i in range(10)]
+            rem.on_finished(user_id, keys, set(keys[:3]))
+        await rem.flush()
+        t_flush = time.perf_counter() - t0
+        print(f"\nreminders: {users} users, 3 missed each -> flush {t_flush:.2f} s, scheduled {len(rem.wheel)}")
+
+        # «прошли сутки»: сдвигаем сроки в прошлое прямо в БД и в колесе
+        await asyncio.to_thread(rem._conn.execute, "UPDATE review_items SET due = due - ?", (2 * DAY,))
+        for user_id in range(1, users + 1):
+            rem._schedule(user_id, time.time() - 1)
+        t0 = time.perf_counter()
+        while rem.sent < users:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - t0
+        print(f"  sent {rem.sent} in {elapsed:.2f} s = {rem.sent / elapsed:.1f} msg/s "
+              f"(cap {rate:g}/s after a burst of {rate:g}), API calls {dict(bot.session.calls)}")
+        print(f"  next nudge scheduled for {len(rem.wheel)} users, review keys of user 1: "
+              f"{await rem.review_keys(1)}")
+        await rem.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pending", type=int, default=300_000)
+    ap.add_argument("--tick", type=float, default=60, help="шаг колеса в бенчмарке, сек (в боте — REMINDERS_TICK)")
+    ap.add_argument("--users", type=int, default=300)
+    ap.add_argument("--rate", type=float, default=100)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    bench_wheel(args.pending, args.tick, random.Random(args.seed))
+    asyncio.run(bench_send(args.users, args.rate))
+
+if __name__ == "__main__":
+    main()
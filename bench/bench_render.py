@@ -0,0 +1,45 @@
+"""Стоимость одного показа вопроса и одного toggle: сборка с нуля против кэша."""
+import argparse
+import os
+import random
+import timeit
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+
+import app  # noqa: E402
+from quiz_engine import render_question_text  # noqa: E402
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=20000)
+    args = ap.parse_args()
+
+    index = app.engine.index
+    rnd = random.Random(1)
+    single = [qid for qid in index.by_type.get("single", ())]
+    multi = [qid for qid in index.by_type.get("multi", ())]
+
+    def render_old():
+        q = index.get(rnd.choice(single))
+        return render_question_text(q), app.build_single_kb(q)
+
+    def render_new():
+        qid = rnd.choice(single)
+        return index.rendered[qid], app.single_kb(index.letters[qid])
+
+    def toggle_old():
+        q = index.get(rnd.choice(multi))
+        return app.build_multi_kb(q, set(rnd.sample("abcd", rnd.randint(0, 4))))
+
+    def toggle_new():
+        qid = rnd.choice(multi)
+        return app.multi_kb(index.letters[qid], rnd.getrandbits(len(index.letters[qid])))
+
+    for name, old, new in (("question", render_old, render_new), ("multi toggle", toggle_old, toggle_new)):
+        t_old = timeit.timeit(old, number=args.number) / args.number
+        t_new = timeit.timeit(new, number=args.number) / args.number
+        print(f"{name:<13} rebuild {t_old * 1e6:7.2f} µs   cached {t_new * 1e6:6.2f} µs   x{t_old / t_new:.0f}")
+    print(app.multi_kb.cache_info())
+
+if __name__ == "__main__":
+    main()
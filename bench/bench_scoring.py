@@ -0,0 +1,77 @@
+"""
+Оценка ответов на кнопочные вопросы: прежнее сравнение множеств строк
+(буквы через запятую -> set) против масок, скомпилированных в индексе.
+Заодно сверяем, что баллы совпадают на всех single/multi и всех подмножествах вариантов.
+"""
+import argparse
+import random
+import re
+import sys
+import timeit
+
+from packs_loader import load_packs
+from quiz_engine import QuizEngine
+
+def legacy_score(q: dict, answer_text: str) -> tuple[float, bool]:
+    """Прежние QuizEngine._score_single/_score_multi."""
+    norm = lambda s: (s or "").strip().lower()  # noqa: E731
+    if q["type"] == "single":
+        ok = norm(answer_text) == norm(q["answer"])
+        return (1.0 if ok else 0.0, ok)
+    correct = set(norm(x) for x in q["answer"])
+    user = {p.lower() for p in re.split(r"[,\s;]+", (answer_text or "").strip()) if p}
+    if not user:
+        return (0.0, False)
+    if user == correct:
+        return (1.0, True)
+    precision = len(user & correct) / len(correct)
+    wrong_penalty = len(user - correct) / max(1, len(correct))
+    return (round(max(0.0, precision - 0.3 * wrong_penalty), 2), False)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=200000)
+    args = ap.parse_args()
+
+    engine = QuizEngine(load_packs("data/packs"))
+    index = engine.index
+    choice = [qid for t in ("single", "multi") for qid in index.by_type.get(t, ())]
+
+    mismatches = 0
+    for qid in choice:
+        q = index.get(qid)
+        score = engine._score_single if q["type"] == "single" else engine._score_multi
+        for mask in range(1 << len(index.letters[qid])):
+            if q["type"] == "single" and mask.bit_count() > 1:
+                continue
+            text = ",".join(index.mask_letters(qid, mask))
+            if legacy_score(q, text) != score(index, qid, mask):
+                mismatches += 1
+    print(f"{len(choice)} choice questions, mismatches {mismatches}")
+
+    rnd = random.Random(3)
+    cases = []
+    for _ in range(1000):
+        qid = rnd.choice(choice)
+        mask = rnd.getrandbits(len(index.letters[qid])) or 1
+        cases.append((qid, mask, ",".join(index.mask_letters(qid, mask))))
+
+    def old():
+        for qid, _, text in cases:
+            legacy_score(index.get(qid), text)
+
+    def new():
+        for qid, mask, _ in cases:
+            if index.get(qid)["type"] == "single":
+                engine._score_single(index, qid, mask)
+            else:
+                engine._score_multi(index, qid, mask)
+
+    n = max(1, args.number // len(cases))
+    t_old = timeit.timeit(old, number=n) / (n * len(cases))
+    t_new = timeit.timeit(new, number=n) / (n * len(cases))
+    print(f"sets  {t_old * 1e6:6.2f} µs/answer   masks {t_new * 1e6:6.2f} µs/answer   x{t_old / t_new:.1f}")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Память на 100k синтетических сессий: dict со ссылками на вопросы и копиями ошибок против Session."""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from packs_loader import load_packs
+from quiz_engine import QuizEngine, Session, _format_correct_answer
+
+def legacy_session(index, qids: list[int], wrong: list[int]) -> dict:
+    """Форма сессии до Session: полные вопросы, ошибки по тегам и копии текстов ошибок."""
+    errors_by_tag: dict = {}
+    wrong_items = []
+    for qid in wrong:
+        q = index.get(qid)
+        for tag in q.get("tags", []):
+            errors_by_tag[tag] = errors_by_tag.get(tag, 0) + 1
+        wrong_items.append({
+            "text": q["text"],
+            "correct": _format_correct_answer(q),
+            "explanation": q.get("explanation", ""),
+        })
+    return {
+        "questions": [index.get(qid) for qid in qids],
+        "idx": len(wrong),
+        "score": 0.0,
+        "correct_count": 0,
+        "errors_by_tag": errors_by_tag,
+        "wrong_items": wrong_items,
+        "done": False,
+    }
+
+def compact_session(index, qids: list[int], wrong: list[int]) -> Session:
+    s = Session(qids, index)
+    s.idx = len(wrong)
+    s.wrong.extend(wrong)
+    return s
+
+def measure(factory, index, plan) -> int:
+    gc.collect()
+    tracemalloc.start()
+    sessions = {uid: factory(index, qids, wrong) for uid, (qids, wrong) in enumerate(plan)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return current
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=100_000)
+    ap.add_argument("--wrong", type=int, default=4, help="ошибок на сессию")
+    args = ap.parse_args()
+
+    engine = QuizEngine(load_packs("data/packs"), virtual_packs={"mixed": ("junior", "advanced")})
+    index = engine.index
+    rnd = random.Random(42)
+    plan = []
+    for _ in range(args.sessions):
+        qids = index.sample(10, pack="mixed")
+        plan.append((qids, qids[: rnd.randint(0, args.wrong)]))
+
+    before = measure(legacy_session, index, plan)
+    after = measure(compact_session, index, plan)
+    n = args.sessions
+    print(f"{n} sessions")
+    print(f"dict sessions    {before / 2**20:8.1f} MiB  ({before / n:6.0f} B/session)")
+    print(f"Session(slots)   {after / 2**20:8.1f} MiB  ({after / n:6.0f} B/session)")
+    print(f"x{before / after:.1f} less memory")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Холодный старт загрузки пакетов: честный YAML против бинарных снапшотов."""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from packs_loader import load_packs
+
+def _measure(fn, repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+def _fmt(name: str, times: list[float]) -> str:
+    return f"{name:<18} median {statistics.median(times) * 1000:8.2f} ms   min {min(times) * 1000:8.2f} ms"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packs", default="data/packs")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="packs_cache_")
+    try:
+        yaml_times = _measure(lambda: load_packs(args.packs, cache_dir=None), args.repeat)
+
+        # первый прогон с пустым кэшем: YAML + запись снапшотов
+        build = _measure(lambda: load_packs(args.packs, cache_dir=cache_dir), 1)
+        snap_times = _measure(lambda: load_packs(args.packs, cache_dir=cache_dir), args.repeat)
+
+        assert load_packs(args.packs, cache_dir=None) == load_packs(args.packs, cache_dir=cache_dir)
+
+        print(_fmt("yaml", yaml_times))
+        print(_fmt("snapshot (build)", build))
+        print(_fmt("snapshot (warm)", snap_times))
+        print(f"speedup x{statistics.median(yaml_times) / statistics.median(snap_times):.1f}")
+        size = sum(os.path.getsize(os.path.join(cache_dir, n)) for n in os.listdir(cache_dir))
+        print(f"snapshot size: {size / 1024:.0f} KB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
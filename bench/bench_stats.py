@@ -0,0 +1,86 @@
+"""
+Поток статистики ответов: цена record() на горячем пути, пропускная способность
+пакетной записи и сверка инкрементальных агрегатов с пересчётом по сырым событиям.
+Ненулевой код выхода — если агрегаты разошлись.
+
+    python -m bench.bench_stats --events 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+
+from packs_loader import load_packs  # noqa: E402
+from question_index import QuestionIndex  # noqa: E402
+from stats_store import StatsStore  # noqa: E402
+
+async def run(db_path: str, events: int, batch: int) -> int:
+    index = QuestionIndex(load_packs("data/packs"))
+    rnd = random.Random(5)
+    qids = [rnd.randrange(len(index)) for _ in range(events)]
+    oks = [rnd.random() < 0.6 for _ in range(events)]
+
+    store = StatsStore(db_path, flush_interval=3600, capacity=events)
+    await store.start()
+
+    t0 = time.perf_counter()
+    for i, qid in enumerate(qids):
+        store.record(10_000 + i % 5000, index.keys[qid], index.get(qid).get("tags", ()), "a", float(oks[i]), oks[i], 1.5)
+    record_s = time.perf_counter() - t0
+
+    # пишем пачками по batch, как это делал бы фоновый цикл
+    pending = list(store._buf)
+    store._buf.clear()
+    t0 = time.perf_counter()
+    for i in range(0, len(pending), batch):
+        store._buf.extend(pending[i:i + batch])
+        await store.flush()
+    flush_s = time.perf_counter() - t0
+    await store.close()
+
+    conn = sqlite3.connect(db_path)
+    q_mismatch = conn.execute(
+        "SELECT COUNT(*) FROM question_stats s JOIN ("
+        " SELECT qkey, COUNT(*) n, SUM(ok) c FROM answer_events GROUP BY qkey) e USING (qkey)"
+        " WHERE s.attempts != e.n OR s.correct != e.c"
+    ).fetchone()[0]
+    expected_tags: dict[str, list[int]] = {}
+    for qid, ok in zip(qids, oks):
+        for tag in index.get(qid).get("tags", ()):
+            t = expected_tags.setdefault(tag, [0, 0])
+            t[0] += 1
+            t[1] += not ok
+    got_tags = {tag: [a, e] for tag, a, e in conn.execute("SELECT tag, attempts, errors FROM tag_stats")}
+    t_mismatch = sum(1 for tag in expected_tags.keys() | got_tags.keys() if expected_tags.get(tag) != got_tags.get(tag))
+
+    t0 = time.perf_counter()
+    conn.execute("SELECT qkey, attempts, correct FROM question_stats ORDER BY CAST(correct AS REAL) / attempts LIMIT 10").fetchall()
+    agg_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    conn.execute("SELECT qkey, COUNT(*), SUM(ok) FROM answer_events GROUP BY qkey "
+                 "ORDER BY CAST(SUM(ok) AS REAL) / COUNT(*) LIMIT 10").fetchall()
+    raw_ms = (time.perf_counter() - t0) * 1000
+    conn.close()
+
+    print(f"{events} events: record {record_s / events * 1e6:.2f} µs/event, "
+          f"flush {events / flush_s:,.0f} events/s in batches of {batch}")
+    print(f"hardest-questions query: aggregates {agg_ms:.2f} ms vs raw scan {raw_ms:.2f} ms")
+    print(f"mismatches: questions {q_mismatch}, tags {t_mismatch}; dropped {store.dropped}")
+    return 1 if q_mismatch or t_mismatch else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200_000)
+    ap.add_argument("--batch", type=int, default=2000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.exit(asyncio.run(run(os.path.join(tmp, "stats.sqlite3"), args.events, args.batch)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Пропускная способность 1 против N воркеров на синтетической нагрузке колбэками:
+каждый пользователь выбирает уровень advanced (только single-вопросы) и отвечает
+на 10 вопросов кнопками. Bot API заглушен (bench.stub_session), так что меряется
+именно обработка.
+
+Кнопки принимаются только с сообщения текущего вопроса, а состояние воркеров отсюда
+не видно — номер сообщения предсказываем: у заглушки номера свои в каждом чате, и на
+ход бот шлёт ровно два сообщения (отзыв и следующий вопрос), так что k-й вопрос —
+сообщение FIRST_MSG_ID + 2(k-1). Что ответы действительно засчитаны, проверяется по
+статистике: каждый прогон пишет во временную БД, и в answer_events должно оказаться
+ровно users × 10 событий. Лимитер исходящих выключен (RATE_GLOBAL=0) — иначе потолок
+задавал бы он, а не обработка.
+
+    python -m bench.bench_workers --users 2000 --workers 1 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+os.environ["RATE_GLOBAL"] = "0"
+os.environ["PACKS_WATCH_INTERVAL"] = "0"
+
+from bench.fake_telegram import callback_update  # noqa: E402
+from bench.stub_session import FIRST_MSG_ID, make_session  # noqa: E402
+from workers import start_workers  # noqa: E402
+
+def synthetic_updates(users: int) -> list[dict]:
+    """По раундам: сначала все выбирают уровень, затем все отвечают на 1-й вопрос и т.д."""
+    updates = []
+    update_id = 1
+    for rnd in range(11):
+        for i in range(users):
+            if rnd == 0:
+                update = callback_update(update_id, 10_000 + i, "level:advanced")
+            else:
+                update = callback_update(update_id, 10_000 + i, "ans:a", message_id=FIRST_MSG_ID + 2 * (rnd - 1))
+            updates.append(update)
+            update_id += 1
+    return updates
+
+def run(n_workers: int, updates: list[dict], batch: int, db_path: str) -> float:
+    # воркеры — spawn: окружение читают при старте, своя БД на каждый прогон
+    os.environ["DB_PATH"] = db_path
+    router, procs, done = start_workers(n_workers, session_factory=make_session)
+    # ждём, пока воркеры импортируют app и будут готовы (холодный старт не меряем)
+    for _ in procs:
+        assert done.get()[0] == "ready"
+    t0 = time.perf_counter()
+    for i in range(0, len(updates), batch):
+        router.route(updates[i:i + batch])
+    router.stop()
+    processed = sum(done.get()[2] for _ in procs)
+    elapsed = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    assert processed == len(updates), (processed, len(updates))
+    return elapsed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 2])
+    ap.add_argument("--batch", type=int, default=100, help="размер пачки, как у getUpdates")
+    args = ap.parse_args()
+
+    updates = synthetic_updates(args.users)
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            db_path = os.path.join(tmp, f"workers{n}.sqlite3")
+            elapsed = run(n, updates, args.batch, db_path)
+            with sqlite3.connect(db_path) as conn:
+                (answers,) = conn.execute("SELECT COUNT(*) FROM answer_events").fetchone()
+            assert answers == args.users * 10, f"{answers} of {args.users * 10} answers counted"
+            rps = len(updates) / elapsed
+            base = base or rps
+            print(f"{n:>2} worker(s): {len(updates)} updates in {elapsed:6.2f} s  {rps:9.1f} upd/s  x{rps / base:.2f}"
+                  f"  ({answers} answers counted)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Минимальный фейковый Telegram Bot API на aiohttp для локальных нагрузочных прогонов.
+Отвечает на любые методы правдоподобными объектами, отдаёт getUpdates из очереди
+и умеет ждать первый исходящий вызов в конкретный чат (для замера задержки).
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "qa_bot", "username": "qa_bot"}
+
+def message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": text,
+        },
+    }
+
+def callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "…",
+            },
+        },
+    }
+
+class FakeTelegramAPI:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency              # искусственная задержка каждого ответа, сек
+        self.calls: Counter = Counter()     # method -> количество
+        self.sent_to: Counter = Counter()   # chat_id -> доставлено sendMessage
+        self.blocked: set = set()           # эти чаты отвечают 403 (бот заблокирован)
+        self.flood_every = 0                # каждый N-й sendMessage — 429 с retry_after
+        self.retry_after = 1
+        self._updates: List[Dict[str, Any]] = []
+        self._has_updates = asyncio.Event()
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._msg_ids = itertools.count(1000)
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    # --- сценарий теста ---
+    def push_update(self, update: Dict[str, Any]) -> None:
+        self._updates.append(update)
+        self._has_updates.set()
+
+    def wait_chat(self, chat_id: int) -> asyncio.Future:
+        """Future, которое завершится при первом следующем вызове API в этот чат."""
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(chat_id, []).append(fut)
+        return fut
+
+    # --- сервер ---
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}"
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        form = await request.post()
+        params = {}
+        for k, v in form.items():
+            try:
+                params[k] = json.loads(v)
+            except (TypeError, ValueError):
+                params[k] = v
+        return params
+
+    def _notify(self, chat_id: Any) -> None:
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            return
+        for fut in self._waiters.pop(chat_id, []):
+            if not fut.done():
+                fut.set_result(time.perf_counter())
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout=float(params.get("timeout") or 0) or 0.05)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+
+    def _inject_error(self, params: Dict[str, Any]) -> web.Response | None:
+        if int(params.get("chat_id") or 0) in self.blocked:
+            return web.json_response(
+                {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}, status=403)
+        if self.flood_every and self.calls["sendMessage"] % self.flood_every == 0:
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        return None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        lower = method.lower()
+        if lower == "sendmessage":
+            error = self._inject_error(params)
+            if error is not None:
+                return error
+        if lower == "getupdates":
+            result: Any = await self._get_updates(params)
+        elif lower == "getme":
+            result = BOT_USER
+        elif lower in ("sendmessage", "sendsticker", "editmessagetext", "editmessagereplymarkup"):
+            chat_id = params.get("chat_id", 0)
+            self._notify(chat_id)
+            if lower == "sendmessage":
+                self.sent_to[int(chat_id or 0)] += 1
+            result = {
+                "message_id": int(params.get("message_id") or next(self._msg_ids)),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
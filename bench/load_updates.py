@@ -0,0 +1,139 @@
+"""
+Нагрузочный прогон приёма апдейтов: long polling против webhook.
+Бот запускается целиком (app.main) против локального фейкового Bot API,
+синтетические пользователи параллельно шлют /start и выбор уровня;
+задержка — от отправки апдейта до первого ответа бота в этот чат.
+Меряется приём и обработка, поэтому лимитер исходящих выключен (RATE_GLOBAL=0),
+а статистика, сессии и рейтинг пишутся во временную БД, а не в data/.
+
+    python -m bench.load_updates --mode both --users 300 --rounds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.fake_telegram import FakeTelegramAPI, callback_update, message_update
+
+SECRET = "bench-secret"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_healthy(url: str, timeout: float = 10.0) -> None:
+    import aiohttp
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(url) as r:
+                    if r.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"{url} did not become healthy")
+
+async def run(mode: str, users: int, rounds: int, latency: float) -> dict:
+    import aiohttp
+
+    fake = FakeTelegramAPI(latency=latency)
+    api_url = await fake.start()
+    port = _free_port()
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({
+        "DB_PATH": os.path.join(tmp.name, "load.sqlite3"),
+        "RATE_GLOBAL": "0",
+        "TELEGRAM_TOKEN": os.environ.get("TELEGRAM_TOKEN") or "123456:bench",
+        "TELEGRAM_API_URL": api_url,
+        "BOT_MODE": mode,
+        "WEBHOOK_BASE_URL": f"http://127.0.0.1:{port}",
+        "WEBHOOK_SECRET": SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+    })
+    import app  # после настройки окружения
+
+    bot_task = asyncio.create_task(app.main())
+    webhook_url = f"http://127.0.0.1:{port}{app.WEBHOOK_PATH}"
+    if mode == "webhook":
+        await _wait_healthy(f"http://127.0.0.1:{port}/healthz")
+    else:
+        await asyncio.sleep(0.3)
+
+    http = aiohttp.ClientSession()
+    update_ids = iter(range(1, 10**9))
+    latencies: list[float] = []
+
+    async def submit(update: dict) -> None:
+        if mode == "webhook":
+            async with http.post(webhook_url, json=update,
+                                 headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as r:
+                r.raise_for_status()
+        else:
+            fake.push_update(update)
+
+    async def user_flow(user_id: int) -> None:
+        for _ in range(rounds):
+            for make in (lambda: message_update(next(update_ids), user_id, "/start"),
+                         lambda: callback_update(next(update_ids), user_id, "level:junior")):
+                answered = fake.wait_chat(user_id)
+                t0 = time.perf_counter()
+                await submit(make())
+                t1 = await asyncio.wait_for(answered, timeout=30)
+                latencies.append(t1 - t0)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(user_flow(10_000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - t_start
+
+    await http.close()
+    await asyncio.sleep(0.5)  # даём дописать c.answer() и прочие хвосты до остановки фейка
+    bot_task.cancel()
+    try:
+        await bot_task
+    except (asyncio.CancelledError, Exception):
+        pass
+    await fake.close()
+    tmp.cleanup()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=("polling", "webhook", "both"), default="both")
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка фейкового API, сек")
+    args = ap.parse_args()
+
+    if args.mode == "both":
+        # app настраивается при импорте, поэтому каждый режим — в своём процессе
+        for mode in ("polling", "webhook"):
+            cmd = [sys.executable, "-m", "bench.load_updates", "--mode", mode, "--users", str(args.users),
+                   "--rounds", str(args.rounds), "--latency", str(args.latency)]
+            subprocess.run(cmd, check=True)
+        return
+
+    res = asyncio.run(run(args.mode, args.users, args.rounds, args.latency))
+    print(json.dumps(res))
+    print(f"{res['mode']:<8} {res['updates']} updates  {res['rps']:8.1f} req/s  "
+          f"p50 {res['p50_ms']:7.2f} ms  p99 {res['p99_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Офлайн-симуляция полного прохождения: реальные хендлеры app (register_handlers — то же,
+что делает app.main) получают синтетические апдейты через dp.feed_raw_update, Bot API —
+заглушка StubSession. Тысячи пользователей одновременно: /start, выбор уровня, 10 ответов
+(single — кнопкой, multi — несколько toggle/reset и submit, free — текстом), часть верных.
+
+Печатает пропускную способность, p50/p99 обработки одного апдейта и пиковый RSS;
+--save пишет baseline JSON, --check сравнивает с ним (ненулевой код выхода при регрессии).
+Итоговые баллы при фиксированном --seed детерминированы — расхождение значит,
+что поменялась логика QuizEngine/хендлеров. Движок тянет вопросы из общего random,
+поэтому перед каждым хендлером он пересевается от (seed, пользователь, номер апдейта):
+выборка не зависит от того, как чередуются задачи (PYTHONHASHSEED=0 — для порядка
+обхода множеств). Скорость, p99 и RSS зависят от машины и её загрузки — они
+сравниваются с baseline только с --perf (на той же машине).
+
+    python -m bench.simulate --users 2000 --save bench/baseline.json
+    python -m bench.simulate --users 2000 --check bench/baseline.json [--perf]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+os.environ["DB_PATH"] = os.path.join(_tmp.name, "sim.sqlite3")
+os.environ["STATS_ENABLED"] = "0"
+os.environ["PACKS_WATCH_INTERVAL"] = "0"
+os.environ["RATE_GLOBAL"] = "0"
+
+import app  # noqa: E402
+from bench.fake_telegram import callback_update, message_update  # noqa: E402
+from bench.stub_session import StubSession  # noqa: E402
+
+LEVELS = ("junior", "advanced", "random")
+
+class Sim:
+    def __init__(self, seed: int, accuracy: float, concurrency: int):
+        self.sem = asyncio.Semaphore(concurrency)
+        self.rnd = random.Random(seed)
+        self.accuracy = accuracy
+        self.update_ids = iter(range(1, 10**9))
+        self.latencies: list[float] = []
+        self.errors: list[BaseException] = []
+        self.finished = 0
+        self.answers = {"single": 0, "multi": 0, "free": 0}
+
+    async def feed(self, update: dict) -> None:
+        # сессии живут у всех сразу, но обрабатывается не больше concurrency апдейтов:
+        # задержка — это время хендлеров, а не очередь из тысяч задач
+        async with self.sem:
+            t0 = time.perf_counter()
+            try:
+                await app.dp.feed_raw_update(app.bot, update)
+            except Exception as e:  # noqa: BLE001
+                self.errors.append(e)
+            self.latencies.append(time.perf_counter() - t0)
+
+    def _correct_letters(self, s, qid: int) -> list[str]:
+        return s.index.mask_letters(qid, s.index.answer_mask[qid])
+
+    async def user(self, user_id: int) -> None:
+        rnd = random.Random(self.rnd.random())  # свой генератор: ответы не зависят от порядка задач
+        await self.feed(message_update(next(self.update_ids), user_id, "/start"))
+        await self.feed(callback_update(next(self.update_ids), user_id, "level:" + rnd.choice(LEVELS)))
+        for _ in range(10):
+            s = app.engine.sessions.get(user_id)
+            if s is None:
+                return
+            qid = s.qids[s.idx]
+            q = s.index.get(qid)
+            right = rnd.random() < self.accuracy
+            self.answers[q["type"]] += 1
+            if q["type"] == "free":
+                text = rnd.choice(q["answer"]) if right and q.get("answer") else "не знаю"
+                await self.feed(message_update(next(self.update_ids), user_id, text))
+                continue
+            letters = list(s.index.letters[qid])
+            correct = self._correct_letters(s, qid)
+            if q["type"] == "single":
+                letter = correct[0] if right and correct else rnd.choice(letters)
+                await self.feed(callback_update(next(self.update_ids), user_id, "ans:" + letter, s.msg_id))
+                continue
+            # multi: иногда сначала ошибаемся и жмём «Сброс»
+            if rnd.random() < 0.2:
+                await self.feed(callback_update(next(self.update_ids), user_id, "toggle:" + rnd.choice(letters), s.msg_id))
+                await self.feed(callback_update(next(self.update_ids), user_id, "multi:reset", s.msg_id))
+            picks = correct if right else rnd.sample(letters, rnd.randint(1, len(letters)))
+            for letter in picks:
+                await self.feed(callback_update(next(self.update_ids), user_id, "toggle:" + letter, s.msg_id))
+            await self.feed(callback_update(next(self.update_ids), user_id, "multi:submit", s.msg_id))
+        if user_id not in app.engine.sessions:
+            self.finished += 1
+
+class SeedPerUpdate:
+    """
+    Inner middleware: random.seed от (seed, user_id, n-й апдейт пользователя) прямо перед
+    хендлером. От него до выборки вопросов (pick_random_pack, start_session) await'ов нет,
+    так что другие задачи не успевают сдвинуть общий random.
+    """
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.counts: dict[int, int] = {}
+
+    async def __call__(self, handler, event, data):
+        user_id = event.from_user.id
+        n = self.counts[user_id] = self.counts.get(user_id, 0) + 1
+        random.seed(f"{self.seed}:{user_id}:{n}")  # строка -> sha512, от PYTHONHASHSEED не зависит
+        return await handler(event, data)
+
+def _pct(values: list[float], p: float) -> float:
+    return sorted(values)[int(p * (len(values) - 1))]
+
+async def run(users: int, seed: int, accuracy: float, concurrency: int = 16) -> dict:
+    app.bot.session = StubSession()
+    app.limiter = None
+    app.register_handlers(app.dp)
+    seeder = SeedPerUpdate(seed)
+    app.dp.message.middleware(seeder)
+    app.dp.callback_query.middleware(seeder)
+
+    score_total = 0.0
+    orig_check = app.engine.check
+
+    def check(user_id, answer):
+        nonlocal score_total
+        before = app.engine.sessions[user_id].score
+        res = orig_check(user_id, answer)
+        s = app.engine.sessions.get(user_id)
+        # законченную сессию движок уже снял — добавку берём из текста отзыва
+        score_total += (s.score - before) if s is not None else float(res["feedback"].split("(+", 1)[1].split(")")[0])
+        return res
+    app.engine.check = check
+
+    sim = Sim(seed, accuracy, concurrency)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(sim.user(100_000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - t0
+    lat = sim.latencies
+    return {
+        "users": users,
+        "finished": sim.finished,
+        "updates": len(lat),
+        "errors": len(sim.errors),
+        "answers": sim.answers,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(lat) / elapsed, 1),
+        "p50_ms": round(_pct(lat, 0.5) * 1000, 3),
+        "p99_ms": round(_pct(lat, 0.99) * 1000, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "score_total": round(score_total, 2),
+        "api_calls": sum(app.bot.session.calls.values()),
+        "seed": seed,
+        "concurrency": concurrency,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float, perf: bool = False) -> list[str]:
+    problems = []
+    if result["errors"] or result["finished"] != result["users"]:
+        problems.append(f"{result['errors']} errors, {result['finished']}/{result['users']} users finished")
+    same_run = all(result[k] == baseline.get(k) for k in ("users", "seed"))
+    if same_run:
+        for key in ("updates", "score_total", "api_calls"):
+            if result[key] != baseline[key]:
+                problems.append(f"{key}: {result[key]} != baseline {baseline[key]} (логика изменилась?)")
+    if not perf:
+        return problems
+    if result["updates_per_s"] < baseline["updates_per_s"] * (1 - tolerance):
+        problems.append(f"throughput {result['updates_per_s']} < baseline {baseline['updates_per_s']}")
+    for key in ("p99_ms", "peak_rss_mb"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            problems.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=16, help="апдейтов в обработке одновременно")
+    ap.add_argument("--accuracy", type=float, default=0.6, help="доля ответов, которые пользователь знает")
+    ap.add_argument("--save", metavar="JSON", help="сохранить результат как baseline")
+    ap.add_argument("--check", metavar="JSON", help="сравнить с baseline")
+    ap.add_argument("--perf", action="store_true",
+                    help="сравнивать и скорость/p99/RSS (baseline снят на той же машине, без фоновой нагрузки)")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="допустимое ухудшение скорости/p99/RSS")
+    args = ap.parse_args()
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        _tmp.cleanup()
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, "-m", "bench.simulate", *sys.argv[1:]])
+
+    try:
+        result = asyncio.run(run(args.users, args.seed, args.accuracy, args.concurrency))
+    finally:
+        _tmp.cleanup()
+    print(f"{result['users']} users ({result['finished']} finished), {result['updates']} updates "
+          f"in {result['elapsed_s']} s: {result['updates_per_s']} updates/s, "
+          f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, peak RSS {result['peak_rss_mb']} MiB")
+    print(f"answers {result['answers']}, score total {result['score_total']}, errors {result['errors']}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"baseline saved to {args.save}")
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(result, baseline, args.tolerance, args.perf)
+        if not args.perf:
+            print(f"perf vs baseline ({baseline.get('cpus')} CPU): {result['updates_per_s']} / "
+                  f"{baseline['updates_per_s']} updates/s, p99 {result['p99_ms']} / {baseline['p99_ms']} ms "
+                  f"(не проверяется, см. --perf)")
+        for p in problems:
+            print(f"  REGRESSION: {p}")
+        if problems:
+            sys.exit(1)
+        print("no regressions against baseline")
+
+if __name__ == "__main__":
+    main()
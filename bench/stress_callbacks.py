@@ -0,0 +1,90 @@
+"""
+Стресс двойных тапов: каждый пользователь жмёт кнопку ответа K раз одновременно.
+Ожидаем: ровно один ответ засчитан на вопрос, без исключений, и все пользователи
+доходят до итогов за 10 вопросов. Перед каждым ответом пользователь ещё и жмёт кнопку
+на сообщении прошлого вопроса — такой тап не должен засчитаться, а кнопка текущего
+сообщения должна. Ненулевой код выхода — если инвариант нарушен.
+
+    python -m bench.stress_callbacks --users 500 --dup 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+
+import app  # noqa: E402
+from bench.fake_telegram import callback_update, message_update  # noqa: E402
+from bench.stub_session import StubSession  # noqa: E402
+
+async def run(users: int, dup: int, latency: float) -> int:
+    # ненулевая задержка API, чтобы хендлеры реально уступали управление между await
+    app.bot.session = StubSession(latency=latency)
+    app.limiter = None  # проверяем порядок обработки, а не лимиты Telegram
+    app.register_handlers(app.dp)
+    update_ids = iter(range(1, 10**9))
+    errors: list[BaseException] = []
+    violations = stale = 0
+
+    async def feed(update: dict) -> None:
+        try:
+            await app.dp.feed_raw_update(app.bot, update)
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    async def user_flow(user_id: int) -> None:
+        nonlocal violations, stale
+        await feed(callback_update(next(update_ids), user_id, "level:junior"))
+        prev_msg = 0
+        for step in range(10):
+            s = app.engine.sessions.get(user_id)
+            if s is None or s.idx != step or not s.msg_id:
+                violations += 1  # вопрос должен быть привязан к своему сообщению
+                return
+            if prev_msg:
+                # тап по кнопке старого сообщения (уже отвеченный вопрос) — игнорируется
+                await feed(callback_update(next(update_ids), user_id, "ans:a", message_id=prev_msg))
+                if app.engine.sessions.get(user_id) is not s or s.idx != step:
+                    stale += 1
+                    return
+            prev_msg = s.msg_id
+            q = app.engine.get_current(user_id)
+            if q["type"] == "free":
+                await feed(message_update(next(update_ids), user_id, "coverage"))
+                continue
+            data = "multi:submit" if q["type"] == "multi" else "ans:a"
+            # K одинаковых колбэков с одного и того же сообщения — параллельно
+            await asyncio.gather(*(
+                feed(callback_update(next(update_ids), user_id, data, message_id=s.msg_id)) for _ in range(dup)
+            ))
+            s_after = app.engine.sessions.get(user_id)
+            expected = step + 1
+            if step < 9 and (s_after is None or s_after.idx != expected):
+                violations += 1
+                return
+        if user_id in app.engine.sessions:
+            violations += 1  # законченная сессия должна быть снята
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user_flow(20_000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - t0
+
+    print(f"{users} users x {dup} duplicate taps: {elapsed:.2f} s, "
+          f"violations {violations}, stale taps accepted {stale}, errors {len(errors)}, "
+          f"API calls {sum(app.bot.session.calls.values())}")
+    for e in errors[:5]:
+        print(f"  {type(e).__name__}: {e}")
+    return 1 if violations or stale or errors else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--dup", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.001, help="задержка заглушки Bot API, сек")
+    args = ap.parse_args()
+    sys.exit(asyncio.run(run(args.users, args.dup, args.latency)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Сессия aiogram без сети: каждый вызов Bot API мгновенно (или с заданной задержкой)
+возвращает правдоподобный результат. Для бенчмарков хендлеров и воркеров.
+
+Номера сообщений, как в Telegram, свои в каждом чате (с FIRST_MSG_ID): сценарий,
+который знает, сколько сообщений бот шлёт на каждый ход, может предсказать номер
+сообщения с текущим вопросом, не заглядывая в процесс воркера.
+"""
+import asyncio
+import itertools
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message, User
+
+BOT_USER = User(id=1, is_bot=True, first_name="qa_bot", username="qa_bot")
+FIRST_MSG_ID = 1000
+
+class StubSession(BaseSession):
+    def __init__(self, latency: float = 0.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._msg_ids: Dict[int, Any] = defaultdict(lambda: itertools.count(FIRST_MSG_ID))  # chat_id -> номера
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType],
+                           timeout: Optional[int] = None) -> TelegramType:
+        name = type(method).__name__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        returning = method.__returning__
+        if returning is Message or name in ("EditMessageText", "EditMessageReplyMarkup"):
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or next(self._msg_ids[int(chat_id)]),
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=int(chat_id), type="private"),
+                from_user=BOT_USER,
+                text=getattr(method, "text", None),
+            ).as_(bot)
+        if returning is User:
+            return BOT_USER
+        return True  # type: ignore[return-value]
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+def make_session() -> StubSession:
+    """Фабрика для воркеров (должна импортироваться по имени в дочернем процессе)."""
+    return StubSession()
@@ -0,0 +1,374 @@
+"""
+Рассылка от админа всем известным пользователям (/broadcast).
+
+Очередь — в SQLite: broadcast_queue, по строке на получателя, плюс счётчики в broadcasts.
+Получатели — все, кто когда-либо проходил тест или включал напоминания
+(players, reminder_users, answer_events). Раздатчик забирает пачку ожидающих строк
+(state 0 -> 4, «в работе») и коммитит это до отправки; вперёд захватывается немного —
+примерно на commit_interval отправок. Пул отправителей шлёт с общим ограничением rate
+(без стартового всплеска, и через общий лимитер бота). RetryAfter приостанавливает
+всех отправителей, заблокировавшие бота помечаются отдельно. Итоги отправок
+записываются по мере поступления, не реже раза в commit_interval.
+
+Поэтому рассылка переживает рестарт без повторных отправок: строки, захваченные до
+падения, второй раз не берутся (в прогрессе — «неизвестно»; это отправки в полёте,
+неотправленный задел и итоги последних commit_interval секунд). При штатной остановке
+неотправленные строки возвращаются в очередь. Команды админа только пишут в БД,
+а рассылает один процесс (run=True — в воркерах это воркер 0).
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from metrics import METRICS
+from outbound import ChatRateLimiter, TokenBucket
+from sqlite_store import SqliteStore, stop_task
+
+PENDING, SENT, BLOCKED, FAILED, CLAIMED = 0, 1, 2, 3, 4
+
+_SCHEMA = (
+    # status: draft -> running -> done | cancelled
+    "CREATE TABLE IF NOT EXISTS broadcasts ("
+    " id INTEGER PRIMARY KEY,"
+    " created REAL NOT NULL,"
+    " admin_id INTEGER NOT NULL,"
+    " text TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " total INTEGER NOT NULL DEFAULT 0,"
+    " sent INTEGER NOT NULL DEFAULT 0,"
+    " blocked INTEGER NOT NULL DEFAULT 0,"
+    " failed INTEGER NOT NULL DEFAULT 0,"
+    " claimed INTEGER NOT NULL DEFAULT 0,"
+    " finished REAL)",
+    "CREATE TABLE IF NOT EXISTS broadcast_queue ("
+    " broadcast_id INTEGER NOT NULL,"
+    " user_id INTEGER NOT NULL,"
+    " state INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (broadcast_id, user_id))",
+    # частичный индекс: захват следующей пачки не проходит по уже разосланным строкам
+    "CREATE INDEX IF NOT EXISTS broadcast_pending ON broadcast_queue (broadcast_id, user_id) WHERE state = 0",
+)
+
+# таблицы, по которым собираем «всех известных пользователей»; каких-то может не быть
+_AUDIENCE = (
+    ("players", "SELECT user_id FROM players"),
+    ("reminder_users", "SELECT user_id FROM reminder_users"),
+    ("answer_events", "SELECT DISTINCT user_id FROM answer_events"),
+)
+
+_REFILL = 0.02  # как часто раздатчик смотрит на очередь отправителей, сек
+
+class Progress(NamedTuple):
+    id: int
+    status: str
+    total: int
+    sent: int
+    blocked: int
+    failed: int
+    claimed: int   # в работе или неизвестно (захвачены до падения процесса)
+    created: float
+    finished: float | None
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.sent - self.blocked - self.failed - self.claimed
+
+class Broadcaster(SqliteStore):
+    schema = _SCHEMA
+
+    def __init__(self, bot: Bot, db_path: str | os.PathLike, limiter: ChatRateLimiter | None = None,
+                 rate: float = 20, senders: int = 8, batch: int = 200, poll_interval: float = 2.0,
+                 max_attempts: int = 3, commit_interval: float = 0.25):
+        super().__init__(db_path)
+        self.bot = bot
+        self.limiter = limiter
+        self.rate = rate
+        self.senders = senders
+        self.batch = batch
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.commit_interval = commit_interval
+        # сколько строк держать захваченными впрок: хватает занять всех отправителей и на ~0.04 с отправок
+        # (очередь добирается каждые _REFILL секунд) — после падения «неизвестных» не больше этого
+        self.ahead = min(batch, max(2 * senders, int(rate * 2 * _REFILL) + 1))
+        # все запросы — через _db (общая блокировка): без неё BEGIN IMMEDIATE в _claim перекрывался бы
+        # с `with conn:` команд админа («cannot start a transaction within a transaction»)
+        self._task: asyncio.Task | None = None
+        self._queue: asyncio.Queue[Tuple[int, int]] = asyncio.Queue()  # (user_id, попытка)
+        self._results: List[Tuple[int, int]] = []  # (state, user_id) — ждут записи
+        self._inflight = 0                         # взяты отправителем, ответа ещё нет
+        self._paused_until = 0.0
+        self._leftover: Tuple[int, List[Tuple[int, int]], List[int]] | None = None  # незаписанный _finish
+        self.current: int | None = None            # id рассылки, которую сейчас шлём
+        self.sent = 0
+        self.retry_after = 0                       # сколько раз Telegram просил подождать
+
+    # --- команды админа (любой процесс) ---
+
+    def _create(self, admin_id: int, text: str) -> Tuple[int, int]:
+        conn = self._conn
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sources = [sql for table, sql in _AUDIENCE if table in tables]
+        with conn:
+            bid = conn.execute(
+                "INSERT INTO broadcasts (created, admin_id, text, status) VALUES (?, ?, ?, 'draft')",
+                (time.time(), admin_id, text),
+            ).lastrowid
+            total = 0
+            if sources:
+                total = conn.execute(
+                    f"INSERT INTO broadcast_queue (broadcast_id, user_id) SELECT ?, user_id FROM "
+                    f"({' UNION '.join(sources)})", (bid,),
+                ).rowcount
+            conn.execute("UPDATE broadcasts SET total = ? WHERE id = ?", (total, bid))
+        return bid, total
+
+    async def create(self, admin_id: int, text: str) -> Tuple[int, int]:
+        """Черновик рассылки с очередью получателей; (id, сколько получателей)."""
+        return await self._db(self._create, admin_id, text)
+
+    def _set_status(self, bid: int, old: str, new: str) -> bool:
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE broadcasts SET status = ?, finished = CASE WHEN ? = 'running' THEN NULL ELSE ? END "
+                "WHERE id = ? AND status = ?", (new, new, time.time(), bid, old),
+            ).rowcount == 1
+
+    async def confirm(self, bid: int) -> bool:
+        return await self._db(self._set_status, bid, "draft", "running")
+
+    async def cancel(self, bid: int) -> bool:
+        """Отменить черновик или остановить идущую рассылку (неотправленное из пачки вернётся в очередь)."""
+        return (await self._db(self._set_status, bid, "draft", "cancelled")
+                or await self._db(self._set_status, bid, "running", "cancelled"))
+
+    def _progress(self, bid: int | None) -> Progress | None:
+        cols = "id, status, total, sent, blocked, failed, claimed, created, finished"
+        if bid is None:
+            row = self._conn.execute(
+                f"SELECT {cols} FROM broadcasts WHERE status != 'draft' ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = self._conn.execute(f"SELECT {cols} FROM broadcasts WHERE id = ?", (bid,)).fetchone()
+        return Progress(*row) if row else None
+
+    async def progress(self, bid: int | None = None) -> Progress | None:
+        """Счётчики рассылки (по умолчанию — последней запущенной); отстают от отправок примерно на commit_interval."""
+        return await self._db(self._progress, bid)
+
+    # --- рассылка (один процесс) ---
+
+    def _next_running(self) -> Tuple[int, str] | None:
+        return self._conn.execute(
+            "SELECT id, text FROM broadcasts WHERE status = 'running' ORDER BY id LIMIT 1").fetchone()
+
+    def _commit_results(self, conn: sqlite3.Connection, bid: int, results: List[Tuple[int, int]]) -> None:
+        if not results:
+            return
+        conn.executemany("UPDATE broadcast_queue SET state = ? WHERE broadcast_id = ? AND user_id = ?",
+                         [(state, bid, user_id) for state, user_id in results])
+        counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+        for state, _ in results:
+            counts[state] += 1
+        conn.execute(
+            "UPDATE broadcasts SET sent = sent + ?, blocked = blocked + ?, failed = failed + ?, "
+            "claimed = claimed - ? WHERE id = ?",
+            (counts[SENT], counts[BLOCKED], counts[FAILED], len(results), bid),
+        )
+
+    def _claim(self, bid: int, results: List[Tuple[int, int]], n: int) -> List[int] | None:
+        """Записать итоги и захватить до n получателей; None — рассылку остановили."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._commit_results(conn, bid, results)
+            (status,) = conn.execute("SELECT status FROM broadcasts WHERE id = ?", (bid,)).fetchone()
+            users: List[int] | None = None
+            if status == "running" and n > 0:
+                users = [u for (u,) in conn.execute(
+                    "SELECT user_id FROM broadcast_queue WHERE broadcast_id = ? AND state = 0 LIMIT ?", (bid, n))]
+                conn.executemany("UPDATE broadcast_queue SET state = 4 WHERE broadcast_id = ? AND user_id = ?",
+                                 [(bid, u) for u in users])
+                conn.execute("UPDATE broadcasts SET claimed = claimed + ? WHERE id = ?", (len(users), bid))
+            elif status == "running":
+                users = []
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return users
+
+    def _finish(self, bid: int, results: List[Tuple[int, int]], unsent: List[int]) -> None:
+        conn = self._conn
+        with conn:
+            self._commit_results(conn, bid, results)
+            if unsent:
+                # точно не отправлены — вернём в очередь
+                conn.executemany("UPDATE broadcast_queue SET state = 0 WHERE broadcast_id = ? AND user_id = ?",
+                                 [(bid, u) for u in unsent])
+                conn.execute("UPDATE broadcasts SET claimed = claimed - ? WHERE id = ?", (len(unsent), bid))
+            conn.execute(
+                "UPDATE broadcasts SET status = 'done', finished = ? WHERE id = ? AND status = 'running' "
+                "AND NOT EXISTS (SELECT 1 FROM broadcast_queue WHERE broadcast_id = ? AND state = 0)",
+                (time.time(), bid, bid),
+            )
+
+    def _take_queue(self) -> List[int]:
+        users = []
+        while not self._queue.empty():
+            users.append(self._queue.get_nowait()[0])
+        return users
+
+    def _take_results(self) -> List[Tuple[int, int]]:
+        results, self._results = self._results, []
+        return results
+
+    async def _sender(self, text: str, bucket: TokenBucket) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            user_id, attempt = await self._queue.get()
+            self._inflight += 1
+            sending = False
+            try:
+                pause = self._paused_until - loop.time()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                delay = bucket.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.limiter is not None:
+                    await self.limiter.acquire(user_id)
+                sending = True
+                await self.bot.send_message(user_id, text)
+            except TelegramRetryAfter as e:
+                # флуд-контроль общий на бота: ждут все отправители
+                self.retry_after += 1
+                self._paused_until = max(self._paused_until, loop.time() + e.retry_after)
+                self._queue.put_nowait((user_id, attempt))
+            except TelegramForbiddenError:
+                self._results.append((BLOCKED, user_id))
+            except TelegramBadRequest:
+                self._results.append((FAILED, user_id))  # чат не найден/удалён — повторять бессмысленно
+            except asyncio.CancelledError:
+                # остановка до отправки — вернём в очередь; посреди запроса — не знаем, дошло ли:
+                # строка остаётся захваченной, чтобы после рестарта не прислать второй раз
+                if not sending:
+                    self._queue.put_nowait((user_id, attempt))
+                raise
+            except Exception as e:
+                METRICS.error("broadcast.send", e)
+                if attempt + 1 < self.max_attempts:
+                    self._queue.put_nowait((user_id, attempt + 1))
+                else:
+                    self._results.append((FAILED, user_id))
+            else:
+                self.sent += 1
+                self._results.append((SENT, user_id))
+            finally:
+                self._inflight -= 1
+
+    async def _drain(self, bid: int, text: str) -> None:
+        # запас в один токен: ровный темп с первой секунды, без всплеска в rate сообщений
+        bucket = TokenBucket(self.rate, 1)
+        senders = [asyncio.create_task(self._sender(text, bucket)) for _ in range(self.senders)]
+        self.current = bid
+        committed = time.monotonic()
+        try:
+            while True:
+                idle = False
+                # добираем задел, когда очередь опустела наполовину, а итоги пишем не реже
+                # commit_interval; заодно узнаём, не остановили ли рассылку
+                refill = self._queue.qsize() <= self.ahead // 2
+                if refill or (self._results and time.monotonic() - committed >= self.commit_interval):
+                    n = self.ahead - self._queue.qsize() if refill else 0
+                    results = self._take_results()
+                    try:
+                        users = await self._db(self._claim, bid, results, n)
+                    except Exception:
+                        self._results[:0] = results  # транзакция откатилась — итоги запишем в следующий раз
+                        raise
+                    committed = time.monotonic()
+                    if users is None:
+                        break
+                    if refill and not users and self._queue.empty() and not self._inflight:
+                        break
+                    for u in users:
+                        self._queue.put_nowait((u, 0))
+                    idle = refill and not users
+                await asyncio.sleep(0.5 if idle else _REFILL)
+        finally:
+            # новых отправок не начинаем, начатым даём завершиться — иначе их исход неизвестен
+            unsent = self._take_queue()
+            deadline = time.monotonic() + 5
+            while self._inflight and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            for task in senders:
+                task.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+            unsent += self._take_queue()
+            self.current = None
+            results = self._take_results()
+            try:
+                await self._db(self._finish, bid, results, unsent)
+            except Exception:
+                # итоги и возврат в очередь не теряем — _run_loop допишет их перед следующей рассылкой
+                self._leftover = (bid, results, unsent)
+                raise
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                if self._leftover is not None:
+                    await self._db(self._finish, *self._leftover)
+                    self._leftover = None
+                job = await self._db(self._next_running)
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._drain(*job)
+            except Exception as e:
+                # БД заблокирована/недоступна или неожиданная ошибка — рассылка остаётся running
+                # и продолжится со следующей попытки, а не встанет до рестарта
+                print(f"[warn] broadcast loop failed: {e!r}")
+                METRICS.error("broadcast.loop", e)
+                await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "current": self.current or 0,
+            "queued": self._queue.qsize(),
+            "inflight": self._inflight,
+            "sent": self.sent,
+            "retry_after": self.retry_after,
+        }
+
+    async def start(self, run: bool = True) -> None:
+        await self._open()
+        if run and self._task is None:
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def close(self) -> None:
+        await stop_task(self._task)
+        self._task = None
+        await super().close()
+
+_STATUS = {"draft": "черновик", "running": "идёт", "done": "завершена", "cancelled": "остановлена"}
+
+def render_progress(p: Progress, rate: float) -> str:
+    lines = [
+        f"📣 *Рассылка #{p.id}* — {_STATUS.get(p.status, p.status)}",
+        f"Отправлено {p.sent} из {p.total}, в очереди {p.pending}",
+        f"Заблокировали бота: {p.blocked}, ошибок: {p.failed}",
+    ]
+    if p.claimed:
+        # у идущей рассылки — текущая пачка; после падения процесса — неизвестно, дошло ли
+        lines.append(f"В работе/неизвестно: {p.claimed}")
+    if p.status == "running" and p.pending and rate > 0:
+        lines.append(f"Осталось примерно {max(1, round(p.pending / rate / 60))} мин")
+    if p.finished:
+        lines.append(f"Заняла {round(p.finished - p.created)} с")
+    return "\n".join(lines)
@@ -0,0 +1,284 @@
+"""
+Рейтинг по результатам тестов: за всё время и за текущую неделю (UTC, с понедельника).
+
+В зачёт идёт лучший результат пользователя — доля набранных баллов в тысячных (0..1000).
+Различных значений всего 1001, поэтому таблица — дерево Фенвика по этим значениям:
+новый результат и место «#N из M» стоят O(log 1001) при любом числе игроков.
+Первые места для /top лежат отдельным коротким отсортированным списком.
+Неделя сменилась — заводим новую пустую таблицу, ничего не пересчитывая.
+
+Лучшие результаты пишутся в SQLite (leaderboard) пачками в фоне. Каждая запись получает
+возрастающий seq, и при выгрузке процесс дочитывает изменения после своего последнего
+seq — так воркеры (см. workers.py) видят общий рейтинг с задержкой не больше flush_interval.
+"""
+import asyncio
+import bisect
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from sqlite_store import SqliteStore
+
+SCALE = 1000
+ALL_TIME = 0  # period всех результатов; у недель period = week_of(ts)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS leaderboard ("
+    " period INTEGER NOT NULL,"
+    " user_id INTEGER NOT NULL,"
+    " best INTEGER NOT NULL,"
+    " ts REAL NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " PRIMARY KEY (period, user_id))",
+    "CREATE INDEX IF NOT EXISTS leaderboard_seq ON leaderboard (seq)",
+    "CREATE TABLE IF NOT EXISTS players ("
+    " user_id INTEGER PRIMARY KEY,"
+    " name TEXT NOT NULL)",
+)
+
+def week_of(ts: float) -> int:
+    """Номер недели UTC; 1970-01-01 — четверг, сдвиг на 3 дня переносит границу на понедельник."""
+    return int((ts // 86400 + 3) // 7)
+
+def to_key(score: float, total: int) -> int:
+    if total <= 0:
+        return 0
+    return max(0, min(SCALE, round(SCALE * score / total)))
+
+class Place(NamedTuple):
+    rank: int        # место за всё время
+    of: int          # игроков за всё время
+    week_rank: int
+    week_of: int
+
+class Fenwick:
+    """Счётчики по ключам 0..size-1 с префиксными суммами за O(log size)."""
+    __slots__ = ("tree",)
+
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    def add(self, i: int, delta: int) -> None:
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        """Сумма счётчиков ключей 0..i."""
+        tree = self.tree
+        i += 1
+        s = 0
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+class Board:
+    """Лучший результат каждого игрока за period + дерево по ключам + первые top_size мест."""
+
+    def __init__(self, period: int, top_size: int = 100):
+        self.period = period
+        self.top_size = top_size
+        self.best: Dict[int, int] = {}
+        self.tree = Fenwick(SCALE + 1)
+        # (-key, ts, user_id): при равном результате выше тот, кто набрал его раньше
+        self.top: List[Tuple[int, float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.best)
+
+    def submit(self, user_id: int, key: int, ts: float) -> bool:
+        """Учесть результат; False — он не лучше уже известного."""
+        old = self.best.get(user_id)
+        if old is not None:
+            if key <= old:
+                return False
+            self.tree.add(old, -1)
+            if self.top and -old <= self.top[-1][0]:
+                for i, entry in enumerate(self.top):
+                    if entry[2] == user_id:
+                        del self.top[i]
+                        break
+        self.best[user_id] = key
+        self.tree.add(key, 1)
+        # результаты только растут, поэтому вытесненный из топа туда без нового результата не вернётся
+        entry = (-key, ts, user_id)
+        if len(self.top) < self.top_size or entry < self.top[-1]:
+            bisect.insort(self.top, entry)
+            del self.top[self.top_size:]
+        return True
+
+    def rank(self, user_id: int) -> int:
+        """1 + число игроков со строго лучшим результатом; 0 — игрока нет в таблице."""
+        key = self.best.get(user_id)
+        if key is None:
+            return 0
+        return len(self.best) - self.tree.prefix(key) + 1
+
+    def leaders(self, n: int) -> List[Tuple[int, int]]:
+        """(user_id, key) первых n мест."""
+        return [(user_id, -neg) for neg, _, user_id in self.top[:n]]
+
+def _md(text: str) -> str:
+    # имена пользователей — в Markdown-разметке сообщений
+    return re.sub(r"([_*`\[])", r"\\\1", text)
+
+class Leaderboard(SqliteStore):
+    schema = _SCHEMA
+
+    def __init__(self, db_path: str | os.PathLike, flush_interval: float = 1.0, top_size: int = 100):
+        super().__init__(db_path, flush_interval)
+        self.top_size = top_size
+        self.all_time = Board(ALL_TIME, top_size)
+        self.week = Board(week_of(time.time()), top_size)
+        self._pending: Dict[Tuple[int, int], Tuple[int, float]] = {}  # (period, user_id) -> (best, ts)
+        self._names: Dict[int, str] = {}   # ещё не записанные имена
+        self.names: Dict[int, str] = {}    # имена для /top (только тех, кого показывали)
+        self._seq = 0                      # последний применённый seq из БД
+        self.submitted = 0
+        self.rollovers = 0
+
+    def _week_board(self, ts: float) -> Board:
+        period = week_of(ts)
+        if period > self.week.period:
+            self.week = Board(period, self.top_size)
+            self.rollovers += 1
+        return self.week
+
+    def submit(self, user_id: int, score: float, total: int, ts: float | None = None) -> Place:
+        """Результат законченной сессии -> место игрока за всё время и за неделю."""
+        ts = time.time() if ts is None else ts
+        key = to_key(score, total)
+        week = self._week_board(ts)
+        for board in (self.all_time, week):
+            if board.submit(user_id, key, ts):
+                self._pending[(board.period, user_id)] = (key, ts)
+        self.submitted += 1
+        return Place(self.all_time.rank(user_id), len(self.all_time), week.rank(user_id), len(week))
+
+    def place(self, user_id: int) -> Place:
+        week = self._week_board(time.time())
+        return Place(self.all_time.rank(user_id), len(self.all_time), week.rank(user_id), len(week))
+
+    def set_name(self, user_id: int, name: str) -> None:
+        if self.names.get(user_id, self._names.get(user_id)) == name:
+            return
+        self._names[user_id] = name
+        if user_id in self.names:
+            self.names[user_id] = name
+
+    def _apply(self, rows: Iterable[Tuple[int, int, int, float, int]]) -> None:
+        for period, user_id, key, ts, seq in rows:
+            if period == ALL_TIME:
+                self.all_time.submit(user_id, key, ts)
+            elif period >= self.week.period:
+                self._week_board(ts).submit(user_id, key, ts)
+            if seq > self._seq:
+                self._seq = seq
+
+    def _load(self) -> list:
+        # сначала seq: строки, дописанные после, придут повторно при выгрузке — применение идемпотентно
+        self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM leaderboard").fetchone()[0]
+        return self._conn.execute(
+            "SELECT period, user_id, best, ts, seq FROM leaderboard WHERE period IN (?, ?)",
+            (ALL_TIME, self.week.period),
+        ).fetchall()
+
+    def _sync(self, pending: Dict[Tuple[int, int], Tuple[int, float]], names: Dict[int, str], since: int) -> list:
+        conn = self._conn
+        if pending or names:
+            # seq раздаём под блокировкой записи: у всех процессов он общий и возрастает с коммитами
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM leaderboard").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO leaderboard (period, user_id, best, ts, seq) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(period, user_id) DO UPDATE SET best = excluded.best, ts = excluded.ts, "
+                    "seq = excluded.seq WHERE excluded.best > best",
+                    [(period, user_id, key, ts, seq + i)
+                     for i, ((period, user_id), (key, ts)) in enumerate(pending.items(), 1)],
+                )
+                conn.executemany(
+                    "INSERT INTO players (user_id, name) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name",
+                    names.items(),
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return conn.execute(
+            "SELECT period, user_id, best, ts, seq FROM leaderboard WHERE seq > ? ORDER BY seq", (since,),
+        ).fetchall()
+
+    async def flush(self) -> None:
+        if self._conn is None:
+            return
+        pending, names = self._pending, self._names
+        self._pending, self._names = {}, {}
+        try:
+            rows = await self._db(self._sync, pending, names, self._seq)
+        except sqlite3.Error as e:
+            print(f"[warn] leaderboard flush failed: {e}")
+            # новое поверх старого: результаты с тех пор могли только улучшиться
+            for k, v in pending.items():
+                self._pending.setdefault(k, v)
+            for k, v in names.items():
+                self._names.setdefault(k, v)
+            return
+        self._apply(rows)
+
+    def _names_of(self, user_ids: List[int]) -> list:
+        marks = ",".join("?" * len(user_ids))
+        return self._conn.execute(f"SELECT user_id, name FROM players WHERE user_id IN ({marks})", user_ids).fetchall()
+
+    async def _lookup_names(self, user_ids: List[int]) -> None:
+        missing = [u for u in user_ids if u not in self.names]
+        for u in missing:
+            if u in self._names:
+                self.names[u] = self._names[u]
+        missing = [u for u in missing if u not in self.names]
+        if not missing or self._conn is None:
+            return
+        self.names.update(await self._db(self._names_of, missing))
+
+    async def render_top(self, user_id: int, n: int = 10) -> str:
+        place = self.place(user_id)
+        lines = []
+        for title, board, rank, of in (
+            ("🏆 *Топ недели*", self.week, place.week_rank, place.week_of),
+            ("🏛 *Топ за всё время*", self.all_time, place.rank, place.of),
+        ):
+            leaders = board.leaders(n)
+            await self._lookup_names([u for u, _ in leaders])
+            lines.append(title)
+            if not leaders:
+                lines.append("Пока никого — будь первым: /start")
+            for i, (uid, key) in enumerate(leaders, 1):
+                name = _md(self.names.get(uid) or f"Игрок {uid % 10000:04d}")
+                me = " ← ты" if uid == user_id else ""
+                lines.append(f"{i}. {name} — {key / 10:g}%{me}")
+            # при равных результатах место общее, поэтому «#6» может не попасть в первые n строк
+            if rank and all(uid != user_id for uid, _ in leaders):
+                lines.append(f"…\nТы #{rank} из {of}")
+            lines.append("")
+        return "\n".join(lines).strip()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "players": len(self.all_time),
+            "week_players": len(self.week),
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "rollovers": self.rollovers,
+        }
+
+    async def start(self) -> None:
+        if self._conn is None:
+            await self._open()
+            self._apply(await self._db(self._load))
+            self._start_flushing()
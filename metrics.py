@@ -0,0 +1,204 @@
+"""
+Инструментирование горячего пути без внешних зависимостей: гистограммы задержек
+хендлеров, методов Bot API и отдельных функций, ошибки по типам исключений,
+гауги (сессии, буферы, перезагрузки) и лаг event loop'а. Отдаётся в текстовом
+формате Prometheus на локальном /metrics.
+
+Выключено (METRICS_ENABLED=0) — middleware не регистрируются, timed() возвращает
+функцию как есть, error() выходит на первой проверке: на горячем пути ничего не добавляется.
+"""
+import asyncio
+import bisect
+import functools
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+PREFIX = "quizbot"
+# секунды; последний бакет +Inf добавляется при выводе
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        # (метрика, готовая строка меток) -> гистограмма
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}  # (где, тип исключения) -> сколько
+        self.gauges: List[Tuple[str, str, Callable[[], float]]] = []  # (имя, gauge|counter, функция)
+
+    def observe(self, metric: str, labels: str, seconds: float) -> None:
+        h = self.histograms.get((metric, labels))
+        if h is None:
+            h = self.histograms[(metric, labels)] = Histogram()
+        h.observe(seconds)
+
+    def error(self, where: str, exc: BaseException) -> None:
+        if not self.enabled:
+            return
+        key = (where, type(exc).__name__)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def gauge(self, name: str, fn: Callable[[], float], kind: str = "gauge") -> None:
+        self.gauges.append((name, kind, fn))
+
+    def render(self) -> str:
+        out: List[str] = []
+        by_metric: Dict[str, List[Tuple[str, Histogram]]] = {}
+        for (metric, labels), h in self.histograms.items():
+            by_metric.setdefault(metric, []).append((labels, h))
+        for metric, series in sorted(by_metric.items()):
+            name = f"{PREFIX}_{metric}"
+            out.append(f"# TYPE {name} histogram")
+            for labels, h in sorted(series, key=lambda x: x[0]):
+                sep = "," if labels else ""
+                acc = 0
+                for le, n in zip((*BUCKETS, "+Inf"), h.counts):
+                    acc += n
+                    out.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {acc}')
+                suffix = f"{{{labels}}}" if labels else ""
+                out.append(f"{name}_sum{suffix} {h.sum:.6f}")
+                out.append(f"{name}_count{suffix} {h.count}")
+        out.append(f"# TYPE {PREFIX}_errors_total counter")
+        for (where, exc), n in sorted(self.errors.items()):
+            out.append(f'{PREFIX}_errors_total{{where="{where}",type="{exc}"}} {n}')
+        for name, kind, fn in self.gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            out.append(f"# TYPE {PREFIX}_{name} {kind}")
+            out.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(out) + "\n"
+
+# один реестр на процесс; app включает его до того, как навешивает timed()
+METRICS = Metrics()
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Гистограмма времени вызова функции (sync или async); при выключенных метриках — no-op."""
+    def decorate(fn: Callable) -> Callable:
+        if not METRICS.enabled:
+            return fn
+        labels = f'fn="{name}"'
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    METRICS.observe("fn_seconds", labels, time.perf_counter() - t0)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICS.observe("fn_seconds", labels, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: время и ошибки конкретного хендлера (после фильтров)."""
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+        self._labels: Dict[str, str] = {}
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        name = data["handler"].callback.__name__
+        labels = self._labels.get(name)
+        if labels is None:
+            labels = self._labels[name] = f'handler="{name}"'
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.metrics.error(name, e)
+            raise
+        finally:
+            self.metrics.observe("handler_seconds", labels, time.perf_counter() - t0)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки каждого метода Bot API."""
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+        self._labels: Dict[str, str] = {}
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        labels = self._labels.get(name)
+        if labels is None:
+            labels = self._labels[name] = f'method="{name}"'
+        t0 = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.error(f"api.{name}", e)
+            raise
+        finally:
+            self.metrics.observe("api_seconds", labels, time.perf_counter() - t0)
+
+async def watch_loop_lag(metrics: Metrics = METRICS, interval: float = 0.5) -> None:
+    """Насколько позже запланированного просыпается задача — лаг event loop'а."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        metrics.observe("loop_lag_seconds", "", max(0.0, loop.time() - t0 - interval))
+
+class MetricsServer:
+    """Локальный HTTP: /metrics плюс фоновый замер лага."""
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None  # aiohttp.web.AppRunner
+        self._lag: asyncio.Task | None = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        return web.Response(text=self.metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        from aiohttp import web  # aiohttp.web нужен только с включёнными метриками
+
+        web_app = web.Application()
+        web_app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(web_app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag = asyncio.create_task(watch_loop_lag(self.metrics))
+        print(f"[info] metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._lag:
+            self._lag.cancel()
+            try:
+                await self._lag
+            except asyncio.CancelledError:
+                pass
+            self._lag = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,173 @@
+"""
+Исходящие вызовы Bot API одного апдейта: копим операции, выкидываем лишние
+(снятие клавиатуры перед edit_text того же сообщения), независимые вызовы
+(правки старых сообщений, ответ на колбэк) шлём параллельно с цепочкой новых
+сообщений, которая идёт строго по порядку. Всё, что создаёт/меняет сообщения,
+проходит через общий лимит бота; лимит чата — один токен на апдейт (один ход
+пользователя: отзыв + следующий вопрос), правки и ответы на колбэки его не тратят.
+Иначе каждый ответ тратил бы 3 токена чата, и после всплеска пользователь ждал
+бы ~3 с на вопрос — держа при этом свою блокировку из user_locks.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from aiogram import Bot
+from aiogram.types import CallbackQuery, Message
+
+from metrics import METRICS
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst в запасе."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забрать токен; вернуть, сколько секунд подождать до его появления."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+class ChatRateLimiter:
+    """
+    Общий лимит бота (~30 сообщений/с) плюс лимит на чат (~1/с с небольшим запасом на всплеск).
+    Ведра чатов создаются по требованию и выбрасываются, когда полностью восстановились.
+    Ведро общего лимита своё у каждого процесса: при WORKERS=N app делит RATE_GLOBAL на N.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 5):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chats: Dict[int, TokenBucket] = {}
+        self._acquires = 0
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    async def acquire(self, chat_id: int, per_chat: bool = True) -> None:
+        """per_chat=False — только общий лимит (правки, вторые и дальше сообщения одного хода)."""
+        delay = self.global_bucket.reserve()
+        if per_chat and self.chat_rate > 0:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            delay = max(delay, bucket.reserve())
+        self._acquires += 1
+        if self._acquires % 1024 == 0:
+            self._gc()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _gc(self) -> None:
+        for chat_id in [c for c, b in self._chats.items() if b.idle_full()]:
+            del self._chats[chat_id]
+
+class Outbox:
+    """Исходящие операции одного апдейта; выполняются в flush()."""
+
+    def __init__(self, bot: Bot, limiter: ChatRateLimiter | None = None):
+        self.bot = bot
+        self.limiter = limiter
+        self._chain: List[Callable[[], Awaitable[Any]]] = []     # новые сообщения — по порядку
+        self._edits: Dict[int, Dict[str, Any]] = {}              # message_id -> правка
+        self._callbacks: List[Callable[[], Awaitable[Any]]] = []
+        self._charged: Set[int] = set()  # чаты, с которых этот апдейт уже взял токен чата
+
+    async def _limit(self, chat_id: int, per_chat: bool = True) -> None:
+        if self.limiter is not None:
+            per_chat = per_chat and chat_id not in self._charged
+            if per_chat:
+                # только то, что реально взяло токен чата: правка до отправки его не тратит
+                self._charged.add(chat_id)
+            await self.limiter.acquire(chat_id, per_chat)
+
+    # --- правки существующих сообщений (независимы от цепочки) ---
+    def remove_keyboard(self, msg: Message) -> None:
+        self.edit_markup(msg, None)
+
+    def edit_markup(self, msg: Message, reply_markup: Any) -> None:
+        edit = self._edits.setdefault(msg.message_id, {"msg": msg})
+        edit["kb"] = reply_markup
+
+    def edit_text(self, msg: Message, text: str, reply_markup: Any = None) -> None:
+        edit = self._edits.setdefault(msg.message_id, {"msg": msg})
+        edit["text"] = text
+        edit["markup"] = reply_markup
+
+    # --- новые сообщения (строго по порядку) ---
+    def send(self, chat_id: int, text: str, reply_markup: Any = None,
+             on_sent: Callable[[Message], None] | None = None) -> None:
+        async def op():
+            await self._limit(chat_id)
+            sent = await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+            if on_sent is not None:
+                on_sent(sent)
+        self._chain.append(op)
+
+    def send_sticker(self, chat_id: int, sticker: str) -> None:
+        async def op():
+            await self._limit(chat_id)
+            await self.bot.send_sticker(chat_id, sticker)
+        self._chain.append(op)
+
+    # --- ответ на колбэк (не сообщение, лимитом не ограничен) ---
+    def answer_callback(self, c: CallbackQuery, text: str | None = None) -> None:
+        self._callbacks.append(lambda: c.answer(text))
+
+    async def _run_edit(self, edit: Dict[str, Any]) -> None:
+        msg: Message = edit["msg"]
+        await self._limit(msg.chat.id, per_chat=False)
+        if "text" in edit:
+            # edit_text без reply_markup сам снимает inline-клавиатуру, отдельный вызов не нужен
+            try:
+                await msg.edit_text(edit["text"], reply_markup=edit["markup"])
+                return
+            except Exception as e:
+                METRICS.error("outbox.edit_text", e)
+                if "kb" not in edit:
+                    return
+            # правка текста не прошла — хотя бы поменяем клавиатуру, как и просили
+        try:
+            await msg.edit_reply_markup(reply_markup=edit["kb"])
+        except Exception as e:
+            # Уже убрали/сообщение недоступно — пользователю не мешает, но считаем
+            METRICS.error("outbox.edit_reply_markup", e)
+
+    async def _run_chain(self, chain: List[Callable[[], Awaitable[Any]]]) -> None:
+        for op in chain:
+            await op()
+
+    async def _run_callback(self, op: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await op()
+        except Exception as e:
+            # колбэк мог протухнуть (>15 с) — пользователю это не мешает
+            METRICS.error("outbox.answer_callback", e)
+
+    async def flush(self) -> None:
+        edits, self._edits = list(self._edits.values()), {}
+        chain, self._chain = self._chain, []
+        callbacks, self._callbacks = self._callbacks, []
+        tasks = [self._run_chain(chain)]
+        tasks += [self._run_edit(e) for e in edits]
+        tasks += [self._run_callback(op) for op in callbacks]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # ошибки правок/колбэков уже проглочены; ошибку цепочки отдаём наверх, как раньше
+        if isinstance(results[0], BaseException):
+            raise results[0]
@@ -0,0 +1,175 @@
+"""
+Горячая перезагрузка контента без рестарта. Раз в interval секунд сверяем
+mtime/размер файлов пакетов и карты тегов; изменившийся пакет перечитывается,
+а индекс пересобирается в фоновом потоке, после чего движок одним присваиванием
+переключается на новый индекс. Начатые сессии держат ссылку на свой индекс
+и доигрывают ту версию вопросов, на которой стартовали.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from packs_loader import CACHE_DIR, load_pack_file
+from quiz_engine import QuizEngine
+from tags_map_loader import load_tags_map
+
+Stamp = Tuple[int, int]  # (mtime_ns, size)
+
+def _stamp(path: str) -> Stamp | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class PackWatcher:
+    def __init__(self, engine: QuizEngine, packs_dir: str = "data/packs",
+                 tags_path: str = "data/tags_map.yaml", interval: float = 5.0,
+                 cache_dir: str | None = CACHE_DIR):
+        self.engine = engine
+        self.packs_dir = packs_dir
+        self.tags_path = tags_path
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self._files: Dict[str, Tuple[Stamp, str]] = {}  # путь -> (отпечаток, код пакета)
+        self._tags_stamp: Stamp | None = None
+        self._task: asyncio.Task | None = None
+        # счётчики для админки/метрик
+        self.reloads = 0
+        self.tags_reloads = 0
+        self.failures = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.last_error = ""
+
+    def _scan(self) -> Dict[str, Stamp]:
+        stamps: Dict[str, Stamp] = {}
+        if not os.path.isdir(self.packs_dir):
+            return stamps
+        for name in os.listdir(self.packs_dir):
+            if name.endswith(".yaml"):
+                path = os.path.join(self.packs_dir, name)
+                stamp = _stamp(path)
+                if stamp is not None:
+                    stamps[path] = stamp
+        return stamps
+
+    def _baseline(self) -> None:
+        """Запомнить текущие файлы и коды их пакетов (из снапшотов, без разбора YAML)."""
+        for path, stamp in self._scan().items():
+            try:
+                code = load_pack_file(path, self.cache_dir)["pack"]["code"]
+            except Exception:
+                code = ""
+            self._files[path] = (stamp, code)
+        self._tags_stamp = _stamp(self.tags_path)
+
+    def _rebuild(self, changed: Dict[str, Stamp], removed: List[str]):
+        """
+        Фоновый поток: перечитать только изменённые файлы и собрать новый индекс.
+        Битый файл не валит остальные — для него остаётся прежняя версия пакета.
+        """
+        packs = dict(self.engine.packs)
+        for path in removed:
+            packs.pop(self._files[path][1], None)
+        files: Dict[str, Tuple[Stamp, str]] = {}
+        errors: List[Tuple[str, Exception]] = []
+        for path, stamp in changed.items():
+            old_code = self._files[path][1] if path in self._files else ""
+            # отпечаток запоминаем и при ошибке: битый файл не перечитываем, пока он снова не изменится
+            files[path] = (stamp, old_code)
+            try:
+                data = load_pack_file(path, self.cache_dir)
+                code = data["pack"]["code"]
+            except Exception as e:
+                errors.append((os.path.basename(path), e))
+                continue
+            if old_code and old_code != code:
+                packs.pop(old_code, None)
+            packs[code] = data
+            files[path] = (stamp, code)
+        if len(errors) == len(changed) and not removed:
+            return None, files, errors
+        return (packs, self.engine.build_index(packs)), files, errors
+
+    def _fail(self, what: str, e: Exception) -> None:
+        self.failures += 1
+        self.last_error = f"{what}: {type(e).__name__}: {e}"
+        print(f"[warn] reload failed, keeping previous version — {self.last_error}")
+
+    def _timed(self, t0: float) -> None:
+        self.last_ms = (time.perf_counter() - t0) * 1000
+        self.max_ms = max(self.max_ms, self.last_ms)
+
+    async def poll(self) -> bool:
+        """Одна сверка файлов; True, если индекс пакетов подменён."""
+        current = self._scan()
+        changed = {p: st for p, st in current.items() if p not in self._files or self._files[p][0] != st}
+        removed = [p for p in self._files if p not in current]
+        swapped = False
+        if changed or removed:
+            t0 = time.perf_counter()
+            try:
+                built, files, errors = await asyncio.to_thread(self._rebuild, changed, removed)
+            except Exception as e:
+                # не собрался индекс — движок остаётся на прежнем; повторим, когда файлы снова изменятся
+                self._fail("index", e)
+                for path, stamp in changed.items():
+                    self._files[path] = (stamp, self._files[path][1] if path in self._files else "")
+            else:
+                for what, e in errors:
+                    self._fail(what, e)
+                if built is not None:
+                    self.engine.swap_index(*built)
+                    self.reloads += 1
+                    swapped = True
+                for path in removed:
+                    del self._files[path]
+                self._files.update(files)
+            self._timed(t0)
+
+        tags_stamp = _stamp(self.tags_path)
+        if tags_stamp != self._tags_stamp:
+            self._tags_stamp = tags_stamp
+            t0 = time.perf_counter()
+            try:
+                self.engine.tags_map = await asyncio.to_thread(load_tags_map, self.tags_path)
+            except Exception as e:
+                self._fail(os.path.basename(self.tags_path), e)
+            else:
+                self.tags_reloads += 1
+            self._timed(t0)
+        return swapped
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:  # наблюдатель не должен умирать из-за ФС
+                self._fail("poll", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reloads": self.reloads,
+            "tags_reloads": self.tags_reloads,
+            "failures": self.failures,
+            "last_ms": round(self.last_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "last_error": self.last_error,
+        }
+
+    async def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            await asyncio.to_thread(self._baseline)
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
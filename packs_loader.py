@@ -1,9 +1,92 @@
 import os
-from typing import Dict, Any, List
-import yaml
-import random
+import hashlib
+import marshal
+from typing import Dict, Any
 
-def load_packs(dir_path: str = "data/packs") -> Dict[str, Any]:
+# Бинарные снапшоты пакетов: YAML парсится только если исходник изменился
+CACHE_DIR = os.getenv("PACKS_CACHE_DIR", "data/.cache/packs")
+# Поднимать при изменении формата снапшота — старые файлы будут проигнорированы
+_SNAPSHOT_VERSION = 1
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _snapshot_path(cache_dir: str, name: str) -> str:
+    return os.path.join(cache_dir, name + ".marshal")
+
+def _read_snapshot(path: str) -> Dict[str, Any] | None:
+    try:
+        with open(path, "rb") as f:
+            snap = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snap, dict) or snap.get("v") != _SNAPSHOT_VERSION:
+        return None
+    return snap
+
+def _write_snapshot(path: str, snap: Dict[str, Any]) -> None:
+    # пишем во временный файл и атомарно подменяем, чтобы не оставить битый снапшот
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as f:
+            marshal.dump(snap, f)
+        os.replace(tmp, path)
+    except (OSError, ValueError, TypeError) as e:
+        # ValueError — в YAML есть то, чего не умеет marshal (даты `updated: 2025-09-01` и т.п.):
+        # снапшота у такого пакета не будет, загрузка идёт по разобранному YAML
+        print(f"[warn] pack snapshot write failed for {os.path.basename(path)}: {e}")
+    finally:
+        try:
+            os.remove(tmp)  # после os.replace его уже нет
+        except OSError:
+            pass
+
+def parse_pack_file(path: str) -> Dict[str, Any]:
+    """Честный разбор YAML без кэша."""
+    import yaml  # нужен только при промахе мимо снапшота — при тёплом кэше не импортируем вовсе
+
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def load_pack_file(path: str, cache_dir: str | None = CACHE_DIR) -> Dict[str, Any]:
+    """
+    Загрузить пакет: сначала снапшот (сверка по mtime/размеру, затем по sha256),
+    и только при изменении исходника — разбор YAML с пересборкой снапшота.
+    """
+    if not cache_dir:
+        return parse_pack_file(path)
+
+    st = os.stat(path)
+    snap_path = _snapshot_path(cache_dir, os.path.basename(path))
+    snap = _read_snapshot(snap_path)
+    if snap is not None:
+        if snap["mtime_ns"] == st.st_mtime_ns and snap["size"] == st.st_size:
+            return snap["data"]
+        # mtime сдвинулся (checkout, копирование) — сверяем содержимое
+        digest = _file_sha256(path)
+        if snap["sha256"] == digest:
+            snap["mtime_ns"], snap["size"] = st.st_mtime_ns, st.st_size
+            _write_snapshot(snap_path, snap)
+            return snap["data"]
+    else:
+        digest = _file_sha256(path)
+
+    data = parse_pack_file(path)
+    _write_snapshot(snap_path, {
+        "v": _SNAPSHOT_VERSION,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": digest,
+        "data": data,
+    })
+    return data
+
+def load_packs(dir_path: str = "data/packs", cache_dir: str | None = CACHE_DIR) -> Dict[str, Any]:
     packs: Dict[str, Any] = {}
     if not os.path.isdir(dir_path):
         return packs
@@ -11,13 +94,7 @@ def load_packs(dir_path: str = "data/packs") -> Dict[str, Any]:
         if not name.endswith(".yaml"):
             continue
         path = os.path.join(dir_path, name)
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+        data = load_pack_file(path, cache_dir)
         code = data["pack"]["code"]
         packs[code] = data
     return packs
-
-def pick_questions(pack: Dict[str, Any], n: int = 10) -> List[Dict[str, Any]]:
-    qs = list(pack.get("questions", []))
-    random.shuffle(qs)
-    return qs[:n]
\ No newline at end of file
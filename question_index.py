@@ -0,0 +1,147 @@
+import random
+from answer_matcher import FreeAnswerMatcher
+from typing import Dict, Any, List, Tuple, Hashable, Callable, Iterable
+
+Pool = Tuple[int, ...]
+
+def _answer_letters(q: Dict[str, Any]) -> List[str]:
+    ans = q.get("answer", [])
+    if isinstance(ans, str):
+        ans = [ans]
+    return [a.strip().lower() for a in ans]
+
+class QuestionIndex:
+    """
+    Неизменяемый индекс вопросов, собирается один раз из загруженных пакетов.
+    Каждый вопрос получает целочисленный qid (позиция в self.questions),
+    а группы по пакету/уровню/тегу/типу/сложности хранятся как кортежи qid —
+    выборка k вопросов стоит O(k) и не копирует пул.
+    """
+
+    def __init__(self, packs: Dict[str, Any], virtual_packs: Dict[str, Tuple[str, ...]] | None = None,
+                 render: Callable[[Dict[str, Any]], str] | None = None):
+        self.questions: List[Dict[str, Any]] = []
+        self.keys: List[str] = []               # qid -> стабильный ключ "pack:id"
+        self.by_key: Dict[str, int] = {}
+        self.pack_of: List[str] = []            # qid -> код пакета
+        self.pack_meta: Dict[str, Dict[str, Any]] = {}
+
+        by_pack: Dict[str, List[int]] = {}
+        by_level: Dict[str, List[int]] = {}
+        by_tag: Dict[str, List[int]] = {}
+        by_type: Dict[str, List[int]] = {}
+        by_difficulty: Dict[Any, List[int]] = {}
+        packs_by_level: Dict[str, List[str]] = {}
+
+        # сортируем коды, чтобы qid не зависели от порядка os.listdir
+        for code in sorted(packs):
+            data = packs[code]
+            meta = data.get("pack", {})
+            level = meta.get("level")
+            self.pack_meta[code] = meta
+            packs_by_level.setdefault(level, []).append(code)
+            for q in data.get("questions", []):
+                qid = len(self.questions)
+                key = f"{code}:{q.get('id', qid)}"
+                # в пакетах встречаются повторяющиеся id — делаем ключ уникальным
+                n = 2
+                base = key
+                while key in self.by_key:
+                    key = f"{base}#{n}"
+                    n += 1
+                self.questions.append(q)
+                self.keys.append(key)
+                self.by_key[key] = qid
+                self.pack_of.append(code)
+                by_pack.setdefault(code, []).append(qid)
+                by_level.setdefault(level, []).append(qid)
+                by_type.setdefault(q.get("type"), []).append(qid)
+                by_difficulty.setdefault(q.get("difficulty"), []).append(qid)
+                for tag in q.get("tags", []):
+                    by_tag.setdefault(tag, []).append(qid)
+
+        self.by_pack: Dict[str, Pool] = {k: tuple(v) for k, v in by_pack.items()}
+        self.by_level: Dict[str, Pool] = {k: tuple(v) for k, v in by_level.items()}
+        self.by_tag: Dict[str, Pool] = {k: tuple(v) for k, v in by_tag.items()}
+        self.by_type: Dict[str, Pool] = {k: tuple(v) for k, v in by_type.items()}
+        self.by_difficulty: Dict[Any, Pool] = {k: tuple(v) for k, v in by_difficulty.items()}
+        self.packs_by_level: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in packs_by_level.items()}
+
+        # виртуальные пакеты (например, "mixed") — готовый пул qid по списку уровней,
+        # сами вопросы не копируются и общий список никто не перезаписывает
+        for code, levels in (virtual_packs or {}).items():
+            self.by_pack[code] = tuple(q for level in levels for q in self.by_level.get(level, ()))
+            self.pack_meta[code] = {"code": code, "title": code, "level": code, "levels": tuple(levels)}
+
+        self.all: Pool = tuple(range(len(self.questions)))
+        # вопросы неизменяемы — тексты для показа рендерим один раз при загрузке
+        self.rendered: List[str] = [render(q) for q in self.questions] if render else []
+        # single/multi: бит i маски — i-я буква вариантов в порядке options;
+        # правильный ответ сводится к int один раз, выбор пользователя — тоже int
+        self.letters: List[Tuple[str, ...]] = [tuple(q.get("options") or ()) for q in self.questions]
+        self.answer_mask: List[int] = [
+            self.letters_mask(qid, _answer_letters(q)) if q.get("type") in ("single", "multi") else 0
+            for qid, q in enumerate(self.questions)
+        ]
+        # free-ответы: варианты нормализуются и токенизируются здесь, а не на каждый ответ
+        self.matchers: Dict[int, FreeAnswerMatcher] = {
+            qid: FreeAnswerMatcher(self.questions[qid].get("answer", []))
+            for qid in self.by_type.get("free", ())
+        }
+        # кэш пересечений фильтров: пулы неизменяемы, так что считаем один раз
+        self._combos: Dict[Tuple[Hashable, ...], Pool] = {}
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def get(self, qid: int) -> Dict[str, Any]:
+        return self.questions[qid]
+
+    def option_bit(self, qid: int, letter: str) -> int:
+        """Бит буквы варианта в маске вопроса; 0 — такой буквы нет."""
+        letters = self.letters[qid]
+        return 1 << letters.index(letter) if letter in letters else 0
+
+    def letters_mask(self, qid: int, letters: Iterable[str]) -> int:
+        mask = 0
+        for i, letter in enumerate(self.letters[qid]):
+            if letter.lower() in letters:
+                mask |= 1 << i
+        return mask
+
+    def mask_letters(self, qid: int, mask: int) -> List[str]:
+        return [letter for i, letter in enumerate(self.letters[qid]) if mask >> i & 1]
+
+    def has_pack(self, code: str) -> bool:
+        return code in self.by_pack
+
+    def pool(self, pack: str | None = None, level: str | None = None, tag: str | None = None,
+             qtype: str | None = None, difficulty: Any = None) -> Pool:
+        """Кортеж qid, удовлетворяющих всем заданным фильтрам."""
+        parts = [
+            (g, v) for g, v in (
+                (self.by_pack, pack),
+                (self.by_level, level),
+                (self.by_tag, tag),
+                (self.by_type, qtype),
+                (self.by_difficulty, difficulty),
+            ) if v is not None
+        ]
+        if not parts:
+            return self.all
+        if len(parts) == 1:
+            g, v = parts[0]
+            return g.get(v, ())
+        key = (pack, level, tag, qtype, difficulty)
+        cached = self._combos.get(key)
+        if cached is None:
+            pools = sorted((g.get(v, ()) for g, v in parts), key=len)
+            rest = [set(p) for p in pools[1:]]
+            cached = tuple(q for q in pools[0] if all(q in s for s in rest))
+            self._combos[key] = cached
+        return cached
+
+    def sample(self, k: int, **filters: Any) -> List[int]:
+        """k случайных qid без повторов (меньше, если пул меньше k)."""
+        pool = self.pool(**filters)
+        return random.sample(pool, min(k, len(pool)))
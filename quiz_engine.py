@@ -1,10 +1,11 @@
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Iterable
+from array import array
+import json
+import time
 import re
 from tags_map_loader import load_tags_map, render_tags
-TAGS_MAP = load_tags_map()
-
-def _norm(s: str) -> str:
-    return (s or "").strip().lower()
+from question_index import QuestionIndex
+from session_store import MemorySessionStore
 
 def _split_letters(s: str) -> List[str]:
     parts = re.split(r"[,\s;]+", (s or "").strip())
@@ -29,73 +30,195 @@ def _format_correct_answer(q: Dict[str, Any]) -> str:
         return first
     return ""
 
+def render_question_text(q: Dict[str, Any]) -> str:
+    """Форматируем вопрос: смайл у Q, пустая строка перед вариантами, жирные буквы."""
+    t = q["type"]
+    header = f"🔎 *Q:* {q['text']}"
+    if t in ("single", "multi"):
+        # жирные буквы a/b/c/d
+        opts = "\n".join([f"**{k})** {v}" for k, v in q["options"].items()])
+        hint = "_Один вариант_" if t == "single" else "_Выбери один или несколько вариантов_"
+        return f"{header}\n\n{opts}\n\n{hint}"
+    return f"{header}\n\n_Свободный ответ_"
+
+class Session:
+    """
+    Состояние одного прохождения. Хранит только целочисленные qid вопросов
+    (индексы в QuestionIndex.questions) и счётчики; тексты, правильные ответы и
+    ошибки по тегам вычисляются из qid в момент подведения итогов.
+    qid имеют смысл только в том индексе, на котором сессия началась, —
+    поэтому сессия держит ссылку на него и доигрывается на своей версии вопросов.
+    """
+    __slots__ = ("index", "qids", "idx", "score", "correct_count", "wrong", "selected", "done", "msg_id", "shown_at",
+                 "review")
+
+    def __init__(self, qids: Iterable[int], index: QuestionIndex):
+        self.index = index
+        self.qids = array("I", qids)
+        self.idx = 0
+        self.score = 0.0              # может включать частичный зачёт
+        self.correct_count = 0        # количество полностью верных
+        self.wrong = array("I")       # qid неверно отвеченных вопросов
+        self.selected = 0             # отмеченные варианты multi-вопроса, битовая маска
+        self.done = False
+        self.msg_id = 0               # сообщение с текущим вопросом (0 — неизвестно)
+        self.shown_at = 0.0           # monotonic-время показа текущего вопроса (для латентности ответа)
+        self.review = False           # повторение ошибок (reminders.py): в рейтинг не идёт
+
+    @property
+    def total(self) -> int:
+        return len(self.qids)
+
 class QuizEngine:
-    def __init__(self, packs: Dict[str, Any]):
+    def __init__(self, packs: Dict[str, Any], virtual_packs: Dict[str, Tuple[str, ...]] | None = None,
+                 tags_map: Dict[str, str] | None = None):
+        self.virtual_packs = virtual_packs
         self.packs = packs
-        self.sessions: Dict[int, Dict[str, Any]] = {}  # user_id -> session
+        self.index = self.build_index(packs)
+        # app читает карту тегов параллельно с пакетами и передаёт готовую
+        self.tags_map = load_tags_map() if tags_map is None else tags_map
+        self.sessions = MemorySessionStore()  # user_id -> session (бэкенд подменяемый)
+        self.stats = None  # stats_store.StatsStore — поток событий ответов; None — не пишем
+        self.selector = None  # adaptive.AdaptiveSelector; None — равномерная выборка из пула
+        self.leaderboard = None  # leaderboard.Leaderboard; None — без рейтинга
+        self.reminders = None  # reminders.Reminders; None — без интервальных повторений
+
+    def build_index(self, packs: Dict[str, Any]) -> QuestionIndex:
+        """Собрать индекс для набора пакетов (можно звать из фонового потока — движок не трогает)."""
+        return QuestionIndex(packs, self.virtual_packs, render=render_question_text)
+
+    def swap_index(self, packs: Dict[str, Any], index: QuestionIndex) -> None:
+        """Подменить пакеты и индекс разом: новые сессии пойдут по новому, начатые — доиграют на своём."""
+        self.packs, self.index = packs, index
 
     def start_session(self, user_id: int, pack_code: str) -> None:
-        pack = self.packs[pack_code]
-        from packs_loader import pick_questions
-        questions = pick_questions(pack, n=10)
-        self.sessions[user_id] = {
-            "questions": questions,
-            "idx": 0,
-            "score": 0.0,              # может включать частичный зачёт
-            "correct_count": 0,        # количество полностью верных
-            "errors_by_tag": {},
-            "wrong_items": [],         # список неверных вопросов для финального отчёта
-            "done": False,
-        }
+        index = self.index
+        if not index.has_pack(pack_code):
+            raise KeyError(pack_code)
+        if self.selector is not None:
+            qids = self.selector.draw(user_id, index, pack_code, 10)
+        else:
+            qids = index.sample(10, pack=pack_code)
+        self.sessions[user_id] = Session(qids, index)
+
+    def start_review(self, user_id: int, keys: Iterable[str]) -> int:
+        """Сессия из ранее пропущенных вопросов (по ключам); вернуть число вопросов, 0 — повторять нечего."""
+        index = self.index
+        qids = [index.by_key[k] for k in keys if k in index.by_key]
+        if not qids:
+            return 0
+        s = Session(qids, index)
+        s.review = True
+        self.sessions[user_id] = s
+        return len(qids)
+
+    def dump_session(self, s: Session) -> str:
+        """Сериализация для персистентного хранилища: вместо qid — их стабильные ключи."""
+        keys = s.index.keys
+        return json.dumps({
+            "questions": [keys[qid] for qid in s.qids],
+            "idx": s.idx,
+            "score": s.score,
+            "correct_count": s.correct_count,
+            "wrong": [keys[qid] for qid in s.wrong],
+            "selected": s.selected,
+            "done": s.done,
+            "msg_id": s.msg_id,
+            "review": s.review,
+        }, ensure_ascii=False)
+
+    def load_session(self, raw: str) -> Session | None:
+        """Обратная операция (по текущему индексу); None, если каких-то вопросов больше нет в пакетах."""
+        data = json.loads(raw)
+        index = self.index
+        qids = [index.by_key.get(k) for k in data["questions"]]
+        wrong = [index.by_key.get(k) for k in data["wrong"]]
+        if None in qids or None in wrong:
+            return None
+        s = Session(qids, index)
+        s.idx = data["idx"]
+        s.score = data["score"]
+        s.correct_count = data["correct_count"]
+        s.wrong.extend(wrong)
+        sel = data["selected"]
+        if not isinstance(sel, int):
+            # старые записи хранили список букв
+            sel = index.letters_mask(s.qids[s.idx], sel) if sel and s.idx < s.total else 0
+        s.selected = sel
+        s.done = data["done"]
+        s.msg_id = data.get("msg_id", 0)
+        s.review = data.get("review", False)
+        return s
+
+    def toggle_option(self, user_id: int, letter: str) -> int:
+        s = self.sessions[user_id]
+        s.selected ^= s.index.option_bit(s.qids[s.idx], letter)
+        self.sessions.save(user_id)
+        return s.selected
+
+    def reset_selection(self, user_id: int) -> int:
+        s = self.sessions[user_id]
+        s.selected = 0
+        self.sessions.save(user_id)
+        return 0
 
     def has_active(self, user_id: int) -> bool:
         s = self.sessions.get(user_id)
-        return bool(s and not s.get("done"))
+        return bool(s and not s.done)
+
+    def is_active_on(self, user_id: int, message_id: int) -> bool:
+        """Активна ли сессия и относится ли нажатая кнопка к текущему вопросу."""
+        s = self.sessions.get(user_id)
+        return bool(s and not s.done and (not s.msg_id or s.msg_id == message_id))
+
+    def bind_message(self, user_id: int, message_id: int) -> None:
+        s = self.sessions.get(user_id)
+        if s is not None:
+            s.msg_id = message_id
+            s.shown_at = time.monotonic()
+            self.sessions.save(user_id)
+
+    def current_letters(self, user_id: int) -> Tuple[str, ...]:
+        s = self.sessions[user_id]
+        return s.index.letters[s.qids[s.idx]]
 
     def get_current(self, user_id: int) -> Dict[str, Any]:
         s = self.sessions[user_id]
-        return s["questions"][s["idx"]]
-
-    def render_question(self, q: Dict[str, Any]) -> str:
-        """Форматируем вопрос: смайл у Q, пустая строка перед вариантами, жирные буквы."""
-        t = q["type"]
-        header = f"🔎 *Q:* {q['text']}"
-        if t in ("single", "multi"):
-            # жирные буквы a/b/c/d
-            opts = "\n".join([f"**{k})** {v}" for k, v in q["options"].items()])
-            hint = "_Один вариант_" if t == "single" else "_Выбери один или несколько вариантов_"
-            return f"{header}\n\n{opts}\n\n{hint}"
-        return f"{header}\n\n_Свободный ответ_"
-
-    def _score_single(self, q: Dict[str, Any], answer_text: str) -> Tuple[float, bool]:
-        ok = _norm(answer_text) == _norm(q["answer"])
+        return s.index.get(s.qids[s.idx])
+
+    def errors_by_tag(self, s: Session) -> Dict[str, int]:
+        """Ошибки по тегам — считаем из неверных qid, в сессии не храним."""
+        errors: Dict[str, int] = {}
+        for qid in s.wrong:
+            for tag in s.index.get(qid).get("tags", []):
+                errors[tag] = errors.get(tag, 0) + 1
+        return errors
+
+    def render_current(self, user_id: int) -> str:
+        """Текст текущего вопроса из заранее отрендеренного кэша индекса."""
+        s = self.sessions[user_id]
+        return s.index.rendered[s.qids[s.idx]]
+
+    def _score_single(self, index: QuestionIndex, qid: int, mask: int) -> Tuple[float, bool]:
+        ok = mask == index.answer_mask[qid]
         return (1.0 if ok else 0.0, ok)
 
-    def _score_multi(self, q: Dict[str, Any], answer_text: str) -> Tuple[float, bool]:
-        correct = set(_norm(x) for x in q["answer"])
-        user = set(_split_letters(answer_text))
-        if not user:
+    def _score_multi(self, index: QuestionIndex, qid: int, mask: int) -> Tuple[float, bool]:
+        correct = index.answer_mask[qid]
+        if not mask:
             return (0.0, False)
-        if user == correct:
+        if mask == correct:
             return (1.0, True)
         # частичный зачёт
-        precision = len(user & correct) / len(correct)
-        wrong_penalty = len(user - correct) / max(1, len(correct))
+        n_correct = max(1, correct.bit_count())
+        precision = (mask & correct).bit_count() / n_correct
+        wrong_penalty = (mask & ~correct).bit_count() / n_correct
         partial = max(0.0, precision - 0.3 * wrong_penalty)
         return (round(partial, 2), False)
 
-    def _score_free(self, q: Dict[str, Any], answer_text: str) -> Tuple[float, bool]:
-        user = _norm(answer_text)
-        if not user:
-            return (0.0, False)
-        variants = [_norm(v) for v in q.get("answer", [])]
-        if user in variants:
-            return (1.0, True)
-        for v in variants:
-            words = [w for w in v.split() if w]
-            if words and all(w in user for w in words):
-                return (1.0, True)
-        return (0.0, False)
+    def _score_free(self, index: QuestionIndex, qid: int, answer_text: str) -> Tuple[float, bool]:
+        ok = index.matchers[qid].match(answer_text)
+        return (1.0 if ok else 0.0, ok)
 
     def _encouragement(self, correct: int, total: int) -> Dict[str, str]:
         """
@@ -113,65 +236,95 @@ class QuizEngine:
                 return {"text": r["text"], "sticker": r["sticker"]}
         return {"text": "", "sticker": ""}
 
-    def check(self, user_id: int, answer_text: str) -> Dict[str, Any]:
+    def check(self, user_id: int, answer: str | int) -> Dict[str, Any]:
+        """answer — маска вариантов (кнопки) или текст: буквы через запятую либо свободный ответ."""
         s = self.sessions[user_id]
-        q = s["questions"][s["idx"]]
+        index = s.index
+        qid = s.qids[s.idx]
+        q = index.get(qid)
         qtype = q["type"]
 
-        if qtype == "single":
-            add, ok = self._score_single(q, answer_text)
-        elif qtype == "multi":
-            add, ok = self._score_multi(q, answer_text)
+        if qtype == "free":
+            add, ok = self._score_free(index, qid, answer)
         else:
-            add, ok = self._score_free(q, answer_text)
+            mask = answer if isinstance(answer, int) else index.letters_mask(qid, _split_letters(answer))
+            if qtype == "single":
+                add, ok = self._score_single(index, qid, mask)
+            else:
+                add, ok = self._score_multi(index, qid, mask)
+
+        if self.stats is not None:
+            text = answer if isinstance(answer, str) else ",".join(index.mask_letters(qid, answer))
+            latency = time.monotonic() - s.shown_at if s.shown_at else 0.0
+            self.stats.record(user_id, index.keys[qid], q.get("tags", ()), text[:256], add, ok, latency)
+        if self.selector is not None:
+            self.selector.observe(user_id, index.keys[qid], q.get("tags", ()), ok)
 
-        s["score"] += add
+        s.score += add
         if ok:
-            s["correct_count"] += 1
+            s.correct_count += 1
         else:
-            # статистика ошибок + запоминаем неверный вопрос
-            for tag in q.get("tags", []):
-                s["errors_by_tag"][tag] = s["errors_by_tag"].get(tag, 0) + 1
-            s["wrong_items"].append({
-                "text": q["text"],
-                "correct": _format_correct_answer(q),
-                "explanation": q.get("explanation", "")
-            })
+            # запоминаем только qid — текст ошибки соберём в итогах
+            s.wrong.append(qid)
 
         feedback = f"{'✅ Верно' if ok else '❌ Неверно'} (+{add:.2f})\nℹ️ {q.get('explanation','')}"
-        s["idx"] += 1
-
-        if s["idx"] >= len(s["questions"]):
-            s["done"] = True
-            total = len(s["questions"])
-            correct = s["correct_count"]
-            pct = round(100 * correct / total)
-            # дружелюбная итого без упоминания пакета
-            header = f"🏁 *Итоги тестирования:* {correct}/{total} ({pct}%)"
-            # вдохновляющий текст
-            mood = self._encouragement(correct, total)
-            mood_text = mood["text"]
-            sticker_id = mood["sticker"]
-
-            # топ-3 проблемных тега (оставим как подсказку)
-            hardest = sorted(s["errors_by_tag"].items(), key=lambda kv: kv[1], reverse=True)[:7]
-            raw_tags = [t for t, _ in hardest]
-            topics_line = f"*❗️Темы для прокачки*: {render_tags(raw_tags, TAGS_MAP)}"
-
-            # список неверных с правильными ответами
-            if s["wrong_items"]:
-                lines = ["\n*👇 Ошибки:*"]
-                for i, item in enumerate(s["wrong_items"], 1):
-                    right = f" `{item['correct']}`" if item["correct"] else "—"
-                    expl = f"\n   _{item['explanation']}_ " if item["explanation"] else ""
-                    # добавляем \n в конце, чтобы был отступ
-                    lines.append(f"*{i}) {item['text']}*\n   *👉 Правильно:* {right}{expl}\n")
-                mistakes_md = "\n".join(lines)
-            else:
-                mistakes_md = ""
+        s.idx += 1
+        s.selected = 0
+        self.sessions.save(user_id)
 
-            summary = "\n".join([header, topics_line, "", mood_text, mistakes_md]).strip()
+        if s.idx >= s.total:
+            s.done = True
+            if self.stats is not None:
+                self.stats.record_session(user_id, s.correct_count, s.total)
+            place = None
+            if self.leaderboard is not None and not s.review:
+                place = self.leaderboard.submit(user_id, s.score, s.total)
+            summary, sticker_id = self.render_summary(s, place)
+            if self.reminders is not None:
+                self.reminders.on_finished(user_id, [index.keys[q] for q in s.qids], {index.keys[q] for q in s.wrong})
+                if s.wrong and not self.reminders.is_enabled(user_id):
+                    summary += "\n\n🔁 Напомнить повторить эти вопросы через день, неделю и месяц? /remind"
+            # законченная сессия больше не нужна — не держим её в кэше до ttl
+            self.sessions.pop(user_id, None)
             return {"feedback": feedback, "done": True, "summary": summary, "sticker_id": sticker_id}
 
         # ещё есть вопросы
-        return {"feedback": feedback, "done": False, "next": s["questions"][s["idx"]]}
+        return {"feedback": feedback, "done": False, "next": index.get(s.qids[s.idx])}
+
+    def render_summary(self, s: Session, place=None) -> Tuple[str, str]:
+        """Итоговый текст и стикер; тексты вопросов берём из индекса по qid. place — leaderboard.Place."""
+        total = s.total
+        correct = s.correct_count
+        pct = round(100 * correct / total)
+        # дружелюбная итого без упоминания пакета
+        header = f"🏁 *Итоги тестирования:* {correct}/{total} ({pct}%)"
+        if place is not None:
+            header += (f"\n🏆 Рейтинг: #{place.week_rank} из {place.week_of} за неделю, "
+                       f"#{place.rank} из {place.of} за всё время (/top)")
+        # вдохновляющий текст
+        mood = self._encouragement(correct, total)
+        mood_text = mood["text"]
+        sticker_id = mood["sticker"]
+
+        # топ-3 проблемных тега (оставим как подсказку)
+        hardest = sorted(self.errors_by_tag(s).items(), key=lambda kv: kv[1], reverse=True)[:7]
+        raw_tags = [t for t, _ in hardest]
+        topics_line = f"*❗️Темы для прокачки*: {render_tags(raw_tags, self.tags_map)}"
+
+        # список неверных с правильными ответами
+        if s.wrong:
+            lines = ["\n*👇 Ошибки:*"]
+            for i, qid in enumerate(s.wrong, 1):
+                q = s.index.get(qid)
+                correct_text = _format_correct_answer(q)
+                explanation = q.get("explanation", "")
+                right = f" `{correct_text}`" if correct_text else "—"
+                expl = f"\n   _{explanation}_ " if explanation else ""
+                # добавляем \n в конце, чтобы был отступ
+                lines.append(f"*{i}) {q['text']}*\n   *👉 Правильно:* {right}{expl}\n")
+            mistakes_md = "\n".join(lines)
+        else:
+            mistakes_md = ""
+
+        summary = "\n".join([header, topics_line, "", mood_text, mistakes_md]).strip()
+        return summary, sticker_id
@@ -0,0 +1,360 @@
+"""
+Интервальные повторения по желанию пользователя (/remind). Вопросы, на которых он ошибся,
+попадают в review_items и возвращаются через растущие интервалы: 1, 3, 7, 16 и 35 дней.
+Верный ответ на такой вопрос (в повторении или в обычном тесте) переводит его на
+следующий интервал, ошибка — снова на первый. После последнего интервала вопрос выучен.
+
+Когда напоминать каждому пользователю (ближайший due его вопросов), знает иерархическое
+колесо таймеров: постановка и отмена — O(1), тик — O(1) плюс амортизированное O(1)
+на переезд записи с уровня на уровень. Одна задача тикает раз в tick секунд,
+другая отправляет сработавшие напоминания не быстрее rate в секунду (и через общий
+лимитер бота). Состояние — в SQLite, при старте колесо заполняется из reminder_users.next_at.
+"""
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Sequence, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from metrics import METRICS
+from outbound import ChatRateLimiter, TokenBucket
+from sqlite_store import SqliteStore, stop_task
+
+DAY = 86400
+INTERVALS = (1 * DAY, 3 * DAY, 7 * DAY, 16 * DAY, 35 * DAY)
+NUDGE_AFTER = 7 * DAY  # не отреагировал на напоминание — повторим не раньше чем через неделю
+
+_SCHEMA = (
+    # строка есть — напоминания включены; next_at — когда напомнить (NULL — повторять нечего)
+    "CREATE TABLE IF NOT EXISTS reminder_users ("
+    " user_id INTEGER PRIMARY KEY,"
+    " next_at REAL)",
+    "CREATE TABLE IF NOT EXISTS review_items ("
+    " user_id INTEGER NOT NULL,"
+    " qkey TEXT NOT NULL,"
+    " step INTEGER NOT NULL,"
+    " due REAL NOT NULL,"
+    " PRIMARY KEY (user_id, qkey))",
+)
+
+class TimingWheel:
+    """
+    Иерархическое колесо: levels уровней по slots ячеек, ячейка уровня L покрывает slots**L тиков.
+    Запись лежит ровно в одной ячейке (словарь ключ -> due), where[key] указывает на неё —
+    отмена и перестановка за O(1). Когда время доходит до ячейки верхнего уровня, её записи
+    раскладываются заново, ниже; дальше последнего уровня ставим на его край и переставим позже.
+    """
+
+    def __init__(self, now: int, slots: int = 64, levels: int = 4):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.now = now  # последний обработанный тик
+        self.wheels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.where: Dict[Hashable, Dict[Hashable, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.where
+
+    def _place(self, key: Hashable, due: int, base: int) -> None:
+        target = max(due, base)
+        delta = target - base
+        for level in range(self.levels):
+            if delta < 1 << (self.bits * (level + 1)):
+                break
+        else:
+            target = base + (1 << (self.bits * self.levels)) - 1
+        slot = self.wheels[level][(target >> (self.bits * level)) & self.mask]
+        slot[key] = due
+        self.where[key] = slot
+
+    def schedule(self, key: Hashable, due: int) -> None:
+        """Сработать на тике due (прошедший — на следующем тике); старая постановка ключа снимается."""
+        self.cancel(key)
+        self._place(key, due, self.now + 1)
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self.where.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def advance(self, to: int) -> List[Hashable]:
+        """Прокрутить до тика to включительно; вернуть сработавшие ключи."""
+        fired: List[Hashable] = []
+        bits, mask = self.bits, self.mask
+        while self.now < to:
+            t = self.now + 1
+            # верхние уровни раньше нижних: запись может спуститься на несколько уровней за раз
+            for level in range(self.levels - 1, 0, -1):
+                if t & ((1 << (bits * level)) - 1):
+                    continue
+                slot = self.wheels[level][(t >> (bits * level)) & mask]
+                if slot:
+                    items = list(slot.items())
+                    slot.clear()
+                    for key, due in items:
+                        self._place(key, due, t)
+            self.now = t
+            slot = self.wheels[0][t & mask]
+            if slot:
+                fired.extend(slot)
+                for key in slot:
+                    del self.where[key]
+                slot.clear()
+        return fired
+
+def review_kb():
+    kb = InlineKeyboardBuilder()
+    kb.button(text="🔁 Повторить", callback_data="review:start")
+    return kb.as_markup()
+
+class Reminders(SqliteStore):
+    schema = _SCHEMA
+
+    def __init__(self, bot: Bot, db_path: str | os.PathLike, limiter: ChatRateLimiter | None = None,
+                 rate: float = 10, tick: float = 1.0, flush_interval: float = 2.0):
+        super().__init__(db_path, flush_interval)
+        self.bot = bot
+        self.limiter = limiter
+        self.rate = rate
+        self.tick = tick
+        self.enabled: Set[int] = set()
+        self.wheel = TimingWheel(self._tick_of(time.time()))
+        self._queue: deque[int] = deque()  # сработавшие, ждут отправки
+        self._wakeup = asyncio.Event()
+        # ждут записи: результаты сессий, включения/выключения, новые next_at
+        self._results: List[Tuple[int, float, Sequence[str], Set[str]]] = []
+        self._toggles: Dict[int, bool] = {}
+        self._next: Dict[int, float] = {}
+        self._tasks: List[asyncio.Task] = []  # тик и отправка (фоновая запись — в SqliteStore)
+        self.sent = 0
+        self.skipped = 0   # сработало, но повторять уже нечего
+        self.blocked = 0   # пользователь заблокировал бота — выключили ему напоминания
+
+    def _tick_of(self, ts: float) -> int:
+        return math.ceil(ts / self.tick)
+
+    def is_enabled(self, user_id: int) -> bool:
+        return user_id in self.enabled
+
+    def set_enabled(self, user_id: int, on: bool) -> None:
+        if on:
+            self.enabled.add(user_id)
+        else:
+            self.enabled.discard(user_id)
+            self.wheel.cancel(user_id)
+            self._next.pop(user_id, None)
+        self._toggles[user_id] = on
+
+    def on_finished(self, user_id: int, keys: Sequence[str], wrong: Set[str]) -> None:
+        """Итоги сессии (ключи всех вопросов и неверно отвеченных) — в очередь на запись."""
+        if user_id in self.enabled:
+            self._results.append((user_id, time.time(), keys, wrong))
+
+    def _load(self) -> list:
+        return self._conn.execute("SELECT user_id, next_at FROM reminder_users").fetchall()
+
+    def _write(self, results: list, toggles: Dict[int, bool], nexts: Dict[int, float]) -> List[Tuple[int, float | None]]:
+        conn = self._conn
+        touched: Set[int] = set()
+        with conn:
+            for user_id, on in toggles.items():
+                if on:
+                    conn.execute("INSERT OR IGNORE INTO reminder_users (user_id) VALUES (?)", (user_id,))
+                    touched.add(user_id)
+                else:
+                    conn.execute("DELETE FROM reminder_users WHERE user_id = ?", (user_id,))
+                    conn.execute("DELETE FROM review_items WHERE user_id = ?", (user_id,))
+            conn.executemany("UPDATE reminder_users SET next_at = ? WHERE user_id = ?",
+                             [(ts, user_id) for user_id, ts in nexts.items()])
+            for user_id, ts, keys, wrong in results:
+                if toggles.get(user_id) is False:
+                    continue
+                marks = ",".join("?" * len(keys))
+                steps = dict(conn.execute(
+                    f"SELECT qkey, step FROM review_items WHERE user_id = ? AND qkey IN ({marks})", (user_id, *keys),
+                ))
+                upsert, learned = [], []
+                for key in keys:
+                    if key in wrong:
+                        upsert.append((user_id, key, 0, ts + INTERVALS[0]))
+                    elif key in steps:
+                        step = steps[key] + 1
+                        if step < len(INTERVALS):
+                            upsert.append((user_id, key, step, ts + INTERVALS[step]))
+                        else:
+                            learned.append((user_id, key))
+                conn.executemany(
+                    "INSERT INTO review_items (user_id, qkey, step, due) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, qkey) DO UPDATE SET step = excluded.step, due = excluded.due",
+                    upsert,
+                )
+                conn.executemany("DELETE FROM review_items WHERE user_id = ? AND qkey = ?", learned)
+                touched.add(user_id)
+            # включённым пользователям с изменившейся очередью — новый срок напоминания
+            rows = []
+            for user_id in touched:
+                conn.execute(
+                    "UPDATE reminder_users SET next_at = "
+                    "(SELECT MIN(due) FROM review_items WHERE user_id = ?1) WHERE user_id = ?1", (user_id,),
+                )
+                row = conn.execute("SELECT next_at FROM reminder_users WHERE user_id = ?", (user_id,)).fetchone()
+                if row is not None:
+                    rows.append((user_id, row[0]))
+        return rows
+
+    def _schedule(self, user_id: int, next_at: float | None) -> None:
+        if next_at is None or user_id not in self.enabled:
+            self.wheel.cancel(user_id)
+        else:
+            self.wheel.schedule(user_id, self._tick_of(next_at))
+
+    async def flush(self) -> None:
+        if self._conn is None or not (self._results or self._toggles or self._next):
+            return
+        results, toggles, nexts = self._results, self._toggles, self._next
+        self._results, self._toggles, self._next = [], {}, {}
+        try:
+            rows = await self._db(self._write, results, toggles, nexts)
+        except sqlite3.Error as e:
+            print(f"[warn] reminders flush failed: {e}")
+            self._results = results + self._results
+            self._toggles = {**toggles, **self._toggles}
+            self._next = {**nexts, **self._next}
+            return
+        for user_id, next_at in rows:
+            self._schedule(user_id, next_at)
+
+    def _review_keys(self, user_id: int, limit: int) -> list:
+        return self._conn.execute(
+            "SELECT qkey FROM review_items WHERE user_id = ? ORDER BY due LIMIT ?", (user_id, limit),
+        ).fetchall()
+
+    async def review_keys(self, user_id: int, limit: int = 10) -> List[str]:
+        """Вопросы для повторения: сначала самые просроченные."""
+        if self._conn is None:
+            return []
+        return [key for (key,) in await self._db(self._review_keys, user_id, limit)]
+
+    def _due_counts(self, user_ids: List[int], now: float) -> Dict[int, int]:
+        marks = ",".join("?" * len(user_ids))
+        return dict(self._conn.execute(
+            f"SELECT user_id, COUNT(*) FROM review_items WHERE user_id IN ({marks}) AND due <= ? GROUP BY user_id",
+            (*user_ids, now),
+        ))
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                fired = self.wheel.advance(self._tick_of(time.time()))
+            except Exception as e:
+                # один сбойный тик не должен останавливать напоминания до рестарта
+                print(f"[warn] reminders tick failed: {e!r}")
+                METRICS.error("reminders.tick", e)
+                continue
+            if fired:
+                self._queue.extend(fired)
+                self._wakeup.set()
+
+    async def _send(self, user_id: int, due: int) -> None:
+        if self.limiter is not None:
+            await self.limiter.acquire(user_id)
+        # чат с ботом — личный: chat_id совпадает с user_id
+        await self.bot.send_message(
+            user_id,
+            f"🔁 Пора повторить: {due} вопрос(ов), где ты ошибался. Займёт пару минут.\n"
+            "Выключить напоминания: /remind",
+            reply_markup=review_kb(),
+        )
+
+    async def _send_loop(self) -> None:
+        bucket = TokenBucket(self.rate, self.rate)
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            batch = [self._queue.popleft() for _ in range(min(len(self._queue), max(1, int(self.rate))))]
+            batch = [u for u in batch if u in self.enabled]
+            if not batch:
+                continue
+            done = 0
+            try:
+                counts = await self._db(self._due_counts, batch, time.time())
+                for user_id in batch:
+                    done += 1
+                    await self._remind(bucket, user_id, counts.get(user_id, 0))
+            except Exception as e:
+                # БД заблокирована/недоступна или неожиданная ошибка — необработанный остаток пачки
+                # возвращается в голову очереди, цикл продолжает работу со следующей попытки
+                print(f"[warn] reminders send loop failed: {e!r}")
+                METRICS.error("reminders.loop", e)
+                self._queue.extendleft(reversed(batch[done:]))
+                await asyncio.sleep(self.tick)
+
+    async def _remind(self, bucket: TokenBucket, user_id: int, due: int) -> None:
+        if not due:
+            self.skipped += 1  # успел ответить на всё в обычных тестах; новый срок придёт из flush
+            return
+        delay = bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await self._send(user_id, due)
+        except TelegramRetryAfter as e:
+            self._queue.appendleft(user_id)
+            await asyncio.sleep(e.retry_after)
+            return
+        except TelegramForbiddenError:
+            self.blocked += 1
+            self.set_enabled(user_id, False)
+            return
+        except Exception as e:
+            METRICS.error("reminders.send", e)
+            return
+        self.sent += 1
+        nudge = time.time() + NUDGE_AFTER
+        self._schedule(user_id, nudge)
+        self._next[user_id] = nudge
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": len(self.enabled),
+            "scheduled": len(self.wheel),
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "blocked": self.blocked,
+        }
+
+    async def start(self, owns: Callable[[int], bool] | None = None) -> None:
+        """owns — только пользователи своего шарда (воркеры)."""
+        if self._conn is not None:
+            return
+        await self._open()
+        for user_id, next_at in await self._db(self._load):
+            if owns is not None and not owns(user_id):
+                continue
+            self.enabled.add(user_id)
+            self._schedule(user_id, next_at)
+        self._tasks = [asyncio.create_task(self._tick_loop()), asyncio.create_task(self._send_loop())]
+        self._start_flushing()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            await stop_task(task)
+        self._tasks = []
+        await super().close()
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Set, Tuple
+
+from sqlite_store import SqliteStore
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " user_id INTEGER PRIMARY KEY,"
+    " data TEXT NOT NULL,"
+    " updated_at REAL NOT NULL)",
+)
+
+class MemorySessionStore:
+    """
+    Сессии в памяти процесса: user_id -> session. Бэкенд по умолчанию.
+    Кэш ограничен: max_size записей с вытеснением давно не трогавшихся (LRU)
+    и ttl секунд простоя, после которых брошенную сессию убирает фоновый sweeper.
+    0 в любом из лимитов — без ограничения.
+    """
+
+    def __init__(self, max_size: int = 0, ttl: float = 0, sweep_interval: float = 60):
+        # порядок OrderedDict = порядок последнего обращения, самые старые в начале
+        self._data: OrderedDict[int, Any] = OrderedDict()
+        self._atime: Dict[int, float] = {}
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0      # вытеснены по max_size
+        self.expirations = 0    # убраны по ttl
+        self._sweeper: asyncio.Task | None = None
+
+    def _touch(self, user_id: int) -> None:
+        self._data.move_to_end(user_id)
+        self._atime[user_id] = time.monotonic()
+
+    def get(self, user_id: int, default: Any = None) -> Any:
+        s = self._data.get(user_id)
+        if s is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(user_id)
+        return s
+
+    def __getitem__(self, user_id: int) -> Any:
+        s = self.get(user_id)
+        if s is None:
+            raise KeyError(user_id)
+        return s
+
+    def __setitem__(self, user_id: int, session: Any) -> None:
+        self._data[user_id] = session
+        self.save(user_id)
+        if self.max_size and len(self._data) > self.max_size:
+            self._evict_lru()
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._data)
+
+    def items(self):
+        return self._data.items()
+
+    def pop(self, user_id: int, default: Any = None) -> Any:
+        self._atime.pop(user_id, None)
+        s = self._data.pop(user_id, default)
+        self.save(user_id)
+        return s
+
+    def save(self, user_id: int) -> None:
+        """Сессию изменили на месте: отмечаем обращение (персистентные бэкенды ещё и пишут её)."""
+        if user_id in self._data:
+            self._touch(user_id)
+
+    def _drop(self, user_id: int) -> None:
+        self._data.pop(user_id, None)
+        self._atime.pop(user_id, None)
+
+    def _evict_lru(self) -> None:
+        while len(self._data) > self.max_size:
+            user_id = next(iter(self._data))
+            self._drop(user_id)
+            self.evictions += 1
+            self.save(user_id)
+
+    def sweep(self) -> int:
+        """Убрать сессии, простаивающие дольше ttl. Идём с LRU-конца, пока не встретим свежую."""
+        if not self.ttl:
+            return 0
+        deadline = time.monotonic() - self.ttl
+        removed = 0
+        while self._data:
+            user_id = next(iter(self._data))
+            if self._atime.get(user_id, 0.0) > deadline:
+                break
+            self._drop(user_id)
+            self.save(user_id)
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики кэша для админки/метрик."""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    async def start(self) -> None:
+        if self.ttl and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self) -> None:
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+class SqliteSessionStore(MemorySessionStore, SqliteStore):
+    """
+    Сессии в памяти + write-behind в SQLite (WAL).
+    Изменения копятся в наборе «грязных» user_id, фоновая задача раз в
+    flush_interval сериализует их на event loop и пишет одной транзакцией
+    в отдельном потоке — нажатие кнопки не ждёт диска.
+    """
+
+    schema = _SCHEMA
+
+    def __init__(self, db_path: str | os.PathLike, dumps: Callable[[Any], str],
+                 loads: Callable[[str], Any], flush_interval: float = 0.5, **cache: Any):
+        MemorySessionStore.__init__(self, **cache)
+        SqliteStore.__init__(self, db_path, flush_interval)
+        self.dumps = dumps
+        self.loads = loads
+        self._dirty: Set[int] = set()
+        # в многопроцессном режиме: поднимать из БД только сессии своего шарда
+        self.owns: Callable[[int], bool] | None = None
+
+    def save(self, user_id: int) -> None:
+        super().save(user_id)
+        self._dirty.add(user_id)
+
+    def _load_rows(self) -> list[Tuple[int, str, float]]:
+        # старые первыми — тогда порядок OrderedDict сразу совпадёт с LRU
+        return self._conn.execute("SELECT user_id, data, updated_at FROM sessions ORDER BY updated_at").fetchall()
+
+    async def start(self) -> None:
+        await self._open()
+        rows = await self._db(self._load_rows)
+        stale = []
+        now_wall, now_mono = time.time(), time.monotonic()
+        for user_id, raw, updated_at in rows:
+            if self.owns is not None and not self.owns(user_id):
+                continue
+            if self.ttl and now_wall - updated_at > self.ttl:
+                stale.append(user_id)
+                continue
+            try:
+                s = self.loads(raw)
+            except Exception as e:
+                print(f"[warn] session {user_id} not restored: {e}")
+                s = None
+            if s is None:
+                # вопросы пропали из пакетов — такую сессию не продолжить
+                stale.append(user_id)
+                continue
+            self._data[user_id] = s
+            self._atime[user_id] = now_mono - max(0.0, now_wall - updated_at)
+        self._dirty.update(stale)
+        if self.max_size and len(self._data) > self.max_size:
+            self._evict_lru()
+        self._start_flushing()
+        await MemorySessionStore.start(self)
+
+    def _collect(self) -> Tuple[list, list]:
+        upserts, deletes = [], []
+        now = time.time()
+        for user_id in self._dirty:
+            s = self._data.get(user_id)
+            if s is None:
+                deletes.append((user_id,))
+            else:
+                upserts.append((user_id, self.dumps(s), now))
+        self._dirty.clear()
+        return upserts, deletes
+
+    def _write(self, upserts: list, deletes: list) -> None:
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM sessions WHERE user_id = ?", deletes)
+
+    async def flush(self) -> None:
+        if not self._dirty or self._conn is None:
+            return
+        upserts, deletes = self._collect()
+        try:
+            await self._db(self._write, upserts, deletes)
+        except sqlite3.Error as e:
+            # не теряем изменения: попробуем в следующий раз
+            print(f"[warn] session flush failed: {e}")
+            self._dirty.update(u for u, *_ in upserts)
+            self._dirty.update(u for u, in deletes)
+
+    async def close(self) -> None:
+        await MemorySessionStore.close(self)
+        await SqliteStore.close(self)
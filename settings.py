@@ -10,9 +10,71 @@ CHANNEL_URL = os.getenv("CHANNEL_URL", default="https://t.me/qa_mind")
 # Для статистики/файлов: разные БД под prod/staging
 DB_PATH = os.getenv("DB_PATH", f"data/bot_stats_{ENV}.sqlite3")
 
+# Статистика ответов в DB_PATH: события и агрегаты по вопросам/тегам пишутся пачками в фоне
+STATS_ENABLED = os.getenv("STATS_ENABLED", "1") == "1"
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "1.0"))
+STATS_BUFFER = int(os.getenv("STATS_BUFFER", "100000"))  # ёмкость кольцевого буфера событий
+# Сколько секунд админские отчёты /stats и /hardest отдаются из кэша
+ADMIN_STATS_TTL = float(os.getenv("ADMIN_STATS_TTL", "30"))
+# Рейтинг (/top и место в итогах): лучшие результаты в DB_PATH, выгрузка/синхронизация раз в N сек
+LEADERBOARD_ENABLED = os.getenv("LEADERBOARD_ENABLED", "1") == "1"
+LEADERBOARD_FLUSH_INTERVAL = float(os.getenv("LEADERBOARD_FLUSH_INTERVAL", "1.0"))
+LEADERBOARD_TOP = int(os.getenv("LEADERBOARD_TOP", "10"))  # сколько мест показывает /top
+# Интервальные повторения ошибок (пользователь включает сам через /remind); напоминаний в секунду не больше
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "1") == "1"
+REMINDERS_RATE = float(os.getenv("REMINDERS_RATE", "10"))
+REMINDERS_TICK = float(os.getenv("REMINDERS_TICK", "1.0"))  # шаг колеса таймеров, сек
+# Админская рассылка /broadcast: сообщений в секунду (из общего лимита RATE_GLOBAL) и число отправителей
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+BROADCAST_SENDERS = int(os.getenv("BROADCAST_SENDERS", "8"))
+
+# Адаптивный подбор вопросов (история пользователя, слабые теги, трудность); по умолчанию выключен
+ADAPTIVE_SELECTION = os.getenv("ADAPTIVE_SELECTION") == "1"
+ADAPTIVE_HISTORY_DAYS = float(os.getenv("ADAPTIVE_HISTORY_DAYS", "90"))  # сколько истории поднимать из статистики
+
+# Хранилище сессий: "memory" (по умолчанию) | "sqlite" (переживает рестарт, пишет в DB_PATH)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.5"))
+# Лимиты кэша сессий: максимум записей (LRU), простой в секундах до удаления, период sweeper'а
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 3600)))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Как часто проверять data/packs и data/tags_map.yaml на изменения (сек); 0 — без горячей перезагрузки
+PACKS_WATCH_INTERVAL = float(os.getenv("PACKS_WATCH_INTERVAL", "5"))
+# Сколько вариантов multi-клавиатур (буквы × отметки) держать в памяти
+MULTI_KB_CACHE_SIZE = int(os.getenv("MULTI_KB_CACHE_SIZE", "1024"))
+
+# Режим приёма апдейтов: "polling" (по умолчанию) | "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")        # публичный https://host, куда ходит Telegram
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")            # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Число процессов-обработчиков; >1 — апдейты шардируются по user_id (см. workers.py)
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Сколько апдейтов воркер обрабатывает одновременно (каждый — своя задача; порядок внутри пользователя
+# держит UserSerialMiddleware)
+WORKER_INFLIGHT = int(os.getenv("WORKER_INFLIGHT", "256"))
+# Лимиты исходящих сообщений под ограничения Telegram: всего в секунду (на бота целиком — при WORKERS=N
+# каждый процесс получает RATE_GLOBAL/N) и на один чат (токен на ход пользователя, см. outbound.py)
+RATE_GLOBAL = float(os.getenv("RATE_GLOBAL", "30"))
+RATE_PER_CHAT = float(os.getenv("RATE_PER_CHAT", "1"))
+RATE_CHAT_BURST = float(os.getenv("RATE_CHAT_BURST", "5"))
+# Свой Bot API сервер (local bot-api или фейк для нагрузочных тестов); пусто — api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+# Метрики в формате Prometheus на локальном http://METRICS_HOST:METRICS_PORT/metrics (воркер i — порт + i)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
 # (опционально) флаги
 MAINTENANCE = os.getenv("MAINTENANCE") == "1"
 FEATURE_BETA = os.getenv("FEATURE_BETA") == "1"
 
-if not TELEGRAM_TOKEN:
-    raise RuntimeError("TELEGRAM_TOKEN is missing in .env")
\ No newline at end of file
+def validate() -> None:
+    """Проверка перед запуском бота (см. app.create_app); сам импорт настроек ничего не требует."""
+    if not TELEGRAM_TOKEN:
+        raise RuntimeError("TELEGRAM_TOKEN is missing in .env")
+    if BOT_MODE == "webhook" and not WEBHOOK_BASE_URL:
+        raise RuntimeError("WEBHOOK_BASE_URL is required when BOT_MODE=webhook")
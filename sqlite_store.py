@@ -0,0 +1,99 @@
+"""
+Общий каркас хранилищ в одном файле SQLite (DB_PATH): сессии, статистика, рейтинг,
+напоминания, рассылки. Здесь всё, что у них одинаково и не должно расходиться:
+как открывается соединение (WAL, ожидание чужой блокировки записи), одна блокировка
+на все обращения к соединению из потоков, фоновая запись раз в flush_interval
+и порядок остановки (фоновая запись -> последняя запись -> закрытие соединения).
+
+Фоновую запись при остановке не отменяют, а просят завершиться: flush() снимает пачку
+с буфера до записи, и отмена посреди записи теряла бы её (а закрытие соединения
+под незавершённым запросом — тем более).
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Sequence
+
+# несколько хранилищ и воркеров пишут в один файл — ждём блокировку, а не падаем с "database is locked"
+BUSY_TIMEOUT = 30
+
+def connect(db_path: str, schema: Sequence[str] = ()) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for ddl in schema:
+        conn.execute(ddl)
+    conn.commit()
+    return conn
+
+async def stop_task(task: asyncio.Task | None) -> None:
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+class SqliteStore:
+    """
+    Соединение + блокировка + write-behind. Наследник задаёт schema и flush().
+    Соединение одно на все потоки, поэтому запросы идут через _db(): в потоке и под
+    self._lock — иначе чтение попадало бы внутрь чужой открытой транзакции (BEGIN IMMEDIATE,
+    `with conn:`), а две транзакции — друг в друга.
+    """
+
+    schema: Sequence[str] = ()
+
+    def __init__(self, db_path: str | os.PathLike, flush_interval: float = 1.0):
+        self.db_path = str(db_path)
+        self.flush_interval = flush_interval
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._closing = asyncio.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect(self.db_path, self.schema)
+
+    async def _db(self, fn: Callable[..., Any], *args) -> Any:
+        """Вызов fn(*args) в потоке под общей блокировкой соединения."""
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    async def _open(self) -> None:
+        if self._conn is None:
+            self._conn = await asyncio.to_thread(self._connect)
+
+    async def flush(self) -> None:
+        """Записать накопленное; у хранилищ без write-behind — ничего."""
+
+    async def _flush_loop(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def _start_flushing(self) -> None:
+        self._closing.clear()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def start(self) -> None:
+        if self._conn is None:
+            await self._open()
+            self._start_flushing()
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._flusher is not None:
+            await self._flusher  # дописывает текущую пачку и выходит
+            self._flusher = None
+        await self.flush()
+        if self._conn is not None:
+            with self._lock:  # отменённая задача могла оставить запрос в потоке — дождёмся его
+                self._conn.close()
+                self._conn = None
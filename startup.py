@@ -0,0 +1,92 @@
+"""
+Профиль холодного старта: python app.py --profile-startup
+
+Бот поднимается как обычно, но без приёма апдейтов: вместо снятия/установки вебхука —
+безобидный getMe, после прогрева всё закрывается. Печатаются фазы старта — с какого
+момента и сколько шли (параллельные фазы перекрываются на шкале) — и цена импортов:
+процесс перезапускается под `python -X importtime`, и из его вывода берутся модули,
+которые импортирует сам app.py, с временем вместе со всеми их зависимостями.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, List, Tuple
+
+FLAG = "--profile-startup"
+
+class StartupProfile:
+    """Фазы старта: (имя, начало, конец) в секундах от t0."""
+
+    def __init__(self, t0: float | None = None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.phases: List[Tuple[str, float, float]] = []
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.phases.append((name, start - self.t0, end - self.t0))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Та же функция, но с замером — для пула потоков."""
+        def run(*args, **kwargs):
+            with self.phase(name):
+                return fn(*args, **kwargs)
+        return run
+
+    async def run(self, name: str, aw: Awaitable[Any]) -> Any:
+        with self.phase(name):
+            return await aw
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.add(name, now, now)
+
+    def report(self, width: int = 40) -> str:
+        phases = sorted(self.phases, key=lambda p: (p[1], p[2]))
+        total = max((end for _, _, end in phases), default=0.0) or 1e-9
+        lines = ["startup phases (ms from start; phases that overlap ran concurrently):"]
+        for name, start, end in phases:
+            a = min(width - 1, int(start / total * width))
+            b = max(a + 1, int(end / total * width))
+            bar = " " * a + ("█" * (b - a) if end > start else "|")
+            lines.append(f"  {start * 1e3:8.1f} +{(end - start) * 1e3:8.1f}  {bar:<{width}}  {name}")
+        return "\n".join(lines)
+
+# import time:  self [us] | cumulative | imported package
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_costs(lines: List[str], top: int = 12) -> str:
+    """Сводка -X importtime: прямые импорты (без отступа) по убыванию полной цены."""
+    direct = []
+    for line in lines:
+        m = _IMPORTTIME.match(line)
+        # нулевой уровень — один пробел-разделитель; так же выглядят модули старта интерпретатора
+        if m and len(m.group(3)) == 1:
+            direct.append((int(m.group(2)), m.group(4)))
+    direct.sort(reverse=True)
+    total = sum(us for us, _ in direct)
+    lines = [f"imports: {total / 1e3:.1f} ms in {len(direct)} top-level modules (with dependencies)"]
+    for us, name in direct[:top]:
+        lines.append(f"  {us / 1e3:8.1f} ms  {name}")
+    return "\n".join(lines)
+
+def profile_startup(script: str) -> int:
+    """Запустить script с FLAG под -X importtime и дописать к его профилю цену импортов."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", script, FLAG],
+                          stderr=subprocess.PIPE, text=True, env=os.environ.copy())
+    lines = proc.stderr.splitlines()
+    # всё, что не строки importtime (предупреждения, трейсбэки), отдаём как есть
+    rest = [line for line in lines if not line.startswith("import time:")]
+    if rest:
+        print("\n".join(rest), file=sys.stderr)
+    print(import_costs(lines))
+    return proc.returncode
@@ -1,3 +1,248 @@
-from pathlib import Path
-from settings import DB_PATH as DB_PATH_STR
-DB_PATH = Path(DB_PATH_STR)
\ No newline at end of file
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlite_store import BUSY_TIMEOUT, SqliteStore
+
+# (ts, user_id, qkey, tags, answer, score, ok, latency_ms)
+Event = Tuple[float, int, str, Sequence[str], str, float, bool, int]
+# законченная сессия: (ts, user_id, correct, total)
+Done = Tuple[float, int, int, int]
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS answer_events ("
+    " id INTEGER PRIMARY KEY,"
+    " ts REAL NOT NULL,"
+    " user_id INTEGER NOT NULL,"
+    " qkey TEXT NOT NULL,"
+    " answer TEXT NOT NULL,"
+    " score REAL NOT NULL,"
+    " ok INTEGER NOT NULL,"
+    " latency_ms INTEGER NOT NULL)",
+    # история с момента since (прогрев адаптивного подбора) — без полного прохода по растущей таблице
+    "CREATE INDEX IF NOT EXISTS answer_events_ts ON answer_events (ts)",
+    "CREATE TABLE IF NOT EXISTS question_stats ("
+    " qkey TEXT PRIMARY KEY,"
+    " attempts INTEGER NOT NULL,"
+    " correct INTEGER NOT NULL,"
+    " score_sum REAL NOT NULL,"
+    " latency_ms_sum INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS tag_stats ("
+    " tag TEXT PRIMARY KEY,"
+    " attempts INTEGER NOT NULL,"
+    " errors INTEGER NOT NULL)",
+    # hour = unix-время // 3600
+    "CREATE TABLE IF NOT EXISTS hourly_stats ("
+    " hour INTEGER PRIMARY KEY,"
+    " completions INTEGER NOT NULL,"
+    " correct_sum INTEGER NOT NULL,"
+    " total_sum INTEGER NOT NULL)",
+    # bucket = доля верных в сессии, округлённая до десятков процентов (0..10)
+    "CREATE TABLE IF NOT EXISTS score_hist ("
+    " bucket INTEGER PRIMARY KEY,"
+    " sessions INTEGER NOT NULL)",
+)
+
+class StatsStore(SqliteStore):
+    """
+    Поток ответов -> SQLite. record() только кладёт кортеж в кольцевой буфер
+    (при переполнении теряются самые старые события), фоновая задача раз в
+    flush_interval пишет пачку одной транзакцией в отдельном потоке: сырые события
+    через executemany и инкременты агрегатов по вопросам и тегам (upsert с «+ excluded»).
+    Законченные сессии так же копятся в своём буфере и сворачиваются в почасовые
+    счётчики и гистограмму результатов. Админские запросы читают только агрегаты
+    и сырые события не сканируют.
+    """
+
+    schema = _SCHEMA
+
+    def __init__(self, db_path: str | os.PathLike, flush_interval: float = 1.0, capacity: int = 100_000):
+        super().__init__(db_path, flush_interval)
+        self.capacity = capacity
+        self._buf: deque[Event] = deque(maxlen=capacity)
+        self._done: deque[Done] = deque(maxlen=capacity)
+        self._retry: List[Event] = []      # пачка, которую не удалось записать
+        self._retry_done: List[Done] = []
+        # отчёты читают своим соединением (не ждут записи), но и его потоки делят — под своей блокировкой
+        self._reader: sqlite3.Connection | None = None
+        self._read_lock = threading.Lock()
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, user_id: int, qkey: str, tags: Sequence[str], answer: str,
+               score: float, ok: bool, latency: float) -> None:
+        if len(self._buf) == self.capacity:
+            self.dropped += 1
+        self._buf.append((time.time(), user_id, qkey, tags, answer, score, ok, int(latency * 1000)))
+        self.recorded += 1
+
+    def record_session(self, user_id: int, correct: int, total: int) -> None:
+        if len(self._done) == self.capacity:
+            self.dropped += 1
+        self._done.append((time.time(), user_id, correct, total))
+
+    @staticmethod
+    def _rollup(batch: List[Event]) -> Tuple[list, list, list]:
+        events = []
+        questions: Dict[str, List[Any]] = {}
+        tags: Dict[str, List[int]] = {}
+        for ts, user_id, qkey, qtags, answer, score, ok, latency_ms in batch:
+            events.append((ts, user_id, qkey, answer, score, int(ok), latency_ms))
+            agg = questions.get(qkey)
+            if agg is None:
+                agg = questions[qkey] = [0, 0, 0.0, 0]
+            agg[0] += 1
+            agg[1] += ok
+            agg[2] += score
+            agg[3] += latency_ms
+            for tag in qtags:
+                t = tags.get(tag)
+                if t is None:
+                    t = tags[tag] = [0, 0]
+                t[0] += 1
+                t[1] += not ok
+        return (
+            events,
+            [(k, *v) for k, v in questions.items()],
+            [(k, *v) for k, v in tags.items()],
+        )
+
+    @staticmethod
+    def _rollup_sessions(done: List[Done]) -> Tuple[list, list]:
+        hours: Dict[int, List[int]] = {}
+        buckets: Dict[int, int] = {}
+        for ts, _, correct, total in done:
+            h = hours.get(int(ts // 3600))
+            if h is None:
+                h = hours[int(ts // 3600)] = [0, 0, 0]
+            h[0] += 1
+            h[1] += correct
+            h[2] += total
+            bucket = round(10 * correct / total) if total else 0
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        return [(k, *v) for k, v in hours.items()], list(buckets.items())
+
+    def _write(self, batch: List[Event], done: List[Done]) -> None:
+        events, questions, tags = self._rollup(batch)
+        hours, buckets = self._rollup_sessions(done)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO answer_events (ts, user_id, qkey, answer, score, ok, latency_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                events,
+            )
+            self._conn.executemany(
+                "INSERT INTO question_stats (qkey, attempts, correct, score_sum, latency_ms_sum) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(qkey) DO UPDATE SET "
+                "attempts = attempts + excluded.attempts, correct = correct + excluded.correct, "
+                "score_sum = score_sum + excluded.score_sum, latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum",
+                questions,
+            )
+            self._conn.executemany(
+                "INSERT INTO tag_stats (tag, attempts, errors) VALUES (?, ?, ?) "
+                "ON CONFLICT(tag) DO UPDATE SET "
+                "attempts = attempts + excluded.attempts, errors = errors + excluded.errors",
+                tags,
+            )
+            self._conn.executemany(
+                "INSERT INTO hourly_stats (hour, completions, correct_sum, total_sum) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(hour) DO UPDATE SET completions = completions + excluded.completions, "
+                "correct_sum = correct_sum + excluded.correct_sum, total_sum = total_sum + excluded.total_sum",
+                hours,
+            )
+            self._conn.executemany(
+                "INSERT INTO score_hist (bucket, sessions) VALUES (?, ?) "
+                "ON CONFLICT(bucket) DO UPDATE SET sessions = sessions + excluded.sessions",
+                buckets,
+            )
+
+    def _keep(self, items: list) -> list:
+        overflow = len(items) - self.capacity
+        if overflow > 0:
+            self.dropped += overflow
+            return items[overflow:]
+        return items
+
+    async def flush(self) -> None:
+        if self._conn is None or not (self._buf or self._retry or self._done or self._retry_done):
+            return
+        batch = self._retry + list(self._buf)
+        done = self._retry_done + list(self._done)
+        self._buf.clear()
+        self._done.clear()
+        self._retry, self._retry_done = [], []
+        try:
+            await self._db(self._write, batch, done)
+        except sqlite3.Error as e:
+            # не теряем события: попробуем в следующий раз, но не держим больше capacity
+            print(f"[warn] stats flush failed: {e}")
+            self._retry, self._retry_done = self._keep(batch), self._keep(done)
+        else:
+            self.written += len(batch)
+
+    def _query(self, sql: str, args: tuple = ()) -> list:
+        # отдельное соединение для чтения — не пересекается с транзакциями записи
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            return self._reader.execute(sql, args).fetchall()
+
+    async def hardest_questions(self, limit: int = 10, min_attempts: int = 5) -> List[Tuple[str, int, int]]:
+        """(qkey, attempts, correct) с самой низкой долей верных ответов."""
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT qkey, attempts, correct FROM question_stats WHERE attempts >= ? "
+            "ORDER BY CAST(correct AS REAL) / attempts, attempts DESC LIMIT ?",
+            (min_attempts, limit),
+        )
+
+    async def tag_errors(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """(tag, attempts, errors) по убыванию числа ошибок."""
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT tag, attempts, errors FROM tag_stats ORDER BY errors DESC, attempts DESC LIMIT ?",
+            (limit,),
+        )
+
+    async def completions_by_hour(self, hours: int = 24) -> List[Tuple[int, int, int, int]]:
+        """(hour, completions, correct_sum, total_sum) за последние hours часов."""
+        since = int(time.time() // 3600) - hours + 1
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT hour, completions, correct_sum, total_sum FROM hourly_stats WHERE hour >= ? ORDER BY hour",
+            (since,),
+        )
+
+    async def score_distribution(self) -> List[Tuple[int, int]]:
+        """(bucket 0..10, sessions) — сколько сессий закончилось с долей верных ≈ bucket*10%."""
+        return await asyncio.to_thread(self._query, "SELECT bucket, sessions FROM score_hist ORDER BY bucket")
+
+    async def question_totals(self) -> List[Tuple[str, int, int]]:
+        """(qkey, attempts, correct) по всем вопросам — для прогрева адаптивного подбора."""
+        return await asyncio.to_thread(self._query, "SELECT qkey, attempts, correct FROM question_stats")
+
+    async def answer_history(self, since: float) -> List[Tuple[int, str, int]]:
+        """(user_id, qkey, ok) с момента since по времени (при равном — в порядке записи)."""
+        return await asyncio.to_thread(
+            self._query, "SELECT user_id, qkey, ok FROM answer_events WHERE ts >= ? ORDER BY ts, id", (since,),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._buf) + len(self._retry) + len(self._done) + len(self._retry_done),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    async def close(self) -> None:
+        await super().close()
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
@@ -1,5 +1,6 @@
 from pathlib import Path
-import yaml
+
+from packs_loader import CACHE_DIR, load_pack_file
 
 _DEFAULT_MAP = {}
 
@@ -7,8 +8,8 @@ def load_tags_map(path: str | Path = "data/tags_map.yaml") -> dict[str, str]:
     p = Path(path)
     if not p.exists():
         return _DEFAULT_MAP
-    with p.open("r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
+    # через тот же снапшот, что и пакеты: на тёплом старте YAML не разбирается и не импортируется
+    data = load_pack_file(str(p), CACHE_DIR) or {}
     # ключи как str, значения как str
     return {str(k): str(v) for k, v in data.items()}
 
@@ -0,0 +1,51 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+import asyncio
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+class KeyedLocks:
+    """
+    asyncio.Lock на каждый ключ (user_id): создаётся при первом обращении и
+    удаляется, как только его никто не держит и не ждёт — память не растёт
+    с числом когда-либо заходивших пользователей.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List[Any]] = {}  # key -> [lock, держатели+ожидающие]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+class UserSerialMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя обрабатываются строго по очереди, разных — параллельно."""
+
+    def __init__(self, locks: KeyedLocks | None = None):
+        self.locks = locks or KeyedLocks()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        async with self.locks.hold(user.id):
+            return await handler(event, data)
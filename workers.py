@@ -0,0 +1,204 @@
+"""
+Многопроцессный режим: один процесс принимает апдейты (polling или webhook)
+и раскладывает их по N воркерам по консистентному хэшу user_id. Сессия
+пользователя живёт только в «его» воркере, так что общих блокировок нет.
+"""
+import asyncio
+import bisect
+import multiprocessing as mp
+import zlib
+from typing import Any, Callable, Dict, List, Set
+
+class HashRing:
+    """Консистентный хэш с виртуальными узлами: при смене N переезжает ~1/N пользователей."""
+
+    def __init__(self, nodes: int, replicas: int = 64):
+        points = []
+        for node in range(nodes):
+            for r in range(replicas):
+                points.append((zlib.crc32(f"worker-{node}#{r}".encode()), node))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+
+    def node_for(self, key: int) -> int:
+        h = zlib.crc32(str(key).encode())
+        i = bisect.bisect(self._hashes, h)
+        return self._nodes[i % len(self._nodes)]
+
+def update_user_id(update: Dict[str, Any]) -> int:
+    """user_id автора апдейта (0 — если апдейт без пользователя)."""
+    for key, value in update.items():
+        if key != "update_id" and isinstance(value, dict):
+            user = value.get("from") or value.get("user") or {}
+            return int(user.get("id") or 0)
+    return 0
+
+class ShardRouter:
+    """Раскладывает пачку апдейтов по очередям воркеров, сохраняя порядок внутри пользователя."""
+
+    def __init__(self, inboxes: List[Any]):
+        self.inboxes = inboxes
+        self.ring = HashRing(len(inboxes))
+
+    def route(self, updates: List[Dict[str, Any]]) -> None:
+        batches: Dict[int, List[Dict[str, Any]]] = {}
+        for u in updates:
+            batches.setdefault(self.ring.node_for(update_user_id(u)), []).append(u)
+        for node, batch in batches.items():
+            self.inboxes[node].put(batch)
+
+    def stop(self) -> None:
+        for inbox in self.inboxes:
+            inbox.put(None)
+
+async def _feed_one(dp, bot, update: Dict[str, Any], slots: asyncio.Semaphore) -> None:
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception as e:
+        print(f"[warn] update {update.get('update_id')} failed: {e}")
+    finally:
+        slots.release()
+
+async def _feed_batch(dp, bot, batch: List[Dict[str, Any]], slots: asyncio.Semaphore,
+                      tasks: Set[asyncio.Task]) -> None:
+    """
+    Каждый апдейт — своя задача: медленный чат (RetryAfter, ожидание токена чата) держит
+    только своего пользователя, а не всю пачку и не следующие за ней. Порядок апдейтов
+    одного пользователя держит UserSerialMiddleware: задачи стартуют в порядке очереди
+    и до первой настоящей приостановки встают в FIFO-блокировку пользователя. slots
+    ограничивает число апдейтов в работе — при заторе воркер не берёт новые пачки.
+    """
+    for u in batch:
+        await slots.acquire()
+        task = asyncio.create_task(_feed_one(dp, bot, u, slots))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+async def _worker_loop(worker_id: int, n_workers: int, inbox, done,
+                       session_factory: Callable[[], Any] | None) -> None:
+    import app  # каждый воркер поднимает свой движок и свои сессии
+    from settings import WORKER_INFLIGHT
+
+    if session_factory is not None:
+        app.bot.session = session_factory()
+    ring = HashRing(n_workers)
+    # персистентный бэкенд должен поднимать и вытеснять только сессии своего шарда
+    app.engine.sessions.owns = lambda user_id: ring.node_for(user_id) == worker_id
+    app.register_handlers(app.dp)
+    # каждый воркер сам следит за пакетами и держит свой индекс; агрегаты статистики — инкременты,
+    # общий рейтинг дочитывается по seq, напоминания — только пользователям своего шарда;
+    # команды /broadcast принимает любой воркер (пишут в БД), рассылает только нулевой
+    warm_up = await app.start_services(owns=app.engine.sessions.owns, run_broadcasts=worker_id == 0)
+    metrics_server = await app.start_metrics(port_offset=worker_id)
+    done.put(("ready", worker_id, 0))
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(WORKER_INFLIGHT)
+    tasks: Set[asyncio.Task] = set()
+    processed = 0
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, inbox.get)
+            if batch is None:
+                break
+            await _feed_batch(app.dp, app.bot, batch, slots, tasks)
+            processed += len(batch)
+    finally:
+        # апдейты, взятые в работу, доигрываем до остановки сервисов
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if metrics_server:
+            await metrics_server.close()
+        await app.stop_services(warm_up)
+        await app.bot.session.close()
+        done.put(("done", worker_id, processed))
+
+def _worker_entry(worker_id: int, n_workers: int, inbox, done,
+                  session_factory: Callable[[], Any] | None = None) -> None:
+    asyncio.run(_worker_loop(worker_id, n_workers, inbox, done, session_factory))
+
+def start_workers(n: int, session_factory: Callable[[], Any] | None = None):
+    """
+    Запустить N воркеров; вернуть (router, процессы, очередь отчётов).
+    В очередь отчётов воркер пишет ("ready", id, 0) после старта и ("done", id, processed) при выходе.
+    """
+    ctx = mp.get_context("spawn")
+    done = ctx.Queue()
+    inboxes = [ctx.Queue() for _ in range(n)]
+    procs = [
+        ctx.Process(target=_worker_entry, args=(i, n, inboxes[i], done, session_factory), daemon=True)
+        for i in range(n)
+    ]
+    for p in procs:
+        p.start()
+    return ShardRouter(inboxes), procs, done
+
+def _intake_bot():
+    """
+    Бот процесса приёма: только клиент Bot API. `from app import bot` собрал бы через
+    app.__getattr__ всё приложение — пакеты, движок, хранилища — которое здесь не нужно:
+    апдейты обрабатывают воркеры.
+    """
+    import app
+
+    app._create_bot()
+    return app.bot
+
+async def _poll_intake(router: ShardRouter) -> None:
+    bot = _intake_bot()
+    await bot.delete_webhook(drop_pending_updates=True)
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30)
+        except Exception as e:
+            print(f"[warn] get_updates failed: {e}")
+            await asyncio.sleep(1)
+            continue
+        if not updates:
+            continue
+        offset = updates[-1].update_id + 1
+        router.route([u.model_dump(mode="json", by_alias=True, exclude_none=True) for u in updates])
+
+async def _webhook_intake(router: ShardRouter) -> None:
+    from aiohttp import web
+    from settings import WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+
+    bot = _intake_bot()
+
+    async def handle(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        router.route([await request.json()])
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "workers": len(router.inboxes)})
+
+    await bot.set_webhook(f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+                          secret_token=WEBHOOK_SECRET or None, drop_pending_updates=True)
+    web_app = web.Application()
+    web_app.router.add_post(WEBHOOK_PATH, handle)
+    web_app.router.add_get("/healthz", health)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+def run_sharded(n: int) -> None:
+    """Точка входа режима WORKERS>1: приём апдейтов здесь, обработка — в воркерах."""
+    from settings import BOT_MODE
+
+    router, procs, _ = start_workers(n)
+    intake = _webhook_intake if BOT_MODE == "webhook" else _poll_intake
+    try:
+        asyncio.run(intake(router))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        router.stop()
+        for p in procs:
+            p.join(timeout=10)